@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "orbit.middleware.MetricsMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -55,6 +58,8 @@ MIDDLEWARE = [
 ]
 
 CORS_ALLOW_ALL_ORIGINS = True
+CORS_ALLOW_HEADERS = (*default_headers, "x-orbit-profile")
+CORS_EXPOSE_HEADERS = ["Server-Timing"]
 
 ROOT_URLCONF = "backend.urls"
 
@@ -83,6 +88,8 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # job workers (manage.py run_jobs) write to the same file; wait for their locks instead of failing
+        "OPTIONS": {"timeout": 20},
     }
 }
 
@@ -128,8 +135,51 @@ STATIC_URL = "static/"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Binary TLE catalog written by `manage.py build_catalog`
+ORBIT_DATA_DIR = BASE_DIR / "orbit" / "data"
+ORBIT_CATALOG_DIR = ORBIT_DATA_DIR / "catalog"
+ORBIT_EPHEMERIS_DIR = ORBIT_DATA_DIR / "ephemeris"
+ORBIT_FEATURE_DIR = ORBIT_DATA_DIR / "features"  # per-satellite features, rebuilt per catalog version
+
+# Collision model, loaded lazily by orbit.model_registry and reloaded when the file changes.
+# Setting ORBIT_MODEL_MMAP_MODE = "r" maps the pickle's numpy arrays from the file instead of copying them.
+ORBIT_MODEL_PATH = BASE_DIR / "ML" / "rf_model.pkl"
+ORBIT_MODEL_MMAP_MODE = None
+# predictions on up to this many rows use the compiled forest (orbit.forest); larger batches use sklearn
+ORBIT_MODEL_COMPILED_MAX_ROWS = 256
+
+# In-process cache of prediction/trail results (orbit.result_cache)
+ORBIT_RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+ORBIT_RESULT_CACHE_MAX_ENTRIES = 4096
+ORBIT_RESULT_CACHE_BUCKET_SECONDS = 60  # visualization trails start on this boundary and are cached until the next
+
+# Visualization trails (orbit.sampling): the step adapts to each orbit so that chords, and
+# decimated trails, stay within this distance of the true path
+ORBIT_TRAIL_TOLERANCE_KM = 5.0
+
+# Server-Sent Events position stream (/api/orbit/positions/stream/, ASGI only)
+ORBIT_STREAM_INTERVAL = 1.0  # seconds between ticks
+ORBIT_STREAM_RESOLUTION_KM = 0.1  # stream positions are quantised to this; deltas send moves in these units
+ORBIT_STREAM_KEYFRAME_TICKS = 30  # full snapshot every N ticks
+
+# Request/stage metrics (orbit.metrics), scraped from /metrics in the Prometheus text format.
+# Sending the X-Orbit-Profile header returns the request's stage breakdown as Server-Timing.
+ORBIT_METRICS_ENABLED = True
+ORBIT_PROFILE_ENABLED = DEBUG
+ORBIT_PROFILE_HEADER = "X-Orbit-Profile"
+
+# Processes /screen/ and screening jobs shard the window across (orbit.parallel_screening);
+# 1 screens in the calling process, None uses every core
+ORBIT_SCREEN_WORKERS = 1
+
+# Background jobs (orbit.jobs), run by `manage.py run_jobs` worker processes
+ORBIT_JOB_WORKERS = None  # worker processes; None uses every core
+ORBIT_JOB_POLL_SECONDS = 1.0  # idle workers check the queue this often
+ORBIT_JOB_RESULT_TTL = 24 * 3600  # finished jobs and their results are deleted after this many seconds
+ORBIT_JOB_MAX_ATTEMPTS = 2  # a job whose worker died is re-run until it has been started this many times
+
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'orbit.renderers.JSONRenderer',
     ]
 }
@@ -17,9 +17,11 @@ Including another URLconf
 
 from django.contrib import admin
 from django.urls import path, include
+from orbit.views import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics),
     path('api/satellite/', include('satellite.urls')),
     path('api/orbit/',include('orbit.urls'))
 ]
@@ -1,3 +1,6 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import CustomSatellite, Job
+
+admin.site.register(CustomSatellite)
+admin.site.register(Job)
@@ -0,0 +1,201 @@
+"""
+Micro-benchmarks for the propagation, screening and inference hot paths.
+
+Synthetic catalogs of any size are derived from tle_data.csv: each copy of
+an element set gets a new NORAD id and a rotated mean anomaly and RAAN, so
+the objects keep realistic orbits without sitting on top of each other.
+Every benchmark is timed over several repeats after a warm-up call; results
+are plain dicts that the benchmark command writes as JSON and compares
+against a stored baseline by median time.
+"""
+import datetime
+import platform
+import statistics
+import time
+
+import numpy as np
+import sgp4 # type: ignore
+
+from .catalog import read_tle_lines, parse_tle_records, satrec_from_record
+
+GOLDEN_ANGLE = np.pi * (3.0 - np.sqrt(5.0))
+
+
+def synthetic_records(base, size):
+    """size catalog records cycled from base, copies rotated in mean anomaly and RAAN"""
+    rows = np.arange(size) % len(base)
+    copy = np.arange(size) // len(base)
+    records = base[rows].copy()
+    records["satnum"] = 100000 + np.arange(size)
+    records["mean_anomaly"] = (records["mean_anomaly"] + copy * GOLDEN_ANGLE) % (2 * np.pi)
+    records["raan"] = (records["raan"] + copy * 0.01) % (2 * np.pi)
+    return records
+
+
+def load_base_records(source):
+    names, line1s, line2s = read_tle_lines(source)
+    records, _ = parse_tle_records(names, line1s, line2s)
+    return records
+
+
+def measure(fn, repeat=5, warmup=1):
+    """Wall-clock seconds of repeat calls of fn after warmup untimed calls"""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - began)
+    return {
+        "median": statistics.median(times),
+        "min": min(times),
+        "mean": statistics.fmean(times),
+        "max": max(times),
+        "repeat": repeat,
+    }
+
+
+def environment():
+    return {
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "sgp4": sgp4.__version__,
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+    }
+
+
+def compare_results(current, baseline, tolerance=0.2):
+    """
+    Compare two results dicts by median time. A benchmark regresses when it
+    is more than tolerance (a fraction) slower than the baseline and
+    improves when it is that much faster.
+    """
+    rows = []
+    for name in sorted(set(current) | set(baseline)):
+        now, before = current.get(name), baseline.get(name)
+        if now is None or before is None:
+            rows.append({"name": name, "status": "missing" if now is None else "new"})
+            continue
+        ratio = now["median"] / before["median"] if before["median"] else float("inf")
+        status = "ok"
+        if ratio > 1.0 + tolerance:
+            status = "regression"
+        elif ratio < 1.0 / (1.0 + tolerance):
+            status = "improved"
+        rows.append({
+            "name": name, "status": status, "ratio": ratio,
+            "baseline": before["median"], "current": now["median"],
+        })
+    return rows
+
+
+class BenchmarkSuite:
+    """
+    The hot-path benchmarks. Per-object paths (positions, trails, pair
+    distance) run once; catalog paths (screening, inference, the live
+    positions JSON) run for every catalog size. All-pairs screening grows
+    with the square of the catalog, so it is skipped above screen_max_size.
+    """
+
+    PER_OBJECT = ("generate_orbital_positions", "trail_positions", "simulate_distance", "position_window_json")
+    PER_SIZE = ("screening", "inference", "live_positions_json")
+
+    def __init__(self, base_records, start, repeat=5, warmup=1, screen_minutes=10.0, screen_max_size=10000,
+                 predictor=None, screen_workers=1):
+        self.base = base_records
+        self.start = start
+        self.repeat = repeat
+        self.warmup = warmup
+        self.screen_minutes = screen_minutes
+        self.screen_max_size = screen_max_size
+        self.screen_workers = screen_workers  # processes the screening window is sharded across
+        self.predictor = predictor  # n_rows -> model, e.g. model_registry.get_predictor; None skips inference
+
+    def names(self, only=None):
+        return [name for name in self.PER_OBJECT + self.PER_SIZE if not only or name in only]
+
+    def run(self, sizes, only=None, progress=None):
+        """{"<benchmark>" or "<benchmark>[<size>]": timing dict} for the selected benchmarks"""
+        results = {}
+        for name in self.names(only):
+            if name in self.PER_OBJECT:
+                results[name] = measure(getattr(self, name)(), self.repeat, self.warmup)
+            else:
+                for size in sizes:
+                    key = f"{name}[{size}]"
+                    fn = getattr(self, name)(size)
+                    if fn is None:
+                        continue
+                    results[key] = measure(fn, self.repeat, self.warmup)
+                    results[key]["objects"] = size
+            if progress:
+                progress(name)
+        return results
+
+    # per-object paths
+
+    def _lines(self, row=0):
+        record = self.base[row]
+        return record["line1"].decode("ascii"), record["line2"].decode("ascii")
+
+    def generate_orbital_positions(self):
+        from .views import generate_orbital_positions
+        line1, line2 = self._lines()
+        return lambda: generate_orbital_positions(line1, line2)
+
+    def trail_positions(self):
+        from django.conf import settings
+        from .sampling import decimate, trail_positions, trail_step
+        sat = satrec_from_record(self.base[0])
+        step_sec, tolerance_km = trail_step([sat]), settings.ORBIT_TRAIL_TOLERANCE_KM
+        return lambda: decimate(trail_positions(sat, step_sec=step_sec, start=self.start), tolerance_km)
+
+    def simulate_distance(self):
+        from .label_collisions import simulate_distance
+        sat1, sat2 = satrec_from_record(self.base[0]), satrec_from_record(self.base[1])
+        return lambda: simulate_distance(sat1, sat2, self.start)
+
+    def position_window_json(self):
+        from rest_framework.renderers import JSONRenderer # type: ignore
+        from .propagation import propagate, time_grid
+        from .views import columnar_positions
+        offsets = np.arange(1440, dtype=np.float64) * 60.0
+        positions, velocities, errors = propagate(satrec_from_record(self.base[0]), *time_grid(self.start, offsets))
+        renderer = JSONRenderer()
+        return lambda: renderer.render(columnar_positions(offsets, positions, velocities, errors))
+
+    # catalog paths
+
+    def _satrecs(self, size):
+        return [satrec_from_record(record) for record in synthetic_records(self.base, size)]
+
+    def screening(self, size):
+        if self.screen_max_size is not None and size > self.screen_max_size:
+            return None
+        from .screening import prefiltered_screen
+        satrecs = self._satrecs(size)
+        return lambda: prefiltered_screen(satrecs, self.start, self.screen_minutes * 60.0, workers=self.screen_workers)
+
+    def inference(self, size):
+        if self.predictor is None:
+            return None
+        from .prediction import predict_features
+        records = synthetic_records(self.base, 2 * size)
+        elements = np.stack([records["inclination"], records["eccentricity"], records["mean_motion"]], axis=1)
+        features = np.hstack([elements[:size], elements[size:]])
+        model = self.predictor(size)
+        return lambda: predict_features(model, features)
+
+    def live_positions_json(self, size):
+        from rest_framework.renderers import JSONRenderer # type: ignore
+        from .tracking import TrackedSet, columnar_snapshot
+        records = synthetic_records(self.base, size)
+        tracked = TrackedSet(
+            [f"SYNTHETIC {satnum}" for satnum in records["satnum"].tolist()], records["satnum"],
+            ["catalog"] * size, [satrec_from_record(record) for record in records],
+        )
+        renderer = JSONRenderer()
+        return lambda: renderer.render(columnar_snapshot(tracked, self.start))
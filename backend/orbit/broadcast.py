@@ -0,0 +1,184 @@
+"""
+Server-Sent Events position stream.
+
+One PositionTicker per process propagates the tracked set once per tick
+and encodes the frame once; every subscriber receives the same bytes, so
+the per-client cost is a queue put. Tick times are wall-clock instants
+aligned to the tick interval, so every worker process streams the same
+clock.
+
+Positions are quantised to resolution_km. Frames:
+- "snapshot": every object (names, ids, positions on the resolution_km
+  grid), sent when a client connects, every keyframe_ticks ticks, and
+  whenever the tracked set changes or an object starts or stops propagating.
+- "delta": integer moves in units of resolution_km since tick "since",
+  flattened as [dx, dy, dz, ...]. When at most DENSE_DELTA_FRACTION of the
+  rows moved, "rows" lists the rows (numbered as in the snapshot) the moves
+  belong to; otherwise it is left out and every snapshot row has a move, in
+  snapshot order. A client keeps round(position / resolution_km) per row
+  and adds the moves.
+"""
+import asyncio
+import datetime
+import json
+import logging
+import time
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .propagation import julian_date
+from .tracking import get_tracked_set
+
+logger = logging.getLogger(__name__)
+
+# above this fraction of moved rows, listing the rows costs more than sending a zero move for the rest
+DENSE_DELTA_FRACTION = 0.5
+
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n".encode()
+
+
+def tick_time(tick, interval):
+    return datetime.datetime.fromtimestamp(tick * interval, tz=datetime.timezone.utc)
+
+
+class PositionTicker:
+    def __init__(self, interval=1.0, resolution_km=0.1, keyframe_ticks=30, queue_size=8):
+        self.interval = interval
+        self.resolution_km = resolution_km
+        self.keyframe_ticks = keyframe_ticks
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self._task = None
+        self._tracked = None
+        self._quantised = None
+        self._tick = None
+        self._state = None  # (tick, time, tracked, valid rows, positions) of the last tick
+        self._keyframe = None  # (tick, encoded snapshot), built lazily for joining clients
+
+    # subscriber side
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        if self._state is not None:
+            queue.put_nowait(self.keyframe())
+        self.subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    def _publish(self, frame):
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                # slow client: drop its backlog and resync it from the latest keyframe
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(self.keyframe())
+
+    def keyframe(self):
+        """Snapshot frame of the last tick, encoded at most once per tick"""
+        tick = self._state[0]
+        if self._keyframe is None or self._keyframe[0] != tick:
+            self._keyframe = (tick, self._snapshot_frame(*self._state))
+        return self._keyframe[1]
+
+    # ticker side
+
+    async def _run(self):
+        while self.subscribers:
+            tick = int(time.time() // self.interval) + 1
+            await asyncio.sleep(max(tick * self.interval - time.time(), 0))
+            try:
+                frame, state = await sync_to_async(self.step)(tick)
+            except Exception:
+                logger.exception("Position ticker failed at tick %s", tick)
+                continue
+            # state and publish happen without yielding to the loop, so a joining client
+            # gets either the previous keyframe and this delta, or this tick's keyframe
+            self._state = state
+            self._publish(frame)
+        self._task = None
+
+    def _snapshot_frame(self, tick, when, tracked, rows, positions):
+        return _sse("snapshot", {
+            "tick": tick,
+            "time": when.isoformat(),
+            "rows": rows.tolist(),
+            "names": tracked.names[rows].tolist(),
+            "norad_ids": tracked.satnums[rows].tolist(),
+            "types": tracked.types[rows].tolist(),
+            "resolution_km": self.resolution_km,
+            "positions": positions[rows].round(6).tolist(),
+        })
+
+    def step(self, tick):
+        """Propagate the tracked set to one tick; returns the encoded frame and the new state"""
+        when = tick_time(tick, self.interval)
+        tracked = get_tracked_set()
+        jd, fr = julian_date(when)
+        errors, r, _ = tracked.satrec_array.sgp4(np.array([jd]), np.array([fr]))
+        positions = r[:, 0]
+        valid = errors[:, 0] == 0
+        quantised = np.where(valid[:, None], np.round(positions / self.resolution_km), np.nan)
+        snapped = quantised * self.resolution_km
+        rows = np.flatnonzero(valid)
+
+        keyframe = (
+            tracked is not self._tracked or self._quantised is None
+            or tick % self.keyframe_ticks == 0
+            or (valid != ~np.isnan(self._quantised[:, 0])).any()
+        )
+        if keyframe:
+            frame = self._snapshot_frame(tick, when, tracked, rows, snapped)
+        else:
+            # the valid rows are the same as in the last snapshot, so rows index both
+            moves = (quantised[rows] - self._quantised[rows]).astype(np.int64)
+            changed = np.flatnonzero(moves.any(axis=1))
+            payload = {"tick": tick, "since": self._tick, "time": when.isoformat()}
+            if len(changed) > DENSE_DELTA_FRACTION * len(rows):
+                payload["moves"] = moves.ravel().tolist()
+            else:
+                payload["rows"] = rows[changed].tolist()
+                payload["moves"] = moves[changed].ravel().tolist()
+            frame = _sse("delta", payload)
+
+        self._tracked = tracked
+        self._quantised = quantised
+        self._tick = tick
+        state = (tick, when, tracked, rows, snapped)
+        if keyframe:
+            self._keyframe = (tick, frame)
+        return frame, state
+
+
+_ticker = None
+
+
+def get_ticker():
+    """The process-wide ticker, configured from settings on first use"""
+    global _ticker
+    if _ticker is None:
+        _ticker = PositionTicker(
+            interval=settings.ORBIT_STREAM_INTERVAL,
+            resolution_km=settings.ORBIT_STREAM_RESOLUTION_KM,
+            keyframe_ticks=settings.ORBIT_STREAM_KEYFRAME_TICKS,
+        )
+    return _ticker
+
+
+async def event_stream(ticker):
+    """Frames for one client; the subscription is dropped when the client disconnects"""
+    queue = ticker.subscribe()
+    try:
+        while True:
+            yield await queue.get()
+    finally:
+        ticker.unsubscribe(queue)
@@ -0,0 +1,305 @@
+"""
+Binary TLE catalog store.
+
+3-line TLE files are parsed once with a vectorized, checksum-validating
+parser and saved as a fixed-width NumPy structured array next to a sorted
+NORAD-id index. Both are plain .npy files, so any process can open the
+catalog with np.load(mmap_mode="r") in milliseconds and build Satrec /
+SatrecArray objects straight from the stored elements.
+
+Every save is published as a whole version (see orbit.versioned), so a
+reader never pairs records from one save with the index of another.
+"""
+import datetime
+import hashlib
+import json
+import os
+
+import numpy as np
+from sgp4.api import WGS72, Satrec, SatrecArray # type: ignore
+
+from .versioned import current_version_dir, new_version_dir, publish_version
+
+DEG2RAD = np.pi / 180.0
+# sgp4init epochs are days since 1949 December 31 00:00 UT
+SGP4_EPOCH_JD = 2433281.5
+# revolutions/day -> radians/minute
+XPDOTP = 1440.0 / (2.0 * np.pi)
+
+CATALOG_DTYPE = np.dtype([
+    ("satnum", "<i4"),
+    ("name", "S24"),
+    ("line1", "S69"),
+    ("line2", "S69"),
+    ("epoch_jd", "<f8"),      # whole Julian date (ends in .5) ...
+    ("epoch_fr", "<f8"),      # ... plus day fraction, kept apart for precision
+    ("element_set", "<i4"),
+    ("rev_number", "<i4"),
+    ("inclination", "<f8"),   # radians
+    ("raan", "<f8"),          # radians
+    ("eccentricity", "<f8"),
+    ("argp", "<f8"),          # radians
+    ("mean_anomaly", "<f8"),  # radians
+    ("mean_motion", "<f8"),   # radians/minute (no_kozai)
+    ("ndot", "<f8"),
+    ("nddot", "<f8"),
+    ("bstar", "<f8"),
+])
+
+RECORDS_FILE = "records.npy"
+INDEX_FILE = "index.npy"
+META_FILE = "meta.json"
+
+# Alpha-5 NORAD ids replace the leading digit with a letter (I and O unused)
+_ALPHA5 = {letter: 10 + k for k, letter in enumerate("ABCDEFGHJKLMNPQRSTUVWXYZ")}
+
+
+def _char_matrix(lines):
+    """(N,) list of strings -> (N, 69) uint8 matrix, space padded"""
+    fixed = np.array([line.encode("ascii", "replace")[:69].ljust(69) for line in lines], dtype="S69")
+    return fixed.view(np.uint8).reshape(len(lines), 69)
+
+
+def _field(chars, first, last):
+    """Columns [first, last) (0-based) of a char matrix as an array of byte strings"""
+    width = last - first
+    return np.ascontiguousarray(chars[:, first:last]).view(f"S{width}").ravel()
+
+
+def _to_float(values):
+    out = np.zeros(len(values))
+    stripped = np.char.strip(values)
+    ok = stripped != b""
+    out[ok] = stripped[ok].astype(np.float64)
+    return out
+
+
+def _implied_exponent(chars, first):
+    """Fields like ' 28697-3' (sign, 5 digit mantissa with implied '0.', exponent) -> float"""
+    sign = np.where(chars[:, first] == ord("-"), -1.0, 1.0)
+    mantissa = _to_float(_field(chars, first + 1, first + 6)) * 1e-5
+    exponent = _to_float(_field(chars, first + 6, first + 8))
+    return sign * mantissa * 10.0 ** exponent
+
+
+def checksums_valid(chars):
+    """Modulo-10 TLE checksum: digits count their value, '-' counts 1, everything else 0"""
+    body = chars[:, :68]
+    digits = np.where((body >= ord("0")) & (body <= ord("9")), body - ord("0"), 0)
+    minus = (body == ord("-")).astype(np.int64)
+    total = (digits.sum(axis=1) + minus.sum(axis=1)) % 10
+    expected = chars[:, 68].astype(np.int64) - ord("0")
+    return total == expected
+
+
+def _satnums(chars):
+    """NORAD ids from columns 3-7, including Alpha-5 ids above 99999"""
+    lead = chars[:, 2]
+    rest = _to_float(_field(chars, 3, 7)).astype(np.int64)
+    lead_value = np.where((lead >= ord("0")) & (lead <= ord("9")), lead.astype(np.int64) - ord("0"), -1)
+    for letter, value in _ALPHA5.items():
+        lead_value[lead == ord(letter)] = value
+    lead_value[lead == ord(" ")] = 0
+    return np.where(lead_value >= 0, lead_value * 10000 + rest, -1)
+
+
+def _epoch(chars):
+    """Epoch year/day-of-year (columns 19-32 of line 1) -> (whole Julian date, day fraction)"""
+    year = _to_float(_field(chars, 18, 20)).astype(np.int64)
+    year = np.where(year < 57, year + 2000, year + 1900)
+    day_of_year = _to_float(_field(chars, 20, 32))
+    whole_days = np.floor(day_of_year)
+    # Julian date of January 1, 0h of each year (same formula as sgp4.api.jday)
+    jan1 = 367 * year - (7 * year) // 4 + 31 + 1721013.5
+    # sgp4's twoline2rv rounds the fraction to 8 places; match it for identical propagation
+    return jan1 + whole_days - 1.0, np.round(day_of_year - whole_days, 8)
+
+
+def read_tle_lines(path):
+    """Non-empty lines of a 3-line TLE file, or the rows of a name/line1/line2 CSV"""
+    if str(path).endswith(".csv"):
+        import pandas as pd
+        df = pd.read_csv(path)
+        names = df["name"].astype(str).str.strip().tolist()
+        return names, df["line1"].str.strip().tolist(), df["line2"].str.strip().tolist()
+
+    with open(path) as f:
+        lines = [line.rstrip() for line in f if line.strip()]
+    count = len(lines) // 3
+    return (
+        [lines[3 * k].strip() for k in range(count)],
+        [lines[3 * k + 1] for k in range(count)],
+        [lines[3 * k + 2] for k in range(count)],
+    )
+
+
+def parse_tle_records(names, line1s, line2s):
+    """
+    Parse TLE triples into a CATALOG_DTYPE array in one vectorized pass.
+    Rows with a bad checksum, wrong line numbers or mismatched NORAD ids are
+    dropped. Returns (records, rejected_count).
+    """
+    if not names:
+        return np.zeros(0, dtype=CATALOG_DTYPE), 0
+    chars1 = _char_matrix(line1s)
+    chars2 = _char_matrix(line2s)
+    satnum1 = _satnums(chars1)
+    satnum2 = _satnums(chars2)
+
+    valid = (
+        (chars1[:, 0] == ord("1")) & (chars2[:, 0] == ord("2"))
+        & checksums_valid(chars1) & checksums_valid(chars2)
+        & (satnum1 == satnum2) & (satnum1 >= 0)
+    )
+
+    records = np.zeros(len(names), dtype=CATALOG_DTYPE)
+    records["satnum"] = satnum1
+    records["name"] = [name.encode("ascii", "replace")[:24] for name in names]
+    records["line1"] = _field(chars1, 0, 69)
+    records["line2"] = _field(chars2, 0, 69)
+    records["epoch_jd"], records["epoch_fr"] = _epoch(chars1)
+    records["element_set"] = _to_float(_field(chars1, 64, 68)).astype(np.int32)
+    records["ndot"] = _to_float(_field(chars1, 33, 43)) / (XPDOTP * 1440.0)
+    records["nddot"] = _implied_exponent(chars1, 44) / (XPDOTP * 1440.0 * 1440.0)
+    records["bstar"] = _implied_exponent(chars1, 53)
+
+    records["inclination"] = _to_float(_field(chars2, 8, 16)) * DEG2RAD
+    records["raan"] = _to_float(_field(chars2, 17, 25)) * DEG2RAD
+    # dividing by the exact 1e7 rounds correctly, like parsing "0.xxxxxxx" does in twoline2rv
+    records["eccentricity"] = _to_float(_field(chars2, 26, 33)) / 1e7
+    records["argp"] = _to_float(_field(chars2, 34, 42)) * DEG2RAD
+    records["mean_anomaly"] = _to_float(_field(chars2, 43, 51)) * DEG2RAD
+    records["mean_motion"] = _to_float(_field(chars2, 52, 63)) / XPDOTP
+    records["rev_number"] = _to_float(_field(chars2, 63, 68)).astype(np.int32)
+
+    return records[valid], int(np.count_nonzero(~valid))
+
+
+def build_index(records):
+    """(K, 2) array of [satnum, row] sorted by satnum"""
+    order = np.argsort(records["satnum"], kind="stable")
+    return np.stack([records["satnum"][order].astype(np.int64), order.astype(np.int64)], axis=1)
+
+
+def _file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_catalog(records, directory, source=None):
+    """Write records, the NORAD-id index and metadata as a new version of the catalog in directory and publish it"""
+    meta = {
+        "count": int(len(records)),
+        "built_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "version": hashlib.sha1(np.ascontiguousarray(records).tobytes()).hexdigest()[:16],
+    }
+    if source:
+        meta.update({
+            "source": os.path.abspath(source),
+            "source_mtime": os.path.getmtime(source),
+            "source_sha1": _file_digest(source),
+        })
+
+    target = new_version_dir(directory, prefix=meta["version"] + "-")
+    np.save(os.path.join(target, RECORDS_FILE), records)
+    np.save(os.path.join(target, INDEX_FILE), build_index(records))
+    with open(os.path.join(target, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+    publish_version(directory, target)
+    return meta
+
+
+def satrec_from_record(record):
+    """Initialise a Satrec directly from stored elements, without re-parsing the TLE text"""
+    sat = Satrec()
+    sat.sgp4init(
+        WGS72, "i", int(record["satnum"]), (float(record["epoch_jd"]) - SGP4_EPOCH_JD) + float(record["epoch_fr"]),
+        float(record["bstar"]), float(record["ndot"]), float(record["nddot"]),
+        float(record["eccentricity"]), float(record["argp"]), float(record["inclination"]),
+        float(record["mean_anomaly"]), float(record["mean_motion"]), float(record["raan"]),
+    )
+    return sat
+
+
+class Catalog:
+    """A memory-mapped catalog opened from a directory written by save_catalog"""
+
+    def __init__(self, records, index, meta):
+        self.records = records
+        self.index = index
+        self.meta = meta
+
+    @classmethod
+    def open(cls, directory, mmap_mode="r"):
+        version_dir = current_version_dir(directory)
+        if version_dir is None:
+            raise FileNotFoundError(f"No catalog in {directory}; run `manage.py build_catalog` first")
+        records = np.load(os.path.join(version_dir, RECORDS_FILE), mmap_mode=mmap_mode)
+        index = np.load(os.path.join(version_dir, INDEX_FILE), mmap_mode=mmap_mode)
+        meta_path = os.path.join(version_dir, META_FILE)
+        meta = {}
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+        return cls(records, index, meta)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def version(self):
+        return self.meta.get("version")
+
+    @property
+    def satnums(self):
+        return self.records["satnum"]
+
+    @property
+    def names(self):
+        return [name.decode("ascii", "replace").strip() for name in self.records["name"]]
+
+    def rows_for(self, satnums):
+        """Row numbers for NORAD ids; -1 where the id is not catalogued"""
+        satnums = np.atleast_1d(np.asarray(satnums, dtype=np.int64))
+        keys = self.index[:, 0]
+        position = np.clip(np.searchsorted(keys, satnums), 0, max(len(keys) - 1, 0))
+        if len(keys) == 0:
+            return np.full(len(satnums), -1, dtype=np.int64)
+        found = keys[position] == satnums
+        return np.where(found, self.index[position, 1], -1)
+
+    def satrecs(self, rows=None):
+        records = self.records if rows is None else self.records[np.asarray(rows)]
+        return [satrec_from_record(record) for record in records]
+
+    def satrec_array(self, rows=None):
+        return SatrecArray(self.satrecs(rows))
+
+    def tle_lines(self, row):
+        record = self.records[row]
+        return record["line1"].decode("ascii"), record["line2"].decode("ascii")
+
+
+def build_catalog(source, directory):
+    """Parse a TLE file (3-line text or tle_data.csv layout) and save it as a binary catalog"""
+    names, line1s, line2s = read_tle_lines(source)
+    records, rejected = parse_tle_records(names, line1s, line2s)
+    meta = save_catalog(records, directory, source=source)
+    meta["rejected"] = rejected
+    return meta
+
+
+def default_catalog_dir():
+    from django.conf import settings
+    return settings.ORBIT_CATALOG_DIR
+
+
+def open_default_catalog():
+    """The project's catalog store, or None if build_catalog has not been run"""
+    directory = default_catalog_dir()
+    if current_version_dir(directory) is None:
+        return None
+    return Catalog.open(directory)
@@ -0,0 +1,277 @@
+"""
+Precomputed ephemeris tables.
+
+Every object in the catalog store is propagated once on a shared time grid
+and the positions/velocities are written to memory-mapped float32 .npy
+files. Reads slice the table directly when the request is on the grid and
+use cubic Hermite interpolation (positions plus velocities) in between, so
+views can serve arbitrary timestamps without calling sgp4. Builds and
+refreshes are published as whole versions (see orbit.versioned); readers
+keep the version they opened.
+"""
+import datetime
+import json
+import os
+import shutil
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from .propagation import julian_date, time_grid
+from .versioned import current_version_dir, new_version_dir, publish_version, version_stamp
+
+POSITIONS_FILE = "positions.npy"
+VELOCITIES_FILE = "velocities.npy"
+OBJECTS_FILE = "objects.npy"
+META_FILE = "meta.json"
+
+OBJECTS_DTYPE = np.dtype([
+    ("satnum", "<i4"),
+    ("epoch_jd", "<f8"),
+    ("epoch_fr", "<f8"),
+])
+
+
+def _objects_from_catalog(catalog):
+    objects = np.zeros(len(catalog), dtype=OBJECTS_DTYPE)
+    objects["satnum"] = catalog.records["satnum"]
+    objects["epoch_jd"] = catalog.records["epoch_jd"]
+    objects["epoch_fr"] = catalog.records["epoch_fr"]
+    return objects
+
+
+def _fill_rows(positions, velocities, catalog, rows, jd, fr, chunk_rows):
+    """Propagate catalog rows over the grid and write them into the memmaps; failures become NaN"""
+    for first in range(0, len(rows), chunk_rows):
+        block = rows[first:first + chunk_rows]
+        errors, r, v = catalog.satrec_array(block).sgp4(jd, fr)
+        r[errors != 0] = np.nan
+        v[errors != 0] = np.nan
+        positions[block] = r
+        velocities[block] = v
+
+
+def _open_tables(directory, shape):
+    return tuple(
+        open_memmap(os.path.join(directory, name), mode="w+", dtype=np.float32, shape=shape)
+        for name in (POSITIONS_FILE, VELOCITIES_FILE)
+    )
+
+
+def _publish(directory, version_dir, objects, meta):
+    np.save(os.path.join(version_dir, OBJECTS_FILE), objects)
+    with open(os.path.join(version_dir, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+    publish_version(directory, version_dir)
+
+
+def build_ephemeris(catalog, directory, start, duration_seconds, step_seconds=60.0, chunk_rows=512):
+    """Propagate every catalogued object on one grid and publish the table as a new version in directory"""
+    num_steps = int(duration_seconds // step_seconds) + 1
+    jd, fr = time_grid(start, np.arange(num_steps) * step_seconds)
+    target = new_version_dir(directory, prefix=f"{catalog.version}-")
+
+    positions, velocities = _open_tables(target, (len(catalog), num_steps, 3))
+    _fill_rows(positions, velocities, catalog, np.arange(len(catalog)), jd, fr, chunk_rows)
+    positions.flush()
+    velocities.flush()
+    del positions, velocities
+
+    start_jd, start_fr = julian_date(start)
+    meta = {
+        "start": start.isoformat(),
+        "start_jd": start_jd,
+        "start_fr": start_fr,
+        "step_seconds": step_seconds,
+        "num_steps": num_steps,
+        "catalog_version": catalog.version,
+        "built_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+    _publish(directory, target, _objects_from_catalog(catalog), meta)
+    return meta
+
+
+def refresh_ephemeris(catalog, directory, chunk_rows=512):
+    """
+    Bring an existing table up to date with the catalog, re-propagating only
+    objects that are new or whose element set epoch changed. The refreshed
+    table is a new version on the same grid: rows of unchanged objects are
+    copied from the old table (the files are linked when nothing changed),
+    and it is published in one swap, so readers never see it half written.
+    Returns (propagated_count, relaid_out).
+    """
+    table = EphemerisTable.open(directory)
+    meta = dict(table.meta)
+    objects = _objects_from_catalog(catalog)
+    jd, fr = table.grid()
+
+    # row of each catalog object in the old table, -1 when absent or on a different epoch
+    old_order = table._order
+    old_satnums = table.objects["satnum"][old_order]
+    position = np.clip(np.searchsorted(old_satnums, objects["satnum"]), 0, max(len(old_satnums) - 1, 0))
+    old_rows = old_order[position] if len(old_order) else np.zeros(len(objects), dtype=np.int64)
+    old_objects = table.objects[old_rows]
+    reusable = (
+        (old_objects["satnum"] == objects["satnum"])
+        & (old_objects["epoch_jd"] == objects["epoch_jd"]) & (old_objects["epoch_fr"] == objects["epoch_fr"])
+    ) if len(old_order) else np.zeros(len(objects), dtype=bool)
+    stale = np.flatnonzero(~reusable)
+    relaid_out = not np.array_equal(objects["satnum"], table.objects["satnum"])
+
+    target = new_version_dir(directory, prefix=f"{catalog.version}-")
+    if relaid_out or len(stale):
+        positions, velocities = _open_tables(target, (len(objects), table.num_steps, 3))
+        kept = np.flatnonzero(reusable)
+        for first in range(0, len(kept), chunk_rows):
+            block = kept[first:first + chunk_rows]
+            positions[block] = table.positions[old_rows[block]]
+            velocities[block] = table.velocities[old_rows[block]]
+        _fill_rows(positions, velocities, catalog, stale, jd, fr, chunk_rows)
+        positions.flush()
+        velocities.flush()
+        del positions, velocities
+    else:
+        # published versions are never written again, so the new one can share the old files
+        for name in (POSITIONS_FILE, VELOCITIES_FILE):
+            try:
+                os.link(os.path.join(table.directory, name), os.path.join(target, name))
+            except OSError:
+                shutil.copyfile(os.path.join(table.directory, name), os.path.join(target, name))
+    del table
+
+    meta["catalog_version"] = catalog.version
+    meta["refreshed_at"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    _publish(directory, target, objects, meta)
+    return len(stale), relaid_out
+
+
+def hermite(p0, v0, p1, v1, s, h):
+    """Cubic Hermite interpolation between samples h seconds apart at fraction s in [0, 1]"""
+    s = s[..., None]
+    s2 = s * s
+    s3 = s2 * s
+    return ((2 * s3 - 3 * s2 + 1) * p0 + (s3 - 2 * s2 + s) * h * v0
+            + (-2 * s3 + 3 * s2) * p1 + (s3 - s2) * h * v1)
+
+
+class EphemerisTable:
+    """Read side of an ephemeris table written by build_ephemeris"""
+
+    def __init__(self, positions, velocities, objects, meta):
+        self.positions = positions
+        self.velocities = velocities
+        self.objects = objects
+        self.meta = meta
+        self.step_seconds = meta["step_seconds"]
+        self.num_steps = meta["num_steps"]
+        self._order = np.argsort(objects["satnum"], kind="stable")
+
+    @classmethod
+    def open(cls, directory):
+        version_dir = current_version_dir(directory)
+        if version_dir is None:
+            raise FileNotFoundError(f"No ephemeris table in {directory}; run `manage.py build_ephemeris` first")
+        with open(os.path.join(version_dir, META_FILE)) as f:
+            meta = json.load(f)
+        table = cls(
+            np.load(os.path.join(version_dir, POSITIONS_FILE), mmap_mode="r"),
+            np.load(os.path.join(version_dir, VELOCITIES_FILE), mmap_mode="r"),
+            np.load(os.path.join(version_dir, OBJECTS_FILE)),
+            meta,
+        )
+        table.directory = version_dir
+        return table
+
+    def grid(self):
+        start = datetime.datetime.fromisoformat(self.meta["start"])
+        return time_grid(start, np.arange(self.num_steps) * self.step_seconds)
+
+    def row_for(self, satnum, epoch_jd=None, epoch_fr=None):
+        """Row of satnum, or None if absent or stored for a different element set epoch"""
+        satnums = self.objects["satnum"][self._order]
+        position = np.searchsorted(satnums, satnum)
+        if position >= len(satnums) or satnums[position] != satnum:
+            return None
+        row = int(self._order[position])
+        if epoch_jd is not None:
+            stored = self.objects[row]
+            if abs((stored["epoch_jd"] - epoch_jd) + (stored["epoch_fr"] - epoch_fr)) > 1e-8:
+                return None
+        return row
+
+    def offsets_from_start(self, start, offsets_seconds):
+        """Seconds since the table start for offsets from another start time"""
+        jd, fr = julian_date(start)
+        shift = ((jd - self.meta["start_jd"]) + (fr - self.meta["start_fr"])) * 86400.0
+        return shift + np.asarray(offsets_seconds, dtype=np.float64)
+
+    def covers(self, seconds):
+        seconds = np.asarray(seconds)
+        return bool(seconds.min() >= 0 and seconds.max() <= (self.num_steps - 1) * self.step_seconds)
+
+    def sample(self, row, seconds):
+        """
+        Positions and velocities of one row at table-relative seconds.
+        Times on the grid are sliced; others use Hermite interpolation.
+        """
+        seconds = np.asarray(seconds, dtype=np.float64)
+        index = seconds / self.step_seconds
+        on_grid = np.allclose(index, np.round(index), atol=1e-9)
+        if on_grid:
+            steps = np.round(index).astype(np.int64)
+            return (np.asarray(self.positions[row, steps], dtype=np.float64),
+                    np.asarray(self.velocities[row, steps], dtype=np.float64))
+
+        lower = np.clip(np.floor(index).astype(np.int64), 0, self.num_steps - 2)
+        s = index - lower
+        p = np.asarray(self.positions[row], dtype=np.float64)
+        v = np.asarray(self.velocities[row], dtype=np.float64)
+        h = self.step_seconds
+        positions = hermite(p[lower], v[lower], p[lower + 1], v[lower + 1], s, h)
+        # derivative of the Hermite basis gives the velocity
+        s_ = s[:, None]
+        velocities = ((6 * s_ ** 2 - 6 * s_) * p[lower] / h + (3 * s_ ** 2 - 4 * s_ + 1) * v[lower]
+                      + (-6 * s_ ** 2 + 6 * s_) * p[lower + 1] / h + (3 * s_ ** 2 - 2 * s_) * v[lower + 1])
+        return positions, velocities
+
+
+_table_cache = {}
+
+
+def default_ephemeris_dir():
+    from django.conf import settings
+    return settings.ORBIT_EPHEMERIS_DIR
+
+
+def get_ephemeris(directory=None):
+    """The process-wide ephemeris table, reopened when it is rebuilt or refreshed; None if absent"""
+    directory = str(directory or default_ephemeris_dir())
+    stamp = version_stamp(directory)
+    if stamp is None:
+        return None
+    cached = _table_cache.get(directory)
+    if cached is None or cached[0] != stamp:
+        cached = (stamp, EphemerisTable.open(directory))
+        _table_cache[directory] = cached
+    return cached[1]
+
+
+def lookup_positions(sat, start, offsets_seconds):
+    """
+    Positions of a Satrec at offsets from start served from the ephemeris
+    table, or None when the table is missing, does not cover the window or
+    holds a different element set for this object.
+    """
+    table = get_ephemeris()
+    if table is None:
+        return None
+    row = table.row_for(sat.satnum, sat.jdsatepoch, sat.jdsatepochF)
+    if row is None:
+        return None
+    seconds = table.offsets_from_start(start, offsets_seconds)
+    if not table.covers(seconds):
+        return None
+    positions, _ = table.sample(row, seconds)
+    if not np.isfinite(positions).all():
+        return None
+    return positions
@@ -0,0 +1,176 @@
+"""
+Per-satellite feature store.
+
+Orbital features are computed once per catalog version, vectorized over the
+stored records, and saved as one structured array sorted by NORAD id.
+Besides the three elements the collision model uses, derived features
+(semi-major axis, apogee/perigee altitude, period) are computed the way
+sgp4init does, so they match Satrec.a, alta and altp.
+
+A pair feature matrix is a gather of two row-index arrays from the (n, k)
+model column block, so millions of pairs take well under a second.
+
+Every save is published as a whole version (see orbit.versioned), so
+processes that compute the same catalog version at once never read each
+other's half-written files.
+"""
+import json
+import os
+
+import numpy as np
+
+from .catalog import open_default_catalog
+from .versioned import current_version_dir, new_version_dir, publish_version
+
+# WGS72 constants, as sgp4 uses them
+EARTH_RADIUS_KM = 6378.135
+MU_KM3_S2 = 398600.8
+XKE = 60.0 / np.sqrt(EARTH_RADIUS_KM ** 3 / MU_KM3_S2)
+J2 = 0.001082616
+
+FEATURE_DTYPE = np.dtype([
+    ("satnum", "<i4"),
+    ("inclination", "<f8"),       # radians
+    ("eccentricity", "<f8"),
+    ("mean_motion", "<f8"),       # radians/minute (no_kozai), as the model was trained on
+    ("raan", "<f8"),              # radians
+    ("argp", "<f8"),              # radians
+    ("bstar", "<f8"),
+    ("semi_major_km", "<f8"),
+    ("apogee_alt_km", "<f8"),
+    ("perigee_alt_km", "<f8"),
+    ("period_minutes", "<f8"),
+    ("epoch_jd", "<f8"),          # whole date plus fraction
+])
+
+# per-satellite columns of the model's pair features, in FEATURE_NAMES order for each side
+MODEL_COLUMNS = ("inclination", "eccentricity", "mean_motion")
+
+FEATURES_FILE = "features.npy"
+META_FILE = "meta.json"
+
+
+def unkozai_mean_motion(no_kozai, inclination, eccentricity):
+    """Brouwer mean motion (radians/minute) from the Kozai TLE value, as in sgp4init's initl"""
+    ak = (XKE / no_kozai) ** (2.0 / 3.0)
+    cosio = np.cos(inclination)
+    d1 = 0.75 * J2 * (3.0 * cosio * cosio - 1.0) / (1.0 - eccentricity * eccentricity) ** 1.5
+    delta = d1 / (ak * ak)
+    adel = ak * (1.0 - delta * delta - delta * (1.0 / 3.0 + 134.0 * delta * delta / 81.0))
+    delta = d1 / (adel * adel)
+    return no_kozai / (1.0 + delta)
+
+
+def compute_features(records):
+    """FEATURE_DTYPE rows for catalog records, in the same order"""
+    features = np.zeros(len(records), dtype=FEATURE_DTYPE)
+    for name in ("satnum", "inclination", "eccentricity", "mean_motion", "raan", "argp", "bstar"):
+        features[name] = records[name]
+    no_unkozai = unkozai_mean_motion(records["mean_motion"], records["inclination"], records["eccentricity"])
+    semi_major = (XKE / no_unkozai) ** (2.0 / 3.0) * EARTH_RADIUS_KM
+    features["semi_major_km"] = semi_major
+    features["apogee_alt_km"] = semi_major * (1.0 + records["eccentricity"]) - EARTH_RADIUS_KM
+    features["perigee_alt_km"] = semi_major * (1.0 - records["eccentricity"]) - EARTH_RADIUS_KM
+    features["period_minutes"] = 2.0 * np.pi / no_unkozai
+    features["epoch_jd"] = records["epoch_jd"] + records["epoch_fr"]
+    return features
+
+
+def pair_matrix(block, rows1, rows2):
+    """(N, 2k) pair features: row rows1[n] of block next to row rows2[n]"""
+    return np.concatenate([block[rows1], block[rows2]], axis=1)
+
+
+class FeatureStore:
+    """Features of one catalog version, sorted by NORAD id"""
+
+    def __init__(self, features, version=None):
+        self.features = features
+        self.version = version
+        self._model_block = None
+        self._row_of = None
+
+    @classmethod
+    def from_records(cls, records, version=None):
+        features = compute_features(records)
+        return cls(features[np.argsort(features["satnum"], kind="stable")], version)
+
+    def __len__(self):
+        return len(self.features)
+
+    def rows_for(self, satnums):
+        """Rows of NORAD ids; -1 where the id is not in the store"""
+        satnums = np.atleast_1d(np.asarray(satnums, dtype=np.int64))
+        if self._row_of is None:
+            # NORAD ids (Alpha-5 included) stay below 340000, so a dense id -> row table is small
+            keys = self.features["satnum"]
+            self._row_of = np.full(int(keys.max()) + 2 if len(keys) else 1, -1, dtype=np.int64)
+            self._row_of[keys] = np.arange(len(keys))
+        in_range = (satnums >= 0) & (satnums < len(self._row_of))
+        return np.where(in_range, self._row_of[np.where(in_range, satnums, 0)], -1)
+
+    @property
+    def model_block(self):
+        """(n, 3) float64 block of the model's per-satellite columns, built on first use"""
+        if self._model_block is None:
+            self._model_block = np.stack([self.features[name] for name in MODEL_COLUMNS], axis=1)
+        return self._model_block
+
+    def model_features(self, satnums):
+        """(N, 3) model features for NORAD ids and a mask of the ids that were found"""
+        rows = self.rows_for(satnums)
+        found = rows >= 0
+        return np.where(found[:, None], self.model_block[np.maximum(rows, 0)], 0.0), found
+
+    def pair_features(self, satnums1, satnums2):
+        """(N, 6) model features for pairs of NORAD ids and a mask of the pairs with both ids found"""
+        rows1, rows2 = self.rows_for(satnums1), self.rows_for(satnums2)
+        found = (rows1 >= 0) & (rows2 >= 0)
+        return pair_matrix(self.model_block, np.maximum(rows1, 0), np.maximum(rows2, 0)), found
+
+    def save(self, directory):
+        """Write the features and metadata as a new version in directory and publish it"""
+        target = new_version_dir(directory, prefix=f"{self.version}-")
+        np.save(os.path.join(target, FEATURES_FILE), self.features)
+        with open(os.path.join(target, META_FILE), "w") as f:
+            json.dump({"catalog_version": self.version, "count": len(self)}, f, indent=2)
+        publish_version(directory, target)
+
+    @classmethod
+    def open(cls, directory):
+        version_dir = current_version_dir(directory)
+        if version_dir is None:
+            raise FileNotFoundError(f"No feature store in {directory}")
+        with open(os.path.join(version_dir, META_FILE)) as f:
+            meta = json.load(f)
+        return cls(np.load(os.path.join(version_dir, FEATURES_FILE), mmap_mode="r"), meta["catalog_version"])
+
+
+_store = None
+
+
+def default_feature_dir():
+    from django.conf import settings
+    return settings.ORBIT_FEATURE_DIR
+
+
+def get_feature_store():
+    """
+    The feature store for the current catalog version, or None if the
+    catalog store is not built. Features are computed and saved the first
+    time a version is seen, then memory-mapped by every other process.
+    """
+    global _store
+    catalog = open_default_catalog()
+    if catalog is None:
+        return None
+    if _store is not None and _store.version == catalog.version:
+        return _store
+
+    directory = str(default_feature_dir())
+    store = FeatureStore.open(directory) if current_version_dir(directory) else None
+    if store is None or store.version != catalog.version:
+        store = FeatureStore.from_records(catalog.records, catalog.version)
+        store.save(directory)
+    _store = store
+    return store
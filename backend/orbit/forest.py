@@ -0,0 +1,109 @@
+"""
+Compiled random forest.
+
+export_forest flattens every tree of a fitted RandomForestClassifier into
+one set of packed node arrays (feature, threshold, left/right child, leaf
+class probabilities) with the root of each tree recorded separately.
+CompiledForest walks all trees for a batch of rows at once: each pass moves
+every (row, tree) cursor one level down with flat fancy indexing, so a
+prediction costs max_depth small NumPy steps, without sklearn's input
+validation or per-tree dispatch.
+
+Results match sklearn exactly: inputs are rounded to float32 like sklearn
+does before comparing against the float64 thresholds, leaf values are
+normalised the same way and tree probabilities are summed in estimator
+order before dividing by the number of trees.
+"""
+import numpy as np
+
+LEAF = -1
+
+
+class CompiledForest:
+    def __init__(self, feature, threshold, children, value, roots, classes, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes
+        self.max_depth = int(max_depth)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def apply(self, X):
+        """(n_rows, n_trees) global index of the leaf each row reaches in each tree"""
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        n_rows, n_features = X.shape
+        flat = X.ravel()
+        row_offset = (np.arange(n_rows) * n_features)[:, None]
+        nodes = np.broadcast_to(self.roots, (n_rows, self.n_trees))
+        # leaves are their own children, so every cursor can take exactly max_depth steps
+        for _ in range(self.max_depth):
+            go_right = flat[row_offset + self.feature[nodes]] > self.threshold[nodes]
+            nodes = self.children[2 * nodes + go_right]
+        return nodes
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        # summed tree by tree in estimator order, like sklearn's accumulation, without
+        # materialising an (n_rows, n_trees, n_classes) gather
+        proba = np.zeros((len(leaves), self.value.shape[1]))
+        for tree in range(self.n_trees):
+            proba += self.value[leaves[:, tree]]
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    def save(self, path):
+        np.savez(
+            path, feature=self.feature, threshold=self.threshold, children=self.children,
+            value=self.value, roots=self.roots, classes=self.classes_, max_depth=self.max_depth,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["feature"], data["threshold"], data["children"], data["value"],
+                data["roots"], data["classes"], data["max_depth"],
+            )
+
+
+def export_forest(model):
+    """
+    Flatten a fitted RandomForestClassifier (single output) into a
+    CompiledForest. children holds [left, right] per node, interleaved, with
+    global node indices; leaves point back at themselves.
+    """
+    features, thresholds, children, values, roots = [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        nodes = np.arange(tree.node_count)
+        leaf = tree.children_left == LEAF
+        features.append(np.where(leaf, 0, tree.feature).astype(np.intp))
+        thresholds.append(np.where(leaf, 0.0, tree.threshold).astype(np.float64))
+        pair = np.stack([
+            np.where(leaf, nodes, tree.children_left),
+            np.where(leaf, nodes, tree.children_right),
+        ], axis=1)
+        children.append((pair + offset).astype(np.intp).ravel())
+        # normalise leaf class weights exactly as DecisionTreeClassifier.predict_proba does
+        value = tree.value[:, 0, :model.n_classes_].astype(np.float64)
+        normalizer = value.sum(axis=1)[:, None]
+        normalizer[normalizer == 0.0] = 1.0
+        values.append(value / normalizer)
+        roots.append(offset)
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+
+    return CompiledForest(
+        np.concatenate(features), np.concatenate(thresholds), np.concatenate(children),
+        np.concatenate(values), np.asarray(roots, dtype=np.intp), np.asarray(model.classes_), max_depth,
+    )
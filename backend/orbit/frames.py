@@ -0,0 +1,114 @@
+"""
+Frame conversion of SGP4 output.
+
+sgp4 returns positions and velocities in TEME (True Equator, Mean Equinox).
+TEME and the Earth-fixed frame (ECEF) differ by one rotation about the z axis
+through the Greenwich mean sidereal time. Polar motion moves a point by a few
+metres at most and is ignored. So each timestamp needs one angle, and every
+satellite at that timestamp shares it. A catalog snapshot is one angle and a
+few array operations over all rows. Geodetic coordinates are on the WGS84
+ellipsoid, the one Cesium and GPS use.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+FRAMES = ("teme", "ecef", "geodetic")
+
+EARTH_ROTATION_RAD_S = 7.292115146706979e-5
+WGS84_A_KM = 6378.137
+WGS84_F = 1.0 / 298.257223563
+WGS84_B_KM = WGS84_A_KM * (1.0 - WGS84_F)
+WGS84_E2 = WGS84_F * (2.0 - WGS84_F)
+# second eccentricity squared
+WGS84_EP2 = WGS84_E2 / (1.0 - WGS84_E2)
+
+
+def gmst(jd, fr):
+    """Greenwich mean sidereal time in radians (IAU-82, as sgp4 uses) at each jd + fr"""
+    jd = np.asarray(jd, dtype=np.float64)
+    fr = np.asarray(fr, dtype=np.float64)
+    centuries = ((jd - 2451545.0) + fr) / 36525.0
+    seconds = (
+        67310.54841 + (876600.0 * 3600.0 + 8640184.812866) * centuries
+        + 0.093104 * centuries ** 2 - 6.2e-6 * centuries ** 3
+    )
+    return np.remainder(seconds * (2.0 * np.pi / 86400.0), 2.0 * np.pi)
+
+
+@lru_cache(maxsize=256)
+def _instant_rotation(jd, fr):
+    # every poll of a live tick asks for the same instant
+    angle = float(gmst(jd, fr))
+    return np.cos(angle), np.sin(angle)
+
+
+def earth_rotation(jd, fr):
+    """(cos, sin) of GMST per timestamp; single instants are cached"""
+    if np.ndim(jd) == 0 and np.ndim(fr) == 0:
+        return _instant_rotation(float(jd), float(fr))
+    angle = gmst(jd, fr)
+    return np.cos(angle), np.sin(angle)
+
+
+def teme_to_ecef(positions, jd, fr, velocities=None):
+    """
+    Rotate (..., 3) TEME positions (km) into ECEF. jd and fr are one instant
+    or one per row of the second-to-last axis, e.g. (T,) for a (T, 3) trail
+    or an (N, T, 3) block. Velocities (km/s) also lose the Earth's rotation.
+    Returns (positions, velocities); velocities is None if not given.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    cos, sin = earth_rotation(jd, fr)
+    x, y = positions[..., 0], positions[..., 1]
+    ecef = np.empty_like(positions)
+    ecef[..., 0] = cos * x + sin * y
+    ecef[..., 1] = cos * y - sin * x
+    ecef[..., 2] = positions[..., 2]
+    if velocities is None:
+        return ecef, None
+    velocities = np.asarray(velocities, dtype=np.float64)
+    vx, vy = velocities[..., 0], velocities[..., 1]
+    ecef_velocities = np.empty_like(velocities)
+    ecef_velocities[..., 0] = cos * vx + sin * vy + EARTH_ROTATION_RAD_S * ecef[..., 1]
+    ecef_velocities[..., 1] = cos * vy - sin * vx - EARTH_ROTATION_RAD_S * ecef[..., 0]
+    ecef_velocities[..., 2] = velocities[..., 2]
+    return ecef, ecef_velocities
+
+
+def ecef_to_geodetic(positions):
+    """
+    (..., 3) ECEF positions (km) as (..., 3) geodetic latitude (degrees),
+    longitude (degrees, -180 to 180) and height above the ellipsoid (km).
+    Bowring's formula with one refinement is well under a millimetre from
+    the exact solution for anything above the Earth's surface.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    x, y, z = positions[..., 0], positions[..., 1], positions[..., 2]
+    p = np.hypot(x, y)
+    reduced = np.arctan2(z * WGS84_A_KM, p * WGS84_B_KM)
+    for _ in range(2):
+        latitude = np.arctan2(
+            z + WGS84_EP2 * WGS84_B_KM * np.sin(reduced) ** 3,
+            p - WGS84_E2 * WGS84_A_KM * np.cos(reduced) ** 3
+        )
+        reduced = np.arctan((1.0 - WGS84_F) * np.tan(latitude))
+    sin_lat = np.sin(latitude)
+    height = p * np.cos(latitude) + z * sin_lat - WGS84_A_KM * np.sqrt(1.0 - WGS84_E2 * sin_lat ** 2)
+    return np.stack([np.degrees(latitude), np.degrees(np.arctan2(y, x)), height], axis=-1)
+
+
+def convert_frame(frame, positions, jd, fr, velocities=None):
+    """
+    TEME positions (and velocities) in one of FRAMES. Geodetic positions are
+    (latitude, longitude, height) rows; their velocities stay ECEF.
+    Returns (positions, velocities).
+    """
+    if frame == "teme":
+        return positions, velocities
+    if frame not in FRAMES:
+        raise ValueError(f"Unknown frame {frame!r}; expected one of {', '.join(FRAMES)}")
+    positions, velocities = teme_to_ecef(positions, jd, fr, velocities)
+    if frame == "geodetic":
+        positions = ecef_to_geodetic(positions)
+    return positions, velocities
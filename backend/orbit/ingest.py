@@ -0,0 +1,154 @@
+"""
+Incremental catalog ingest.
+
+A new TLE file (a full catalog or a dropped-in update file) is diffed
+against the stored catalog by NORAD id and element set, giving the objects
+that were added, changed or removed. Only those are processed downstream:
+the ephemeris table re-propagates just their rows, and every ingest
+appends one line to a change log next to the catalog, which web processes
+follow to drop cached results for the affected NORAD ids. Screening and
+tracking caches are keyed by the catalog version and reload on their own.
+"""
+import datetime
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from .catalog import CATALOG_DTYPE, Catalog, parse_tle_records, read_tle_lines, save_catalog
+from .versioned import current_version_dir
+
+CHANGES_FILE = "changes.jsonl"
+
+CatalogDiff = namedtuple("CatalogDiff", ["added", "changed", "removed"])
+
+
+def latest_per_satnum(records):
+    """Drop duplicate NORAD ids, keeping the element set with the newest epoch"""
+    order = np.lexsort((records["epoch_fr"], records["epoch_jd"], records["satnum"]))
+    ordered = records[order]
+    last = np.ones(len(ordered), dtype=bool)
+    last[:-1] = ordered["satnum"][1:] != ordered["satnum"][:-1]
+    return ordered[last]
+
+
+def diff_catalogs(old, new):
+    """
+    NORAD ids added, changed and removed between two record arrays (one row
+    per id). An object counts as changed when its element set number, epoch
+    or TLE text differ.
+    """
+    old = old[np.argsort(old["satnum"], kind="stable")]
+    new = new[np.argsort(new["satnum"], kind="stable")]
+    common, old_rows, new_rows = np.intersect1d(old["satnum"], new["satnum"], return_indices=True)
+    a, b = old[old_rows], new[new_rows]
+    differs = (
+        (a["element_set"] != b["element_set"])
+        | (a["epoch_jd"] != b["epoch_jd"]) | (a["epoch_fr"] != b["epoch_fr"])
+        | (a["line1"] != b["line1"]) | (a["line2"] != b["line2"])
+    )
+    return CatalogDiff(
+        added=np.setdiff1d(new["satnum"], old["satnum"]).astype(np.int64),
+        changed=common[differs].astype(np.int64),
+        removed=np.setdiff1d(old["satnum"], new["satnum"]).astype(np.int64),
+    )
+
+
+def merge_update(old, update):
+    """Apply a partial update: its objects replace or extend the catalog, nothing is removed"""
+    kept = old[~np.isin(old["satnum"], update["satnum"])]
+    merged = np.concatenate([kept, update.astype(CATALOG_DTYPE)])
+    return merged[np.argsort(merged["satnum"], kind="stable")]
+
+
+def ingest_catalog(source, directory, partial=False, dry_run=False):
+    """
+    Diff a TLE file against the catalog store in directory and save the
+    result when anything changed. With partial=True the file is an update
+    that only lists some objects, so nothing is removed.
+    Returns (diff, summary dict).
+    """
+    names, line1s, line2s = read_tle_lines(source)
+    incoming, rejected = parse_tle_records(names, line1s, line2s)
+    incoming = latest_per_satnum(incoming)
+
+    current = Catalog.open(directory, mmap_mode=None) if current_version_dir(directory) else None
+    old = current.records if current is not None else np.zeros(0, dtype=CATALOG_DTYPE)
+    old_version = current.version if current is not None else None
+
+    records = merge_update(old, incoming) if partial else incoming
+    diff = diff_catalogs(old, records)
+    summary = {
+        "source": os.path.abspath(source),
+        "rejected": rejected,
+        "added": len(diff.added),
+        "changed": len(diff.changed),
+        "removed": len(diff.removed),
+        "count": len(records),
+        "version": old_version,
+        "previous_version": old_version,
+    }
+    if dry_run or not (len(diff.added) or len(diff.changed) or len(diff.removed)):
+        return diff, summary
+
+    meta = save_catalog(records, directory, source=source)
+    summary["version"] = meta["version"]
+    record_changes(directory, diff, old_version, meta["version"])
+    return diff, summary
+
+
+def record_changes(directory, diff, from_version, to_version):
+    """Append one ingest to the change log that cache owners in other processes follow"""
+    entry = {
+        "at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "from_version": from_version,
+        "to_version": to_version,
+        "added": diff.added.tolist(),
+        "changed": diff.changed.tolist(),
+        "removed": diff.removed.tolist(),
+    }
+    with open(os.path.join(directory, CHANGES_FILE), "a") as f:
+        f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+
+class ChangeFollower:
+    """
+    Tails a catalog change log. poll() is one stat when nothing happened;
+    after an ingest it returns the NORAD ids that were changed or removed
+    since the last poll, or None if the log was replaced and the caller
+    should treat everything as changed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = os.path.getsize(path) if os.path.exists(path) else 0
+
+    def poll(self):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        if size == self.offset:
+            return set()
+        if size < self.offset:
+            self.offset = size
+            return None
+        satnums = set()
+        with open(self.path) as f:
+            f.seek(self.offset)
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # a write in progress; pick it up on the next poll
+                entry = json.loads(line)
+                satnums.update(entry["changed"])
+                satnums.update(entry["removed"])
+                self.offset += len(line.encode())
+        return satnums
+
+
+def changes_path(directory=None):
+    if directory is None:
+        from django.conf import settings
+        directory = settings.ORBIT_CATALOG_DIR
+    return os.path.join(str(directory), CHANGES_FILE)
@@ -0,0 +1,291 @@
+"""
+Background jobs for work too long for a request: multi-object trails,
+bulk predictions and catalog screening.
+
+The API stores a Job row and returns its id. `manage.py run_jobs` starts
+worker processes that claim queued rows from the same database (no broker;
+a conditional UPDATE settles which worker gets a row), report progress on
+the row and store the result in the packed array layout of
+orbit.renderers, so the result endpoint can serve it without re-encoding.
+Finished jobs expire after ORBIT_JOB_RESULT_TTL seconds and are deleted by
+the workers.
+"""
+import datetime
+import os
+import socket
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from sgp4.api import Satrec # type: ignore
+
+from .model_registry import get_predictor
+from .models import Job
+from .prediction import predict_pairs
+from .renderers import pack_arrays
+from .sampling import decimate, trail_positions, trail_step
+from .screening import describe_conjunction, get_catalog, prefiltered_screen, screen_catalog
+from .serializers import BatchPredictionJobSerializer, ScreeningRequestSerializer, TrailJobSerializer
+
+# pairs scored per model call in a prediction job; progress is reported between calls
+PREDICT_CHUNK_PAIRS = 5000
+# seconds between progress writes, so a fast loop does not hammer the database
+PROGRESS_INTERVAL = 0.5
+# seconds between sweeps for expired jobs
+PURGE_INTERVAL = 60.0
+
+
+class JobProgress:
+    """progress(fraction, message) callback writing to the job row, throttled to PROGRESS_INTERVAL"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.written = 0.0
+
+    def __call__(self, fraction, message=""):
+        now = time.monotonic()
+        if now - self.written < PROGRESS_INTERVAL:
+            return
+        self.written = now
+        Job.objects.filter(pk=self.job_id).update(progress=min(max(fraction, 0.0), 1.0), message=message[:200])
+
+
+def run_trail_job(params, progress):
+    """
+    Trails of several objects, concatenated into one float32 array split by
+    counts. Sample k of trail t is at epoch + k * step_seconds[t]; decimated
+    trails list their sample numbers in indices.
+    """
+    start = params['start'].astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    tolerance_km = settings.ORBIT_TRAIL_TOLERANCE_KM
+    trails, indices, steps, satnums, errors = [], [], [], [], []
+    for index, tle in enumerate(params['tles']):
+        try:
+            line1, line2 = tle.strip().split("\n")
+            sat = Satrec.twoline2rv(line1.strip(), line2.strip())
+            step = params.get('step_seconds') or trail_step([sat], tolerance_km)
+            positions = trail_positions(sat, params['minutes'], step, start)
+            kept = decimate(positions, tolerance_km) if params['decimate'] else np.arange(len(positions))
+            trails.append(positions[kept])
+            indices.append(kept)
+            steps.append(step)
+            satnums.append(sat.satnum)
+        except Exception as e:
+            trails.append(np.zeros((0, 3)))
+            indices.append(np.zeros(0, dtype=np.int64))
+            steps.append(0)
+            satnums.append(0)
+            errors.append({"index": index, "error": str(e)})
+        progress((index + 1) / len(params['tles']), f"{index + 1}/{len(params['tles'])} trails")
+    result = {
+        "epoch": params['start'].isoformat(),
+        "errors": errors,
+        "norad_ids": np.array(satnums, dtype=np.int32),
+        "step_seconds": np.array(steps, dtype=np.int32),
+        "counts": np.array([len(trail) for trail in trails], dtype=np.int32),
+        "positions": np.concatenate(trails).astype(np.float32),
+    }
+    if params['decimate']:
+        result["indices"] = np.concatenate(indices).astype(np.int32)
+    return result
+
+
+def run_predict_job(params, progress):
+    """
+    Batch prediction without the per-request pair limit. collision is 1, 0,
+    or -1 for pairs listed in errors; their probability is NaN.
+    """
+    pairs = params['pairs']
+    collision = np.full(len(pairs), -1, dtype=np.int8)
+    probability = np.full(len(pairs), np.nan, dtype=np.float32)
+    errors = []
+    for first in range(0, len(pairs), PREDICT_CHUNK_PAIRS):
+        chunk = pairs[first:first + PREDICT_CHUNK_PAIRS]
+        for result in predict_pairs(get_predictor(len(chunk)), chunk):
+            index = first + result["index"]
+            if "error" in result:
+                errors.append({"index": index, "error": result["error"]})
+            else:
+                collision[index] = result["prediction"] == "collision"
+                probability[index] = result["collision_probability"]
+        progress((first + len(chunk)) / len(pairs), f"{first + len(chunk)}/{len(pairs)} pairs")
+    return {
+        "total_count": len(pairs),
+        "error_count": len(errors),
+        "errors": errors,
+        "collision": collision,
+        "collision_probability": probability,
+    }
+
+
+def run_screen_job(params, progress):
+    """Catalog screening as /screen/ runs it, with a window of up to 24 hours"""
+    start = params['start']
+    step_seconds = params['step_seconds']
+    names, satnums, satrecs = get_catalog(params['source'])
+    screen = prefiltered_screen if params['prefilter'] else screen_catalog
+    result = screen(
+        satrecs, start, params['window_hours'] * 3600,
+        step_seconds=step_seconds, threshold_km=params['threshold_km'],
+        search_radius_km=params.get('search_radius_km'), workers=settings.ORBIT_SCREEN_WORKERS,
+        progress=lambda done, total: progress(done / total, f"step {done}/{total}")
+    )
+    events, prefilter_stats = result if params['prefilter'] else (result, None)
+    return {
+        "start": start.isoformat(),
+        "objects_screened": len(satrecs),
+        "total_count": len(events),
+        "prefilter": prefilter_stats,
+        "conjunctions": [
+            describe_conjunction(event, names, satnums, start, step_seconds)
+            for event in events[:params['max_results']]
+        ],
+    }
+
+
+# job kind -> (parameter serializer, runner); runners return a dict for pack_arrays
+JOB_KINDS = {
+    "trail": (TrailJobSerializer, run_trail_job),
+    "predict": (BatchPredictionJobSerializer, run_predict_job),
+    "screen": (ScreeningRequestSerializer, run_screen_job),
+}
+
+
+def validate_params(kind, params):
+    """Validated parameters of a job kind; raises the serializer's ValidationError"""
+    serializer = JOB_KINDS[kind][0](data=params)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data
+
+
+def submit_job(kind, params):
+    """Validate and queue a job. A missing start is fixed to now, so the result does not depend on queueing delay."""
+    params = dict(params)
+    if "start" in JOB_KINDS[kind][0]().fields and not params.get("start"):
+        params["start"] = timezone.now().isoformat()
+    validate_params(kind, params)
+    return Job.objects.create(kind=kind, params=params)
+
+
+def job_status(job):
+    """Status payload of a job (everything but the result)"""
+    return {
+        "id": str(job.pk),
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.message,
+        "error": job.error or None,
+        "result_bytes": job.result_bytes,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "expires_at": job.expires_at.isoformat() if job.expires_at else None,
+    }
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_job(worker):
+    """Oldest queued job, now marked as running by worker; None when the queue is empty"""
+    while True:
+        candidate = Job.objects.filter(status=Job.QUEUED).order_by("created_at").values_list("pk", flat=True).first()
+        if candidate is None:
+            return None
+        # only one worker's UPDATE still sees the row as queued
+        claimed = Job.objects.filter(pk=candidate, status=Job.QUEUED).update(
+            status=Job.RUNNING, worker=worker, started_at=timezone.now(), attempts=F("attempts") + 1
+        )
+        if claimed:
+            return Job.objects.defer("result").get(pk=candidate)
+
+
+def run_job(job):
+    """Run a claimed job and store its result or error; returns True if it succeeded"""
+    try:
+        params = validate_params(job.kind, job.params)
+        blob = pack_arrays(JOB_KINDS[job.kind][1](params, JobProgress(job.pk)))
+    except Exception as e:
+        finished = timezone.now()
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.FAILED, error=f"{type(e).__name__}: {e}", finished_at=finished,
+            expires_at=finished + datetime.timedelta(seconds=settings.ORBIT_JOB_RESULT_TTL)
+        )
+        return False
+    finished = timezone.now()
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.DONE, progress=1.0, message="", result=blob, result_bytes=len(blob), finished_at=finished,
+        expires_at=finished + datetime.timedelta(seconds=settings.ORBIT_JOB_RESULT_TTL)
+    )
+    return True
+
+
+def purge_expired():
+    """Delete finished jobs past their expiry time; returns how many were deleted"""
+    deleted, _ = Job.objects.filter(expires_at__lt=timezone.now()).delete()
+    return deleted
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def recover_orphans():
+    """
+    Jobs left running by workers on this host that no longer exist go back
+    to the queue, or fail once they used up ORBIT_JOB_MAX_ATTEMPTS.
+    Returns (requeued, failed).
+    """
+    host = socket.gethostname()
+    requeued = failed = 0
+    for job in Job.objects.filter(status=Job.RUNNING, worker__startswith=f"{host}:").defer("result"):
+        pid = job.worker.rsplit(":", 1)[1]
+        if pid.isdigit() and _alive(int(pid)):
+            continue
+        if job.attempts < settings.ORBIT_JOB_MAX_ATTEMPTS:
+            requeued += Job.objects.filter(pk=job.pk, status=Job.RUNNING).update(
+                status=Job.QUEUED, progress=0.0, message="", worker="", started_at=None
+            )
+        else:
+            finished = timezone.now()
+            failed += Job.objects.filter(pk=job.pk, status=Job.RUNNING).update(
+                status=Job.FAILED, error="Worker exited while running the job", finished_at=finished,
+                expires_at=finished + datetime.timedelta(seconds=settings.ORBIT_JOB_RESULT_TTL)
+            )
+    return requeued, failed
+
+
+def run_worker(poll_seconds=None, stop=None, once=False):
+    """
+    Claim and run jobs until stop (a threading/multiprocessing Event) is
+    set, or, with once, until the queue is empty. Returns the number of jobs run.
+    """
+    poll_seconds = settings.ORBIT_JOB_POLL_SECONDS if poll_seconds is None else poll_seconds
+    worker = worker_name()
+    ran, last_purge = 0, float("-inf")
+    while stop is None or not stop.is_set():
+        if time.monotonic() - last_purge > PURGE_INTERVAL:
+            purge_expired()
+            last_purge = time.monotonic()
+        job = claim_job(worker)
+        if job is None:
+            if once:
+                break
+            if stop is not None:
+                stop.wait(poll_seconds)
+            else:
+                time.sleep(poll_seconds)
+            continue
+        run_job(job)
+        ran += 1
+    return ran
@@ -1,11 +1,38 @@
-import pandas as pd
-from sgp4.api import Satrec, jday
-from math import sqrt
+import argparse
 import datetime
+import hashlib
+import json
+import os
 import random
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from math import sqrt
+
+import numpy as np
+import pandas as pd
+from sgp4.api import Satrec, jday
+
+try:
+    from .features import MODEL_COLUMNS, pair_matrix
+    from .prefilters import KEPT, STAGE_NAMES, anchor_elements, orbital_elements, prefilter_pairs
+    from .tca import closest_approach
+except ImportError:  # run as a script: make the orbit package importable
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from orbit.features import MODEL_COLUMNS, pair_matrix
+    from orbit.prefilters import KEPT, STAGE_NAMES, anchor_elements, orbital_elements, prefilter_pairs
+    from orbit.tca import closest_approach
 
-# Load your TLE CSV file
-df = pd.read_csv("tle_data.csv")  # Ensure this exists
+# distance_stage says where min_distance_km came from: "propagated" (true
+# minimum over the window), "synthetic" (collision rows), or the name of the
+# prefilter stage that proved the pair never comes within prefilter_pad_km;
+# those pairs are not propagated and their min_distance_km is empty (NaN)
+COLUMNS = [
+    "sat1_inclination", "sat1_eccentricity", "sat1_mean_motion",
+    "sat2_inclination", "sat2_eccentricity", "sat2_mean_motion",
+    "min_distance_km", "label", "distance_stage",
+]
+
+MANIFEST_NAME = "manifest.json"
 
 def euclidean_distance(pos1, pos2):
     x1, y1, z1 = pos1
@@ -13,71 +40,215 @@ def euclidean_distance(pos1, pos2):
     return sqrt((x1 - x2)**2 + (y1 - y2)**2 + (z1 - z2)**2)
 
 # this function run a simulation of two satellites for 10 min and sees whether they collide or not
-def simulate_distance(sat1, sat2, now, time_step_seconds=10, duration_minutes=10):
-    min_distance = float("inf")
-    for t in range(0, duration_minutes * 60, time_step_seconds):
-        jd, fr = jday(now.year, now.month, now.day, now.hour, now.minute, now.second + t)
-        e1, r1, _ = sat1.sgp4(jd, fr)
-        e2, r2, _ = sat2.sgp4(jd, fr)
-        if e1 == 0 and e2 == 0:
-            dist = euclidean_distance(r1, r2)
-            if dist < min_distance:
-                min_distance = dist
-    return min_distance
-
-def generate_dataset(tle_df, no_collision_limit=900, collision_limit=300, threshold_km=0.001):
-    dataset = []
-    num_rows = len(tle_df)
-    now = datetime.datetime.utcnow()
-
-    # Generate no-collision data
-    for i in range(min(no_collision_limit, num_rows)):
-        for j in range(i + 1, i + 2):  # 1 pair per satellite
-            sat1 = Satrec.twoline2rv(tle_df.iloc[i]["line1"], tle_df.iloc[i]["line2"])
-            sat2 = Satrec.twoline2rv(tle_df.iloc[j]["line1"], tle_df.iloc[j]["line2"])
-            dist = simulate_distance(sat1, sat2, now)
-            dataset.append({
-                "sat1_inclination": sat1.inclo,
-                "sat1_eccentricity": sat1.ecco,
-                "sat1_mean_motion": sat1.no_kozai,
-                "sat2_inclination": sat2.inclo,
-                "sat2_eccentricity": sat2.ecco,
-                "sat2_mean_motion": sat2.no_kozai,
-                "min_distance_km": dist,
-                "label": "no_collision"
-            })
-
-    # Generate synthetic collision data
-    for _ in range(collision_limit):
-        i = random.randint(0, num_rows - 1)
-        j = random.randint(0, num_rows - 1)
-        sat1 = Satrec.twoline2rv(tle_df.iloc[i]["line1"], tle_df.iloc[i]["line2"])
-        sat2 = Satrec.twoline2rv(tle_df.iloc[j]["line1"], tle_df.iloc[j]["line2"])
+def simulate_distance(sat1, sat2, now, time_step_seconds=60, duration_minutes=10):
+    """
+    Minimum distance over the window. The grid only brackets range-rate sign
+    changes; the minimum itself is found by root finding, so a coarse step
+    still gives metre-level accuracy.
+    """
+    approach = closest_approach(sat1, sat2, now, duration_minutes * 60, coarse_step=time_step_seconds)
+    return approach["miss_distance_km"] if approach else float("inf")
+
+def load_satellites(line1s, line2s):
+    """Parse every TLE once into a list of Satrec plus the element arrays the prefilters use"""
+    sats = [Satrec.twoline2rv(line1, line2) for line1, line2 in zip(line1s, line2s)]
+    return sats, orbital_elements(sats)
+
+def feature_block(elements):
+    """(n, 3) per-satellite model features (inclination, eccentricity, mean motion) from orbital_elements"""
+    return np.stack([elements[name] for name in MODEL_COLUMNS], axis=1)
+
+def feature_rows(block, i, j, distances, label, stage):
+    """Dataset rows for pairs (i[n], j[n]), gathered from the per-satellite feature block in one step"""
+    frame = pd.DataFrame(pair_matrix(block, i, j), columns=COLUMNS[:6])
+    frame["min_distance_km"] = distances
+    frame["label"] = label
+    frame["distance_stage"] = stage
+    return frame
+
+# per-process state, filled once by _init_worker so shards never re-parse TLEs
+_worker = {}
+
+def _init_worker(line1s, line2s, start_iso, duration_minutes, prefilter_pad_km):
+    now = datetime.datetime.fromisoformat(start_iso)
+    sats, elements = load_satellites(line1s, line2s)
+    jd, fr = jday(now.year, now.month, now.day, now.hour, now.minute, now.second)
+    _worker.update({
+        "sats": sats,
+        "features": feature_block(elements),
+        "elements": anchor_elements(elements, sats, jd + fr, duration_minutes * 60),
+        "start_jd": jd + fr,
+        "now": now,
+        "duration_minutes": duration_minutes,
+        "pad_km": prefilter_pad_km,
+    })
+
+def _no_collision_rows(first, last, pairs_per_satellite):
+    """
+    Pairs (i, i + 1 .. i + pairs_per_satellite) numbered in order; this shard
+    covers pair numbers [first, last). Pairs rejected by the orbital-geometry
+    prefilters are never propagated: their min_distance_km is NaN (all that
+    is known is that it exceeds the pad) and distance_stage names the stage.
+    """
+    sats = _worker["sats"]
+    numbers = np.arange(first, last)
+    i = numbers // pairs_per_satellite
+    j = i + numbers % pairs_per_satellite + 1
+    pairs = np.stack([i, j], axis=1)[j < len(sats)]
+
+    stage, _ = prefilter_pairs(
+        _worker["elements"], pairs, pad_km=_worker["pad_km"],
+        start_jd=_worker["start_jd"], window_seconds=_worker["duration_minutes"] * 60
+    )
+    distances = np.full(len(pairs), np.nan)
+    for k in np.flatnonzero(stage == KEPT).tolist():
+        i, j = pairs[k]
+        distances[k] = simulate_distance(sats[i], sats[j], _worker["now"], duration_minutes=_worker["duration_minutes"])
+    names = np.array([STAGE_NAMES.get(code, "propagated") for code in stage.tolist()], dtype=object)
+    return feature_rows(_worker["features"], pairs[:, 0], pairs[:, 1], distances, "no_collision", names)
+
+def _collision_rows(first, last, seed):
+    """Synthetic collision rows; each shard has its own seeded generator so reruns are identical"""
+    count = len(_worker["sats"])
+    rng = random.Random(f"{seed}-{first}")
+    i, j, distances = [], [], []
+    for _ in range(first, last):
+        i.append(rng.randint(0, count - 1))
+        j.append(rng.randint(0, count - 1))
 
         # simulate close distance
-        r1 = [random.uniform(1000, 2000) for _ in range(3)]
-        r2 = [r1[0] + random.uniform(-0.0001, 0.0001),
-              r1[1] + random.uniform(-0.0001, 0.0001),
-              r1[2] + random.uniform(-0.0001, 0.0001)]
-
-        dist = euclidean_distance(r1, r2)
-
-        dataset.append({
-            "sat1_inclination": sat1.inclo,
-            "sat1_eccentricity": sat1.ecco,
-            "sat1_mean_motion": sat1.no_kozai,
-            "sat2_inclination": sat2.inclo,
-            "sat2_eccentricity": sat2.ecco,
-            "sat2_mean_motion": sat2.no_kozai,
-            "min_distance_km": dist,
-            "label": "collision"
-        })
-
-    return pd.DataFrame(dataset)
-
-# Generate full dataset
-df_final = generate_dataset(df, no_collision_limit=900, collision_limit=300)
-
-# Save
-df_final.to_csv("collision_dataset.csv", index=False)
-print("collision_dataset.csv created with 900 no_collisions and 300 collisions.")
+        r1 = [rng.uniform(1000, 2000) for _ in range(3)]
+        r2 = [r1[0] + rng.uniform(-0.0001, 0.0001),
+              r1[1] + rng.uniform(-0.0001, 0.0001),
+              r1[2] + rng.uniform(-0.0001, 0.0001)]
+
+        distances.append(euclidean_distance(r1, r2))
+    i, j = np.array(i, dtype=np.intp), np.array(j, dtype=np.intp)
+    return feature_rows(_worker["features"], i, j, distances, "collision", "synthetic")
+
+def _run_shard(kind, first, last, path, pairs_per_satellite, seed):
+    """Build one shard and write it atomically, so a chunk file on disk is always complete"""
+    if kind == "no_collision":
+        rows = _no_collision_rows(first, last, pairs_per_satellite)
+    else:
+        rows = _collision_rows(first, last, seed)
+    tmp_path = path + ".tmp"
+    rows[COLUMNS].to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return path, len(rows)
+
+def _load_manifest(out_dir, params):
+    """Reuse the run's start time when resuming; refuse to mix chunks from different settings"""
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    if os.path.exists(path):
+        with open(path) as f:
+            manifest = json.load(f)
+        if manifest["params"] != params:
+            raise ValueError(f"{out_dir} holds chunks generated with different settings: {manifest['params']}")
+        return manifest
+    manifest = {"start": datetime.datetime.utcnow().replace(microsecond=0).isoformat(), "params": params}
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def _tle_digest(line1s, line2s):
+    """sha1 over every TLE line, so a resumed run notices an edited input of the same length"""
+    digest = hashlib.sha1()
+    for line1, line2 in zip(line1s, line2s):
+        digest.update(f"{line1}\n{line2}\n".encode())
+    return digest.hexdigest()
+
+def generate_dataset(tle_df, out_dir, no_collision_limit=900, collision_limit=300, pairs_per_satellite=1,
+                     duration_minutes=10, prefilter_pad_km=20.0, shard_size=1000, workers=None, seed=0):
+    """
+    Generate labelled pairs into numbered chunk files under out_dir.
+    Work is split into shards of shard_size rows run on a process pool; each
+    worker parses the catalog once. Finished chunks are skipped on rerun, so
+    an interrupted run resumes where it stopped. Memory is bounded by the
+    shards in flight, not the dataset size.
+    Returns the chunk paths in order.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    line1s, line2s = tle_df["line1"].str.strip().tolist(), tle_df["line2"].str.strip().tolist()
+    params = {
+        "rows": len(tle_df), "tle_sha1": _tle_digest(line1s, line2s),
+        "no_collision_limit": no_collision_limit, "collision_limit": collision_limit,
+        "pairs_per_satellite": pairs_per_satellite, "duration_minutes": duration_minutes,
+        "prefilter_pad_km": prefilter_pad_km, "shard_size": shard_size, "seed": seed,
+    }
+    manifest = _load_manifest(out_dir, params)
+
+    num_rows = len(tle_df)
+    no_collision_pairs = min(no_collision_limit, num_rows - 1) * pairs_per_satellite
+    shards = []
+    for kind, total in (("no_collision", no_collision_pairs), ("collision", collision_limit)):
+        for first in range(0, total, shard_size):
+            path = os.path.join(out_dir, f"chunk_{len(shards):06d}.csv")
+            shards.append((kind, first, min(first + shard_size, total), path, pairs_per_satellite, seed))
+
+    pending = [shard for shard in shards if not os.path.exists(shard[3])]
+    print(f"{len(shards) - len(pending)} of {len(shards)} chunks already done")
+
+    init_args = (line1s, line2s, manifest["start"], duration_minutes, prefilter_pad_km)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        _init_worker(*init_args)
+        for shard in pending:
+            _run_shard(*shard)
+    elif pending:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as pool:
+            queue = iter(pending)
+            in_flight = set()
+            done_count = 0
+            while True:
+                for shard in queue:
+                    in_flight.add(pool.submit(_run_shard, *shard))
+                    if len(in_flight) >= workers * 2:
+                        break
+                if not in_flight:
+                    break
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    future.result()
+                    done_count += 1
+                print(f"  {done_count}/{len(pending)} chunks", end="\r")
+            print()
+
+    return [shard[3] for shard in shards]
+
+def merge_chunks(chunk_paths, output_path):
+    """Concatenate chunk files into one CSV without loading them all at once"""
+    with open(output_path, "w") as out:
+        out.write(",".join(COLUMNS) + "\n")
+        for path in chunk_paths:
+            with open(path) as chunk:
+                next(chunk, None)
+                for line in chunk:
+                    out.write(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the labelled collision dataset")
+    parser.add_argument("--tle", default="tle_data.csv", help="TLE CSV written by parse_tle.py")
+    parser.add_argument("--out-dir", default="dataset_chunks", help="Directory for resumable chunk files")
+    parser.add_argument("--output", default="collision_dataset.csv", help="Merged CSV ('' to skip merging)")
+    parser.add_argument("--no-collision-limit", type=int, default=900)
+    parser.add_argument("--collision-limit", type=int, default=300)
+    parser.add_argument("--pairs-per-satellite", type=int, default=1)
+    parser.add_argument("--shard-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tle_df = pd.read_csv(args.tle)
+    chunks = generate_dataset(
+        tle_df, args.out_dir,
+        no_collision_limit=args.no_collision_limit, collision_limit=args.collision_limit,
+        pairs_per_satellite=args.pairs_per_satellite, shard_size=args.shard_size,
+        workers=args.workers, seed=args.seed
+    )
+    if args.output:
+        merge_chunks(chunks, args.output)
+        print(f"{args.output} created from {len(chunks)} chunks.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import datetime
+import json
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.utils.dateparse import parse_datetime
+
+from orbit.benchmarks import BenchmarkSuite, compare_results, environment, load_base_records
+from orbit.screening import CATALOG_SOURCES
+
+
+class Command(BaseCommand):
+    help = "Time the propagation, screening, inference and serialization hot paths on synthetic catalogs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", default="tle_data",
+                            help="Catalog name (active, tle_data) or TLE/CSV file the synthetic catalogs derive from")
+        parser.add_argument("--sizes", default="1000,10000,50000", help="Comma-separated synthetic catalog sizes")
+        parser.add_argument("--only", help="Comma-separated benchmark names to run (default: all)")
+        parser.add_argument("--repeat", type=int, default=5, help="Timed calls per benchmark")
+        parser.add_argument("--warmup", type=int, default=1, help="Untimed calls before timing each benchmark")
+        parser.add_argument("--screen-minutes", type=float, default=10.0, help="Screening window in minutes")
+        parser.add_argument("--screen-max-size", type=int, default=10000,
+                            help="Largest catalog to screen; all-pairs screening of 50k objects takes minutes per call")
+        parser.add_argument("--screen-workers", type=int, default=1,
+                            help="Processes to shard screening across in time (0: every core)")
+        parser.add_argument("--start", default="2025-07-05T00:00:00+00:00",
+                            help="ISO start time; fixed by default so runs are comparable")
+        parser.add_argument("--output", help="Write results as JSON to this file")
+        parser.add_argument("--baseline", help="Compare against results previously written with --output")
+        parser.add_argument("--tolerance", type=float, default=0.2,
+                            help="Fractional slowdown of the median allowed before a benchmark counts as a regression")
+
+    def handle(self, *args, **options):
+        start = parse_datetime(options["start"])
+        if start is None:
+            raise CommandError(f"Invalid start time: {options['start']}")
+        if start.tzinfo is None:
+            start = start.replace(tzinfo=datetime.timezone.utc)
+        sizes = [int(size) for size in options["sizes"].split(",") if size]
+        only = set(options["only"].split(",")) if options["only"] else None
+        unknown = (only or set()) - set(BenchmarkSuite.PER_OBJECT + BenchmarkSuite.PER_SIZE)
+        if unknown:
+            raise CommandError(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+        predictor = None
+        try:
+            from orbit.model_registry import get_predictor
+            get_predictor()
+            predictor = lambda n_rows: get_predictor(n_rows=n_rows)
+        except Exception as e:
+            self.stdout.write(self.style.WARNING(f"Skipping inference benchmarks: {e}"))
+
+        base = load_base_records(CATALOG_SOURCES.get(options["source"], options["source"]))
+        suite = BenchmarkSuite(base, start, repeat=options["repeat"], warmup=options["warmup"],
+                               screen_minutes=options["screen_minutes"],
+                               screen_max_size=options["screen_max_size"], predictor=predictor,
+                               screen_workers=options["screen_workers"] or None)
+        # time propagation itself, not reads from a precomputed ephemeris table that may or may not exist
+        with tempfile.TemporaryDirectory() as no_ephemeris, override_settings(ORBIT_EPHEMERIS_DIR=no_ephemeris):
+            results = suite.run(sizes, only, progress=lambda name: self.stdout.write(f"  {name} done"))
+
+        for name, timing in results.items():
+            self.stdout.write(f"{name:40s} median {timing['median'] * 1000:10.2f} ms  min {timing['min'] * 1000:10.2f} ms")
+
+        report = {
+            "environment": environment(),
+            "config": {key: options[key] for key in ("source", "repeat", "warmup", "screen_minutes", "screen_max_size", "screen_workers", "start")} | {"sizes": sizes},
+            "results": results,
+        }
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                baseline = json.load(f)
+            rows = compare_results(results, baseline["results"], options["tolerance"])
+            for row in rows:
+                if "ratio" in row:
+                    self.stdout.write(f"{row['name']:40s} {row['ratio']:6.2f}x  {row['status']}")
+                else:
+                    self.stdout.write(f"{row['name']:40s}         {row['status']}")
+            regressions = [row["name"] for row in rows if row["status"] == "regression"]
+            if regressions:
+                raise CommandError(f"{len(regressions)} benchmarks regressed: {', '.join(regressions)}")
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
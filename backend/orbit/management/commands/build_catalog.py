@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from orbit.catalog import build_catalog
+from orbit.screening import CATALOG_SOURCES
+
+
+class Command(BaseCommand):
+    help = "Parse a TLE file once into the memory-mappable binary catalog store"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", default="active",
+                            help="Catalog name (active, tle_data) or path to a TLE/CSV file")
+        parser.add_argument("--output", default=str(settings.ORBIT_CATALOG_DIR),
+                            help="Directory to write the catalog store to")
+
+    def handle(self, *args, **options):
+        source = CATALOG_SOURCES.get(options["source"], options["source"])
+        began = time.perf_counter()
+        meta = build_catalog(source, options["output"])
+        elapsed = time.perf_counter() - began
+        if meta["rejected"]:
+            self.stdout.write(self.style.WARNING(f"{meta['rejected']} element sets failed validation"))
+        self.stdout.write(self.style.SUCCESS(
+            f"{meta['count']} element sets written to {options['output']} in {elapsed:.2f} s "
+            f"(version {meta['version']})"
+        ))
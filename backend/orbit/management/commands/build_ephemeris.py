@@ -0,0 +1,66 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from orbit.catalog import open_default_catalog
+from orbit.ephemeris import build_ephemeris, refresh_ephemeris
+
+
+class Command(BaseCommand):
+    help = "Precompute positions/velocities of every catalogued object into the ephemeris table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", help="ISO start of the grid (defaults to now, floored to the minute)")
+        parser.add_argument("--hours", type=float, default=48.0,
+                            help="Grid length; trails are served while now + trail length is inside it")
+        parser.add_argument("--step", type=float, default=60.0, help="Grid spacing in seconds")
+        parser.add_argument("--output", default=str(settings.ORBIT_EPHEMERIS_DIR),
+                            help="Directory to write the ephemeris table to")
+        parser.add_argument("--refresh", action="store_true",
+                            help="Re-propagate only objects whose element set changed in the catalog store")
+        parser.add_argument("--watch", type=float,
+                            help="With --refresh, keep running and check the catalog every N seconds")
+
+    def handle(self, *args, **options):
+        catalog = open_default_catalog()
+        if catalog is None:
+            raise CommandError("No catalog store found; run `manage.py build_catalog` first")
+
+        if options["refresh"]:
+            self.refresh(options)
+            return
+
+        start = datetime.datetime.now(datetime.timezone.utc).replace(second=0, microsecond=0)
+        if options["start"]:
+            start = parse_datetime(options["start"])
+            if start is None:
+                raise CommandError(f"Invalid start time: {options['start']}")
+            if start.tzinfo is None:
+                start = start.replace(tzinfo=datetime.timezone.utc)
+
+        began = time.perf_counter()
+        meta = build_ephemeris(catalog, options["output"], start, options["hours"] * 3600, options["step"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(catalog)} objects x {meta['num_steps']} steps written to {options['output']} "
+            f"in {time.perf_counter() - began:.1f} s"
+        ))
+
+    def refresh(self, options):
+        version = None
+        while True:
+            catalog = open_default_catalog()
+            if catalog.version != version:
+                began = time.perf_counter()
+                changed, relaid_out = refresh_ephemeris(catalog, options["output"])
+                layout = ", table re-laid out" if relaid_out else ""
+                self.stdout.write(self.style.SUCCESS(
+                    f"{changed} objects re-propagated{layout} in {time.perf_counter() - began:.1f} s "
+                    f"(catalog {catalog.version})"
+                ))
+                version = catalog.version
+            if not options["watch"]:
+                return
+            time.sleep(options["watch"])
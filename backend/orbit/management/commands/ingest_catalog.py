@@ -0,0 +1,65 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from orbit.catalog import Catalog
+from orbit.ephemeris import refresh_ephemeris
+from orbit.ingest import ingest_catalog
+from orbit.screening import CATALOG_SOURCES
+from orbit.versioned import current_version_dir
+
+
+class Command(BaseCommand):
+    help = "Diff a TLE file against the catalog store and process only the added, changed and removed objects"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", default="active",
+                            help="Catalog name (active, tle_data) or path to a TLE/CSV file")
+        parser.add_argument("--output", default=str(settings.ORBIT_CATALOG_DIR),
+                            help="Catalog store directory to update")
+        parser.add_argument("--ephemeris", default=str(settings.ORBIT_EPHEMERIS_DIR),
+                            help="Ephemeris table to refresh, if one has been built there")
+        parser.add_argument("--partial", action="store_true",
+                            help="The file is an update listing only some objects; nothing is removed")
+        parser.add_argument("--dry-run", action="store_true", help="Report the diff without writing anything")
+        parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+
+    def handle(self, *args, **options):
+        source = CATALOG_SOURCES.get(options["source"], options["source"])
+        began = time.perf_counter()
+        diff, summary = ingest_catalog(source, options["output"], partial=options["partial"],
+                                       dry_run=options["dry_run"])
+        summary["ingest_seconds"] = time.perf_counter() - began
+
+        touched = len(diff.added) + len(diff.changed) + len(diff.removed)
+        if touched and not options["dry_run"] and current_version_dir(options["ephemeris"]) is not None:
+            began = time.perf_counter()
+            propagated, relaid_out = refresh_ephemeris(Catalog.open(options["output"]), options["ephemeris"])
+            summary["ephemeris"] = {
+                "propagated": propagated,
+                "relaid_out": relaid_out,
+                "seconds": time.perf_counter() - began,
+            }
+
+        if options["json"]:
+            self.stdout.write(json.dumps(summary, indent=2))
+            return
+        if summary["rejected"]:
+            self.stdout.write(self.style.WARNING(f"{summary['rejected']} element sets failed validation"))
+        if not touched:
+            self.stdout.write(self.style.SUCCESS(
+                f"Catalog unchanged ({summary['count']} objects, version {summary['version']})"
+            ))
+            return
+        prefix = "Would apply" if options["dry_run"] else "Applied"
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix} {summary['added']} added, {summary['changed']} changed, {summary['removed']} removed "
+            f"({summary['count']} objects, version {summary['version']}) in {summary['ingest_seconds']:.2f} s"
+        ))
+        if "ephemeris" in summary:
+            ephemeris = summary["ephemeris"]
+            self.stdout.write(self.style.SUCCESS(
+                f"Ephemeris: {ephemeris['propagated']} objects re-propagated in {ephemeris['seconds']:.1f} s"
+            ))
@@ -0,0 +1,64 @@
+import multiprocessing
+import os
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+def _worker_main(stop, poll_seconds, once):
+    """Entry point of one spawned worker process"""
+    import django
+    django.setup()
+    from orbit.jobs import run_worker
+
+    # Ctrl-C goes to the whole process group; the parent sets stop and each worker finishes its current job
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    run_worker(poll_seconds, stop=stop, once=once)
+
+
+class Command(BaseCommand):
+    help = "Run background jobs (trails, batch predictions, screening) queued through /api/orbit/jobs/"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Worker processes (default: ORBIT_JOB_WORKERS, or every core)")
+        parser.add_argument("--poll", type=float, default=None,
+                            help="Seconds between queue checks when idle (default: ORBIT_JOB_POLL_SECONDS)")
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is empty")
+
+    def handle(self, *args, **options):
+        from orbit.jobs import recover_orphans, run_worker
+
+        requeued, failed = recover_orphans()
+        if requeued or failed:
+            self.stdout.write(f"Recovered jobs of exited workers: {requeued} requeued, {failed} failed")
+
+        workers = options["workers"] or settings.ORBIT_JOB_WORKERS or os.cpu_count() or 1
+        if workers == 1:
+            self.stdout.write("Running jobs in this process")
+            ran = run_worker(options["poll"], once=options["once"])
+            self.stdout.write(self.style.SUCCESS(f"{ran} jobs run"))
+            return
+
+        # spawn, not fork: every worker sets up Django and opens its own database connection
+        context = multiprocessing.get_context("spawn")
+        stop = context.Event()
+        connections.close_all()
+        processes = [
+            context.Process(target=_worker_main, args=(stop, options["poll"], options["once"]), daemon=False)
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f"Started {workers} job workers")
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping; workers finish their current job first")
+            stop.set()
+            for process in processes:
+                process.join()
+        self.stdout.write(self.style.SUCCESS("Job workers stopped"))
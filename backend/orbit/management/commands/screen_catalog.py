@@ -0,0 +1,78 @@
+import datetime
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from orbit.screening import describe_conjunction, get_catalog, prefiltered_screen, screen_catalog
+
+
+class Command(BaseCommand):
+    help = "Screen a TLE catalog for close approaches between all objects"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", default="active",
+                            help="Catalog name (active, tle_data) or path to a TLE/CSV file")
+        parser.add_argument("--start", help="ISO start time (defaults to now)")
+        parser.add_argument("--hours", type=float, default=24.0)
+        parser.add_argument("--step", type=float, default=10.0, help="Time step in seconds")
+        parser.add_argument("--threshold", type=float, default=5.0, help="Miss distance threshold in km")
+        parser.add_argument("--output", help="Write the conjunction list to this JSON file")
+        parser.add_argument("--search-radius", type=float,
+                            help="Pair collection radius per step in km (defaults to the threshold)")
+        parser.add_argument("--workers", type=int, default=1,
+                            help="Processes to shard the window across in time (0: every core)")
+        parser.add_argument("--no-prefilter", action="store_true",
+                            help="Screen every pair instead of pruning by orbital geometry first")
+
+    def handle(self, *args, **options):
+        start = datetime.datetime.now(datetime.timezone.utc)
+        if options["start"]:
+            start = parse_datetime(options["start"])
+            if start is None:
+                raise CommandError(f"Invalid start time: {options['start']}")
+            if start.tzinfo is None:
+                start = start.replace(tzinfo=datetime.timezone.utc)
+
+        names, satnums, satrecs = get_catalog(options["source"])
+        self.stdout.write(f"Screening {len(satrecs)} objects over {options['hours']} h")
+
+        def progress(done, total):
+            self.stdout.write(f"  step {done}/{total}", ending="\r")
+
+        began = time.perf_counter()
+        kwargs = dict(step_seconds=options["step"], threshold_km=options["threshold"],
+                      search_radius_km=options["search_radius"], progress=progress,
+                      workers=options["workers"] or None)
+        if options["no_prefilter"]:
+            events = screen_catalog(satrecs, start, options["hours"] * 3600, **kwargs)
+        else:
+            events, stats = prefiltered_screen(satrecs, start, options["hours"] * 3600, **kwargs)
+            if stats["skipped"]:
+                self.stdout.write("Prefilters skipped: too many overlapping shells to pay off, screened every pair")
+            else:
+                self.stdout.write(
+                    f"Prefilters kept {stats['remaining']} of {stats['candidates']} pairs "
+                    f"(apogee/perigee -{stats['apogee_perigee']}, orbit path -{stats['orbit_path']}, "
+                    f"time window -{stats['time_window']})"
+                )
+        elapsed = time.perf_counter() - began
+
+        conjunctions = [
+            describe_conjunction(event, names, satnums, start, options["step"]) for event in events
+        ]
+        self.stdout.write("")
+        for conjunction in conjunctions[:20]:
+            self.stdout.write(
+                f"{conjunction['time']}  {conjunction['sat1']} / {conjunction['sat2']}  "
+                f"{conjunction['miss_distance_km']:.3f} km"
+            )
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump({"start": start.isoformat(), "conjunctions": conjunctions}, f, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(conjunctions)} conjunctions found in {elapsed:.1f} s"
+        ))
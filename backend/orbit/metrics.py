@@ -0,0 +1,167 @@
+"""
+Request and hot-path stage metrics.
+
+span("propagate") times one stage of a request (TLE parsing, propagation,
+inference, cache I/O, serialization, ...). Stage timings go into latency
+histograms that /metrics exposes in the Prometheus text format, and, for a
+request that asked for a profile, into that request's own breakdown which
+MetricsMiddleware returns as a Server-Timing header.
+
+With ORBIT_METRICS_ENABLED off and no profile requested, span() returns a
+shared no-op context manager after one setting lookup and one context
+variable read.
+"""
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+from django.conf import settings
+
+# seconds; from sub-millisecond cache hits up to full-catalog snapshots
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NOOP = nullcontext()
+_profile = contextvars.ContextVar("orbit_profile", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Histograms and counters keyed by metric name and a tuple of label pairs"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.help = {}
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def clear(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            histograms = {key: (list(h.counts), h.sum, h.count, h.buckets) for key, h in self.histograms.items()}
+            counters = dict(self.counters)
+        lines = []
+        for name in sorted({name for name, _ in counters}):
+            lines += self._header(name, "counter")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_labels(labels)} {value}")
+        for name in sorted({name for name, _ in histograms}):
+            lines += self._header(name, "histogram")
+            for (metric, labels), (counts, total, count, buckets) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(buckets + ("+Inf",), counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {total}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, name, kind):
+        header = [f"# HELP {name} {self.help[name]}"] if name in self.help else []
+        return header + [f"# TYPE {name} {kind}"]
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+registry = MetricsRegistry()
+registry.describe("orbit_requests_total", "HTTP requests by route, method and status")
+registry.describe("orbit_request_duration_seconds", "HTTP request latency by route and method")
+registry.describe("orbit_stage_duration_seconds", "Latency of one hot-path stage (parse, propagate, inference, cache, serialize, ...)")
+
+
+class _Span:
+    __slots__ = ("stage", "record", "profile", "began")
+
+    def __init__(self, stage, record, profile):
+        self.stage = stage
+        self.record = record
+        self.profile = profile
+
+    def __enter__(self):
+        self.began = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.began
+        if self.record:
+            registry.observe("orbit_stage_duration_seconds", elapsed, stage=self.stage)
+        if self.profile is not None:
+            self.profile[self.stage] = self.profile.get(self.stage, 0.0) + elapsed
+        return False
+
+
+def span(stage):
+    """Context manager timing one stage of the current request"""
+    enabled = settings.ORBIT_METRICS_ENABLED
+    profile = _profile.get()
+    if not enabled and profile is None:
+        return _NOOP
+    return _Span(stage, enabled, profile)
+
+
+def start_profile():
+    """Collect a stage breakdown for the rest of this request (or task); returns (profile, reset token)"""
+    profile = {}
+    return profile, _profile.set(profile)
+
+
+def stop_profile(token):
+    _profile.reset(token)
+
+
+def server_timing(profile, total):
+    """Server-Timing header value for a stage breakdown, durations in milliseconds"""
+    entries = [f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in profile.items()]
+    entries.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(entries)
+
+
+def gauges(prefix, values):
+    """Numeric entries of a stats dict as Prometheus gauges named prefix_key"""
+    lines = []
+    for key, value in values.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines += [f"# TYPE {prefix}_{key} gauge", f"{prefix}_{key} {value}"]
+    return "\n".join(lines) + "\n" if lines else ""
@@ -0,0 +1,61 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .metrics import registry, server_timing, start_profile, stop_profile
+
+
+class MetricsMiddleware:
+    """
+    Counts requests and records their latency per URL route. A request that
+    sends the ORBIT_PROFILE_HEADER header (when ORBIT_PROFILE_ENABLED) gets
+    its per-stage breakdown back in a Server-Timing response header.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        began, profile, token = self._begin(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                stop_profile(token)
+        return self._finish(request, response, began, profile)
+
+    async def __acall__(self, request):
+        began, profile, token = self._begin(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            if token is not None:
+                stop_profile(token)
+        return self._finish(request, response, began, profile)
+
+    def _begin(self, request):
+        profile, token = None, None
+        if settings.ORBIT_PROFILE_ENABLED and request.headers.get(settings.ORBIT_PROFILE_HEADER):
+            profile, token = start_profile()
+        return time.perf_counter(), profile, token
+
+    def _finish(self, request, response, began, profile):
+        elapsed = time.perf_counter() - began
+        if settings.ORBIT_METRICS_ENABLED:
+            # the route pattern, not the path, so ids in URLs do not multiply the series
+            match = request.resolver_match
+            route = match.route if match is not None else "unmatched"
+            registry.inc("orbit_requests_total", route=route, method=request.method, status=response.status_code)
+            registry.observe("orbit_request_duration_seconds", elapsed, route=route, method=request.method)
+        if profile is not None:
+            response["Server-Timing"] = server_timing(profile, elapsed)
+        return response
@@ -0,0 +1,118 @@
+"""
+Process-wide registry for the collision model.
+
+The model is loaded on first use rather than at import, so management
+commands, tests and worker start-up do not pay for unpickling the forest
+(or for importing sklearn). Both apps share the one instance. Every get()
+stats the file and reloads it when its mtime or size changes, so a
+retrained model is picked up without a restart.
+
+Random forests are also compiled into a CompiledForest on load; it gives
+identical results and is much faster for the few-row predictions the
+single-pair views make, while sklearn stays faster for large batches.
+"""
+import hashlib
+import os
+import threading
+import time
+
+from .forest import export_forest
+
+
+class ModelRegistry:
+    def __init__(self, path, mmap_mode=None):
+        self.path = str(path)
+        self.mmap_mode = mmap_mode
+        self._lock = threading.Lock()
+        self._model = None
+        self._compiled = None
+        self._stamp = None
+        self._info = {"path": self.path, "loaded": False}
+
+    def _file_stamp(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self):
+        """The current model, loading or reloading it if the file changed"""
+        return self._snapshot()[0]
+
+    def _snapshot(self):
+        """(model, compiled forest, version) from one load, so a concurrent reload never mixes two"""
+        stamp = self._file_stamp()
+        with self._lock:
+            if stamp != self._stamp:
+                self._load(stamp)
+            return self._model, self._compiled, self._info["version"]
+
+    def _load(self, stamp):
+        import joblib
+
+        began = time.perf_counter()
+        # with mmap_mode, numpy arrays in the pickle are mapped from the file instead of copied,
+        # so workers forked from one parent share those pages
+        model = joblib.load(self.path, mmap_mode=self.mmap_mode)
+        load_seconds = time.perf_counter() - began
+
+        digest = hashlib.sha1()
+        with open(self.path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+
+        self._compiled = export_forest(model) if hasattr(model, "estimators_") else None
+        self._model = model
+        self._stamp = stamp
+        self._info = {
+            "path": self.path,
+            "loaded": True,
+            "version": digest.hexdigest()[:16],
+            "load_seconds": load_seconds,
+            "loaded_at": time.time(),
+            "file_size": stamp[1],
+            "model_class": type(model).__name__,
+            "compiled": self._compiled is not None,
+            "mmap_mode": self.mmap_mode,
+        }
+
+    def predictor(self, n_rows=1, compiled_max_rows=256):
+        """The compiled forest for up to compiled_max_rows rows, else the model itself"""
+        return self.versioned_predictor(n_rows, compiled_max_rows)[0]
+
+    def versioned_predictor(self, n_rows=1, compiled_max_rows=256):
+        """predictor() and the version of the model it came from, e.g. for cache keys"""
+        model, compiled, version = self._snapshot()
+        if compiled is not None and n_rows <= compiled_max_rows:
+            return compiled, version
+        return model, version
+
+    def info(self):
+        """Path, version (content hash), load time and class of the loaded model"""
+        return dict(self._info)
+
+
+_registry = None
+
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        from django.conf import settings
+        _registry = ModelRegistry(settings.ORBIT_MODEL_PATH, mmap_mode=settings.ORBIT_MODEL_MMAP_MODE)
+    return _registry
+
+
+def get_model():
+    """The shared collision model, loaded on first use"""
+    return get_registry().get()
+
+
+def get_predictor(n_rows=1):
+    """Whichever of the compiled forest or the sklearn model is faster for n_rows rows"""
+    from django.conf import settings
+    return get_registry().predictor(n_rows, settings.ORBIT_MODEL_COMPILED_MAX_ROWS)
+
+
+def get_versioned_predictor(n_rows=1):
+    """get_predictor() and the version of the model it came from, read from the same load"""
+    from django.conf import settings
+    return get_registry().versioned_predictor(n_rows, settings.ORBIT_MODEL_COMPILED_MAX_ROWS)
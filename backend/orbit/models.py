@@ -1,3 +1,66 @@
+import uuid
+
+import numpy as np
 from django.db import models
 
-# Create your models here.
+# positions are stored as packed little-endian float32 x, y, z triples
+POSITION_DTYPE = np.dtype("<f4")
+POSITION_BYTES = 3 * POSITION_DTYPE.itemsize
+
+
+class CustomSatellite(models.Model):
+    """A user-added satellite with one orbit of precomputed positions"""
+    name = models.CharField(max_length=100, unique=True)
+    tle_line1 = models.CharField(max_length=69)
+    tle_line2 = models.CharField(max_length=69)
+    positions = models.BinaryField()
+    positions_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["created_at", "id"]
+
+    def __str__(self):
+        return self.name
+
+    def set_positions(self, positions):
+        packed = np.ascontiguousarray(positions, dtype=POSITION_DTYPE).reshape(-1, 3)
+        self.positions = packed.tobytes()
+        self.positions_count = len(packed)
+
+    def get_positions(self):
+        return np.frombuffer(bytes(self.positions), dtype=POSITION_DTYPE).reshape(-1, 3)
+
+
+class Job(models.Model):
+    """
+    A long-running task queued by the API and run by `manage.py run_jobs`.
+    The result is the packed array payload (orbit.renderers.pack_arrays).
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [(QUEUED, "Queued"), (RUNNING, "Running"), (DONE, "Done"), (FAILED, "Failed")]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=32)
+    params = models.JSONField(default=dict)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    progress = models.FloatField(default=0.0)
+    message = models.CharField(max_length=200, blank=True)
+    error = models.TextField(blank=True)
+    result = models.BinaryField(null=True)
+    result_bytes = models.PositiveIntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True)  # "host:pid" of the process running it
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+    expires_at = models.DateTimeField(null=True, db_index=True)
+
+    class Meta:
+        ordering = ["created_at"]
+
+    def __str__(self):
+        return f"{self.kind} {self.id} ({self.status})"
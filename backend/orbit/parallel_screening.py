@@ -0,0 +1,191 @@
+"""
+Time-sharded conjunction screening across worker processes.
+
+The screening window is cut into time slices, and workers screen the slices
+independently. Each worker uses the same per-step k-d tree search as
+screen_catalog.
+
+Satrec objects cannot be pickled. Instead, the elements of the screened
+objects, their catalog rows and the candidate pair keys are copied into
+multiprocessing.shared_memory once. Every worker attaches to that memory
+and rebuilds its SatrecArray with catalog.satrec_from_record. Propagated
+positions are used by the worker that computed them and never cross a
+process boundary, so only small per-slice event lists come back.
+
+An event that spans a slice boundary comes back as two pieces: one ends on
+the last step of a slice and the next begins on the first step of the
+following slice. merge_slice_events joins them before refinement, so the
+result matches serial screening.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+from sgp4.api import SatrecArray # type: ignore
+
+from .catalog import CATALOG_DTYPE, satrec_from_record
+from .screening import (
+    ConjunctionTracker, refine_conjunctions, screen_catalog, screen_rows, screen_steps, select_events
+)
+
+# sgp4init inputs, with catalog field names so satrec_from_record reads them
+ELEMENT_DTYPE = np.dtype([(name, CATALOG_DTYPE[name]) for name in (
+    "satnum", "epoch_jd", "epoch_fr", "inclination", "raan", "eccentricity", "argp", "mean_anomaly",
+    "mean_motion", "ndot", "nddot", "bstar",
+)])
+
+# slices per worker; more slices balance uneven steps better, fewer repeat less per-slice set-up
+SLICES_PER_WORKER = 4
+
+
+def element_table(satrecs):
+    """ELEMENT_DTYPE rows that rebuild the given Satrecs through satrec_from_record"""
+    table = np.zeros(len(satrecs), dtype=ELEMENT_DTYPE)
+    for row, sat in enumerate(satrecs):
+        # jdsatepoch is a whole date ending in .5 like epoch_jd, so satrec_from_record's
+        # (epoch_jd - SGP4_EPOCH_JD) + epoch_fr gives back the same sgp4init epoch
+        table[row] = (
+            sat.satnum, sat.jdsatepoch, sat.jdsatepochF, sat.inclo, sat.nodeo, sat.ecco, sat.argpo, sat.mo,
+            sat.no_kozai, sat.ndot, sat.nddot, sat.bstar,
+        )
+    return table
+
+
+def slice_bounds(num_steps, count):
+    """(first, last) step ranges cutting [0, num_steps) into at most count nearly equal slices"""
+    edges = np.unique(np.linspace(0, num_steps, max(1, min(count, num_steps)) + 1).astype(np.int64))
+    return list(zip(edges[:-1].tolist(), edges[1:].tolist()))
+
+
+def merge_slice_events(events):
+    """
+    Join events of the same pair that continue across a slice boundary
+    (one ends on step k, the other starts on step k + 1), keeping the closer
+    sampled approach. Returns one event per conjunction.
+    """
+    merged = []
+    for event in sorted(events, key=lambda event: (event["i"], event["j"], event["start_step"])):
+        previous = merged[-1] if merged else None
+        if (previous is not None and (previous["i"], previous["j"]) == (event["i"], event["j"])
+                and event["start_step"] == previous["end_step"] + 1):
+            previous["end_step"] = event["end_step"]
+            if event["miss_distance_km"] < previous["miss_distance_km"]:
+                previous["miss_distance_km"] = event["miss_distance_km"]
+                previous["tca_step"] = event["tca_step"]
+            continue
+        merged.append(dict(event))
+    return merged
+
+
+class _CatalogRowSatrecs:
+    """Satrecs of the screened rows, indexed by full catalog row as refine_conjunctions expects"""
+
+    def __init__(self, rows, satrecs):
+        self.rows = rows
+        self.satrecs = satrecs
+
+    def __getitem__(self, row):
+        return self.satrecs[int(np.searchsorted(self.rows, row))]
+
+
+# per-process state, filled once by _init_worker from the shared segments
+_worker = {}
+
+
+def _init_worker(specs, n, start, step_seconds, chunk_steps, search_radius_km):
+    arrays = {}
+    for key, (name, dtype, shape) in specs.items():
+        segment = shared_memory.SharedMemory(name=name)
+        _worker.setdefault("segments", []).append(segment)  # keep attached for the life of the process
+        arrays[key] = np.ndarray(shape, dtype=dtype, buffer=segment.buf)
+    satrecs = [satrec_from_record(record) for record in arrays["elements"]]
+    _worker.update({
+        "rows": arrays["rows"],
+        "keys": arrays.get("keys"),
+        "satrecs": _CatalogRowSatrecs(arrays["rows"], satrecs),
+        "sat_array": SatrecArray(satrecs),
+        "n": n,
+        "start": start,
+        "step_seconds": step_seconds,
+        "chunk_steps": chunk_steps,
+        "search_radius_km": search_radius_km,
+    })
+
+
+def _screen_slice(first, last):
+    """Unrefined events of steps [first, last), with global step numbers"""
+    tracker = ConjunctionTracker()
+    screen_steps(
+        _worker["sat_array"], _worker["rows"], _worker["n"], _worker["keys"], _worker["start"], first, last,
+        _worker["step_seconds"], _worker["search_radius_km"], tracker, chunk_steps=_worker["chunk_steps"]
+    )
+    return tracker.finish()
+
+
+def _refine_events(events, duration_seconds):
+    return refine_conjunctions(
+        events, _worker["satrecs"], _worker["start"], duration_seconds, _worker["step_seconds"]
+    )
+
+
+def _share(array, segments):
+    """Copy an array into a new shared memory segment; returns what a worker needs to attach to it"""
+    segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    segments.append(segment)
+    np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+    return segment.name, array.dtype, array.shape
+
+
+def parallel_screen(satrecs, start, duration_seconds, step_seconds=10, threshold_km=5.0, chunk_steps=60,
+                    candidates=None, search_radius_km=None, refine=True, progress=None, workers=None):
+    """
+    screen_catalog with the window sharded in time across workers processes
+    (None: every core). Takes the same arguments and returns the same events.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return screen_catalog(
+            satrecs, start, duration_seconds, step_seconds=step_seconds, threshold_km=threshold_km,
+            chunk_steps=chunk_steps, candidates=candidates, search_radius_km=search_radius_km,
+            refine=refine, progress=progress
+        )
+
+    search_radius_km = threshold_km if search_radius_km is None else max(search_radius_km, threshold_km)
+    n = len(satrecs)
+    rows, candidate_keys = screen_rows(n, candidates)
+    if len(rows) < 2:
+        return []
+    num_steps = int(duration_seconds // step_seconds) + 1
+    bounds = slice_bounds(num_steps, workers * SLICES_PER_WORKER)
+
+    segments = []
+    try:
+        specs = {
+            "elements": _share(element_table([satrecs[row] for row in rows]), segments),
+            "rows": _share(rows, segments),
+        }
+        if candidate_keys is not None:
+            specs["keys"] = _share(candidate_keys, segments)
+
+        initargs = (specs, n, start, step_seconds, chunk_steps, search_radius_km)
+        with ProcessPoolExecutor(max_workers=min(workers, len(bounds)), initializer=_init_worker,
+                                 initargs=initargs) as pool:
+            futures = {pool.submit(_screen_slice, first, last): last - first for first, last in bounds}
+            pieces, done = [], 0
+            for future in as_completed(futures):
+                pieces.extend(future.result())
+                done += futures[future]
+                if progress:
+                    progress(done, num_steps)
+            events = merge_slice_events(pieces)
+
+            if refine and events:
+                batches = [events[k::workers] for k in range(min(workers, len(events)))]
+                refined = pool.map(_refine_events, batches, [duration_seconds] * len(batches))
+                events = [event for batch in refined for event in batch]
+    finally:
+        for segment in segments:
+            segment.close()
+            segment.unlink()
+    return select_events(events, threshold_km)
@@ -0,0 +1,118 @@
+"""
+Batch collision prediction.
+
+Each side of a pair is either a 2-line TLE ("tle1"/"tle2") or a NORAD id
+("norad1"/"norad2") looked up in the catalog. Features for the whole
+batch go into one (N, 6) matrix and the model is called once.
+"""
+import numpy as np
+from sgp4.api import Satrec # type: ignore
+
+from .features import get_feature_store
+from .forest import CompiledForest
+from .metrics import span
+from .screening import get_catalog
+
+FEATURE_NAMES = [
+    "sat1_inclination", "sat1_eccentricity", "sat1_mean_motion",
+    "sat2_inclination", "sat2_eccentricity", "sat2_mean_motion"
+]
+
+
+def tle_features(tle):
+    """(inclination, eccentricity, mean motion) of a 2-line TLE string, as the model was trained on"""
+    line1, line2 = tle.strip().split("\n")
+    sat = Satrec.twoline2rv(line1.strip(), line2.strip())
+    return sat.inclo, sat.ecco, sat.no_kozai
+
+
+def catalog_features(norad_ids):
+    """
+    (N, 3) features for NORAD ids from the feature store (or active.txt if
+    the catalog store is not built) and a mask of the ids that were found.
+    """
+    norad_ids = np.asarray(norad_ids, dtype=np.int64)
+    store = get_feature_store()
+    if store is not None:
+        return store.model_features(norad_ids)
+
+    features = np.zeros((len(norad_ids), 3))
+    _, satnums, satrecs = get_catalog("active")
+    row_of = {int(satnum): row for row, satnum in enumerate(satnums)}
+    found = np.zeros(len(norad_ids), dtype=bool)
+    for k, norad_id in enumerate(norad_ids.tolist()):
+        row = row_of.get(norad_id)
+        if row is not None:
+            sat = satrecs[row]
+            features[k] = sat.inclo, sat.ecco, sat.no_kozai
+            found[k] = True
+    return features, found
+
+
+def batch_features(pairs):
+    """
+    Build the (N, 6) feature matrix for a list of pair dicts.
+    Returns (features, errors) where errors maps pair index -> message;
+    rows with an error are left as zeros and must not be reported.
+    """
+    features = np.zeros((len(pairs), 6))
+    errors = {}
+    lookups = []  # (pair index, side, norad id)
+    for index, pair in enumerate(pairs):
+        for side in (1, 2):
+            columns = slice(3 * (side - 1), 3 * side)
+            tle = pair.get(f"tle{side}")
+            norad_id = pair.get(f"norad{side}")
+            try:
+                if tle:
+                    features[index, columns] = tle_features(tle)
+                elif norad_id is not None:
+                    lookups.append((index, side, int(norad_id)))
+                else:
+                    errors.setdefault(index, f"Pair needs tle{side} or norad{side}")
+            except (ValueError, TypeError) as e:
+                errors.setdefault(index, f"Invalid satellite {side}: {e}")
+
+    if lookups:
+        found_features, found = catalog_features([norad_id for _, _, norad_id in lookups])
+        for (index, side, norad_id), row, ok in zip(lookups, found_features, found):
+            if ok:
+                features[index, 3 * (side - 1):3 * side] = row
+            else:
+                errors.setdefault(index, f"NORAD id {norad_id} is not in the catalog")
+    return features, errors
+
+
+def predict_features(model, features):
+    """Labels and collision probabilities for every row of features in one model call"""
+    if len(features) == 0:
+        return [], np.zeros(0)
+    if isinstance(model, CompiledForest):
+        probabilities = model.predict_proba(features)
+    else:
+        import pandas as pd  # only needed once a model is scored; keeps worker start-up light
+        probabilities = model.predict_proba(pd.DataFrame(features, columns=FEATURE_NAMES))
+    classes = list(model.classes_)
+    collision = probabilities[:, classes.index(1)] if 1 in classes else np.zeros(len(features))
+    predicted = np.asarray(model.classes_)[probabilities.argmax(axis=1)]
+    labels = ["collision" if label == 1 else "no_collision" for label in predicted.tolist()]
+    return labels, collision
+
+
+def predict_pairs(model, pairs):
+    """Results for every pair in request order; invalid pairs carry an error instead of a prediction"""
+    with span("parse"):
+        features, errors = batch_features(pairs)
+    valid = np.array([index not in errors for index in range(len(pairs))], dtype=bool)
+    with span("inference"):
+        labels, collision = predict_features(model, features[valid])
+
+    results = []
+    scored = iter(zip(labels, collision.tolist()))
+    for index in range(len(pairs)):
+        if index in errors:
+            results.append({"index": index, "error": errors[index]})
+        else:
+            label, probability = next(scored)
+            results.append({"index": index, "prediction": label, "collision_probability": probability})
+    return results
@@ -0,0 +1,448 @@
+"""
+Orbital-geometry prefilters that prune satellite pairs before propagation.
+
+Stages, cheapest first:
+    1. apogee/perigee: the radial shells [perigee, apogee] must overlap
+    2. orbit path: the orbits must pass within pad_km of each other where
+       their planes intersect
+    3. time window: both objects must reach a plane crossing at the same
+       time somewhere inside the screening window
+
+Everything works on arrays of pair indices so millions of pairs can be
+tested without a single per-pair sgp4 call. Secular J2 rates from the
+Satrec (nodedot, argpdot, mdot) move the elements to the middle of the
+window, and the drift over the window is added to the tolerances so the
+filters stay conservative.
+
+The epoch mean elements alone do not bound where SGP4 puts an object: drag
+terms (a negative B* raises the orbit) move the radius by tens of km over
+a few days, and short-period terms by several km around the mean. So
+anchor_elements replaces each shell with radii propagated during the
+window, and the largest gap between those radii and the conic the filters
+use is added to the stage 2 and 3 tolerances.
+"""
+import numpy as np
+from sgp4.api import SatrecArray # type: ignore
+
+TWO_PI = 2 * np.pi
+
+# stage codes stored per pair
+KEPT = 0
+REJECTED_APOGEE_PERIGEE = 1
+REJECTED_ORBIT_PATH = 2
+REJECTED_TIME_WINDOW = 3
+
+# along-track slack for SGP4 short-period terms not captured by mean elements (radians)
+PHASE_MARGIN = 0.005
+
+# true anomalies sampled per orbit when measuring the propagated shells
+SHELL_SAMPLES = 36
+# slack on the sampled shells for short-period terms between samples (km)
+SHELL_MARGIN_KM = 2.0
+
+STAGE_NAMES = {
+    REJECTED_APOGEE_PERIGEE: "apogee_perigee",
+    REJECTED_ORBIT_PATH: "orbit_path",
+    REJECTED_TIME_WINDOW: "time_window",
+}
+
+
+def orbital_elements(satrecs):
+    """Collect the elements the filters need from a list of Satrec into arrays"""
+    def column(attr):
+        return np.array([getattr(sat, attr) for sat in satrecs], dtype=np.float64)
+
+    radius_km = column("radiusearthkm")
+    elements = {
+        "inclination": column("inclo"),
+        "eccentricity": column("ecco"),
+        "mean_motion": column("no_kozai"),
+        "raan": column("nodeo"),
+        "argp": column("argpo"),
+        "mean_anomaly": column("mo"),
+        "raan_rate": column("nodedot"),
+        "argp_rate": column("argpdot"),
+        "mean_anomaly_rate": column("mdot"),
+        "epoch_jd": column("jdsatepoch") + column("jdsatepochF"),
+        "semi_major_km": column("a") * radius_km,
+    }
+    elements["perigee_km"] = elements["semi_major_km"] * (1 - elements["eccentricity"])
+    elements["apogee_km"] = elements["semi_major_km"] * (1 + elements["eccentricity"])
+    return elements
+
+
+def _plane_basis(inclination, raan):
+    """Unit vectors to the ascending node (P), 90 degrees along the orbit (Q) and the plane normal (W)"""
+    cos_i, sin_i = np.cos(inclination), np.sin(inclination)
+    cos_o, sin_o = np.cos(raan), np.sin(raan)
+    P = np.stack([cos_o, sin_o, np.zeros_like(cos_o)], axis=-1)
+    Q = np.stack([-cos_i * sin_o, cos_i * cos_o, sin_i], axis=-1)
+    W = np.stack([sin_i * sin_o, -sin_i * cos_o, cos_i], axis=-1)
+    return P, Q, W
+
+
+def _mean_anomaly_from_true(true_anomaly, e):
+    E = np.arctan2(np.sqrt(1 - e ** 2) * np.sin(true_anomaly), e + np.cos(true_anomaly))
+    return E - e * np.sin(E)
+
+
+def _object_geometry(elements, minutes_start, window_minutes):
+    """
+    Per-object quantities shared by every pair: the orbital plane at the
+    middle of the window and the phase at its start. Computing these once
+    per object keeps the per-pair work to gathers and a few trig calls.
+    """
+    minutes_mid = minutes_start + window_minutes / 2
+    raan_mid = elements["raan"] + elements["raan_rate"] * minutes_mid
+    P, Q, W = _plane_basis(elements["inclination"], raan_mid)
+    e = elements["eccentricity"]
+    return {
+        "P": P, "Q": Q, "W": W,
+        "e": e,
+        "p": elements["semi_major_km"] * (1 - e ** 2),
+        "argp_mid": elements["argp"] + elements["argp_rate"] * minutes_mid,
+        "argp_start": elements["argp"] + elements["argp_rate"] * minutes_start,
+        "mean_start": elements["mean_anomaly"] + elements["mean_anomaly_rate"] * minutes_start,
+        "rate": elements["mean_anomaly_rate"],
+        "raan_rate": elements["raan_rate"],
+        "argp_drift": np.abs(elements["argp_rate"]) * window_minutes / 2,
+        "slack": elements.get("radial_slack_km", np.zeros_like(e)),
+        "window_minutes": window_minutes,
+    }
+
+
+def apogee_perigee_filter(elements, i, j, pad_km):
+    """Keep pairs whose [perigee, apogee] shells come within pad_km; also returns the shell gap"""
+    gap = (np.maximum(elements["perigee_km"][i], elements["perigee_km"][j])
+           - np.minimum(elements["apogee_km"][i], elements["apogee_km"][j]))
+    return gap <= pad_km, np.maximum(gap, 0.0)
+
+
+def _crossings(geometry, i, j):
+    """Arguments of latitude of both orbits along the line where their planes intersect, and sin of the mutual inclination"""
+    W_i, W_j = geometry["W"][i], geometry["W"][j]
+    node_line = np.cross(W_i, W_j)
+    sin_mutual = np.sqrt(np.einsum("ij,ij->i", node_line, node_line))
+
+    P, Q = geometry["P"], geometry["Q"]
+    u_i = np.arctan2(np.einsum("ij,ij->i", node_line, Q[i]), np.einsum("ij,ij->i", node_line, P[i]))
+    u_j = np.arctan2(np.einsum("ij,ij->i", node_line, Q[j]), np.einsum("ij,ij->i", node_line, P[j]))
+    return u_i, u_j, sin_mutual
+
+
+def _radius(geometry, rows, argument_of_latitude, argp):
+    """Radius of each orbit at the given argument of latitude"""
+    return geometry["p"][rows] / (1 + geometry["e"][rows] * np.cos(argument_of_latitude - argp))
+
+
+def orbit_path_filter(geometry, i, j, crossings, pad_km):
+    """
+    Keep pairs whose orbits pass within pad_km of each other at either crossing
+    of their planes. Nearly coplanar pairs always pass. Also returns the
+    smaller of the two crossing distances.
+    """
+    u_i, u_j, sin_mutual = crossings
+    argp_i, argp_j = geometry["argp_mid"][i], geometry["argp_mid"][j]
+
+    distance = np.full(len(i), np.inf)
+    for shift in (0.0, np.pi):
+        r_i = _radius(geometry, i, u_i + shift, argp_i)
+        r_j = _radius(geometry, j, u_j + shift, argp_j)
+        distance = np.minimum(distance, np.abs(r_i - r_j))
+
+    # perigee drift over the window changes the radius at the crossing
+    p, e = geometry["p"], geometry["e"]
+    drift = p[i] * e[i] * geometry["argp_drift"][i] + p[j] * e[j] * geometry["argp_drift"][j]
+    drift = drift + geometry["slack"][i] + geometry["slack"][j]
+    coplanar = sin_mutual < 1e-3
+    return coplanar | (distance <= pad_km + drift), np.where(coplanar, 0.0, distance)
+
+
+def _passage_windows(geometry, rows, u_cross, half_angle):
+    """First passage time (minutes after window start), period and half-width of each crossing zone"""
+    e = geometry["e"][rows]
+    rate = geometry["rate"][rows]
+    true_anomaly = u_cross - geometry["argp_start"][rows]
+    target = _mean_anomaly_from_true(true_anomaly, e)
+    first = np.mod(target - geometry["mean_start"][rows], TWO_PI) / rate
+
+    # time spent per radian of argument of latitude at the crossing
+    angular_rate = rate * (1 + e * np.cos(true_anomaly)) ** 2 / (1 - e ** 2) ** 1.5
+    return first, TWO_PI / rate, half_angle / angular_rate
+
+
+def time_window_filter(geometry, i, j, crossings, pad_km):
+    """
+    Keep pairs where both objects are near the same plane crossing at the
+    same time during the window. The relative node/perigee drift over the
+    window and PHASE_MARGIN widen the crossing zones so the test stays
+    conservative.
+    """
+    u_i, u_j, sin_mutual = crossings
+    window_minutes = geometry["window_minutes"]
+    drift = (PHASE_MARGIN
+             + np.abs(geometry["raan_rate"][i] - geometry["raan_rate"][j]) * window_minutes / 2
+             + geometry["argp_drift"][i] + geometry["argp_drift"][j])
+    sin_mutual = np.maximum(sin_mutual, 1e-3)
+    pad_km = pad_km + geometry["slack"][i] + geometry["slack"][j]
+
+    keep = sin_mutual <= 1e-3
+    for shift in (0.0, np.pi):
+        r_i = _radius(geometry, i, u_i + shift, geometry["argp_mid"][i])
+        r_j = _radius(geometry, j, u_j + shift, geometry["argp_mid"][j])
+        half_i = np.minimum(np.pi, pad_km / (r_i * sin_mutual) + drift)
+        half_j = np.minimum(np.pi, pad_km / (r_j * sin_mutual) + drift)
+        first_i, period_i, width_i = _passage_windows(geometry, i, u_i + shift, half_i)
+        first_j, period_j, width_j = _passage_windows(geometry, j, u_j + shift, half_j)
+
+        # walk the passages of the slower object; the faster one's nearest passage is computed directly
+        swap = period_i < period_j
+        first_a, first_b = np.where(swap, first_j, first_i), np.where(swap, first_i, first_j)
+        period_a, period_b = np.where(swap, period_j, period_i), np.where(swap, period_i, period_j)
+        width = width_i + width_j
+
+        passes = int(np.ceil(window_minutes / period_a.min())) + 1 if len(i) else 0
+        hit = np.zeros(len(i), dtype=bool)
+        for m in range(-1, passes + 1):
+            t_a = first_a + m * period_a
+            t_b = first_b + np.round((t_a - first_b) / period_b) * period_b
+            in_window = (t_a >= -width) & (t_a <= window_minutes + width)
+            hit |= in_window & (np.abs(t_a - t_b) <= width)
+        keep |= hit
+    return keep
+
+
+def propagated_shells(elements, satrecs, start_jd, window_seconds):
+    """
+    Radial extent of each object as SGP4 propagates it during the window.
+    Every object is propagated at SHELL_SAMPLES true anomalies over one
+    orbit from the start, the middle and the end of the window (timed from
+    its mean anomaly, so pass anchored elements). Returns the perigee and
+    apogee radii, widened by the most a conic can dip between two samples
+    and by SHELL_MARGIN_KM, their mean (the semi-major axis of the conic
+    through them) and the radial slack: the largest difference between a
+    sampled radius and that conic, plus the same widening.
+    Objects that fail to propagate keep their mean-element values.
+    """
+    window_minutes = window_seconds / 60.0
+    e = elements["eccentricity"]
+    true_anomaly = np.arange(SHELL_SAMPLES) * (TWO_PI / SHELL_SAMPLES)
+    target = _mean_anomaly_from_true(true_anomaly[None, :], e[:, None])
+    minutes_start = (start_jd - elements["epoch_jd"]) * 1440.0
+    rate = elements["mean_anomaly_rate"][:, None]
+    offsets = []
+    for reference in (0.0, window_minutes / 2, window_minutes):
+        mean_now = elements["mean_anomaly"][:, None] + rate * (minutes_start[:, None] + reference)
+        offsets.append(reference + np.mod(target - mean_now, TWO_PI) / rate)
+    offsets = np.concatenate(offsets, axis=1)
+
+    whole = np.floor(start_jd)
+    radii = np.full(offsets.shape, np.nan)
+    jd = np.full(offsets.shape[1], whole)
+    for row, sat in enumerate(satrecs):
+        errors, positions, _ = sat.sgp4_array(jd, (start_jd - whole) + offsets[row] / 1440.0)
+        radii[row, errors == 0] = np.linalg.norm(positions[errors == 0], axis=1)
+
+    sampled = np.isfinite(radii).any(axis=1)
+    low, high = elements["perigee_km"].copy(), elements["apogee_km"].copy()
+    low[sampled] = np.nanmin(radii[sampled], axis=1)
+    high[sampled] = np.nanmax(radii[sampled], axis=1)
+    semi_major = (low + high) / 2
+    conic = semi_major[:, None] * (1 - e[:, None] ** 2) / (1 + e[:, None] * np.cos(np.tile(true_anomaly, 3)))
+    residual = np.nan_to_num(np.nanmax(np.abs(radii - conic), axis=1, initial=0.0))
+    widen = semi_major * e * (1 - np.cos(np.pi / SHELL_SAMPLES)) + SHELL_MARGIN_KM
+    return low - widen, high + widen, semi_major, residual + widen
+
+
+def anchor_elements(elements, satrecs, start_jd, window_seconds):
+    """
+    Re-reference the elements to the screening window.
+    Mean anomaly extrapolated from an old epoch drifts by tens of km because
+    of drag, so every object is propagated once at the start and once at the
+    end of the window and the mean anomaly and its rate are fitted to those
+    states. The shells and semi-major axes are then replaced with
+    propagated_shells (a few dozen sgp4 calls per object, none per pair).
+    Returns a copy of elements whose epoch is start_jd.
+    """
+    window_minutes = window_seconds / 60.0
+    jd = np.floor(start_jd) + np.array([0.0, 0.0])
+    fr = (start_jd - np.floor(start_jd)) + np.array([0.0, window_seconds / 86400.0])
+    errors, positions, _ = SatrecArray(list(satrecs)).sgp4(jd, fr)
+
+    anchored = dict(elements)
+    minutes_start = (start_jd - elements["epoch_jd"]) * 1440.0
+    mean_anomaly = []
+    for index, dt in enumerate((minutes_start, minutes_start + window_minutes)):
+        raan = elements["raan"] + elements["raan_rate"] * dt
+        argp = elements["argp"] + elements["argp_rate"] * dt
+        P, Q, _ = _plane_basis(elements["inclination"], raan)
+        r = positions[:, index]
+        u = np.arctan2(np.einsum("ij,ij->i", r, Q), np.einsum("ij,ij->i", r, P))
+        mean_anomaly.append(_mean_anomaly_from_true(u - argp, elements["eccentricity"]))
+
+    # add the whole revolutions the secular rate says happened between the two states
+    expected = elements["mean_anomaly_rate"] * window_minutes
+    swept = mean_anomaly[1] - mean_anomaly[0]
+    swept += np.round((expected - swept) / TWO_PI) * TWO_PI
+    failed = (errors != 0).any(axis=1) | (window_minutes <= 0)
+
+    anchored["raan"] = elements["raan"] + elements["raan_rate"] * minutes_start
+    anchored["argp"] = elements["argp"] + elements["argp_rate"] * minutes_start
+    anchored["mean_anomaly"] = np.where(
+        failed, elements["mean_anomaly"] + elements["mean_anomaly_rate"] * minutes_start,
+        mean_anomaly[0]
+    )
+    anchored["mean_anomaly_rate"] = np.where(
+        failed, elements["mean_anomaly_rate"], swept / max(window_minutes, 1e-9)
+    )
+    anchored["epoch_jd"] = np.full_like(elements["epoch_jd"], start_jd)
+
+    perigee, apogee, semi_major, slack = propagated_shells(anchored, satrecs, start_jd, window_seconds)
+    anchored.update(perigee_km=perigee, apogee_km=apogee, semi_major_km=semi_major, radial_slack_km=slack)
+    return anchored
+
+
+def _path_and_time_stages(geometry, i, j, pad_km, stage, separation, alive=None):
+    """Run the orbit-path and, when geometry has a window, time-window stages on pairs that passed the shell test"""
+    alive = np.arange(len(i)) if alive is None else alive
+    i, j = i[alive], j[alive]
+    crossings = _crossings(geometry, i, j)
+
+    keep, distance = orbit_path_filter(geometry, i, j, crossings, pad_km)
+    stage[alive[~keep]] = REJECTED_ORBIT_PATH
+    separation[alive[~keep]] = distance[~keep]
+
+    if geometry["window_minutes"] > 0:
+        alive, i, j = alive[keep], i[keep], j[keep]
+        crossings = tuple(values[keep] for values in crossings)
+        keep = time_window_filter(geometry, i, j, crossings, pad_km)
+        stage[alive[~keep]] = REJECTED_TIME_WINDOW
+        # the orbits do come close, just not at the same time within the window
+        separation[alive[~keep]] = pad_km
+
+
+def _geometry_for(elements, start_jd, window_seconds):
+    if start_jd is None or window_seconds is None:
+        return _object_geometry(elements, 0.0, 0.0)
+    return _object_geometry(elements, (start_jd - elements["epoch_jd"]) * 1440.0, window_seconds / 60.0)
+
+
+def prefilter_pairs(elements, pairs, pad_km=20.0, start_jd=None, window_seconds=None):
+    """
+    Run the filter stages over (K, 2) pair indices.
+    Returns a (K,) stage code (KEPT or the REJECTED_* stage that discarded
+    the pair) and a (K,) geometric separation estimate in km for rejected
+    pairs. The time-window stage only runs when start_jd and window_seconds
+    are given; pass elements through anchor_elements first for windows far
+    from the TLE epochs.
+    """
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    stage = np.full(len(pairs), KEPT, dtype=np.int8)
+    separation = np.zeros(len(pairs))
+
+    i, j = pairs[:, 0], pairs[:, 1]
+    keep, gap = apogee_perigee_filter(elements, i, j, pad_km)
+    stage[~keep] = REJECTED_APOGEE_PERIGEE
+    separation[~keep] = gap[~keep]
+
+    geometry = _geometry_for(elements, start_jd, window_seconds)
+    _path_and_time_stages(geometry, i, j, pad_km, stage, separation, alive=np.flatnonzero(keep))
+    return stage, separation
+
+
+def empty_stats():
+    stats = {"candidates": 0, "remaining": 0}
+    stats.update({name: 0 for name in STAGE_NAMES.values()})
+    return stats
+
+
+def add_stage_counts(stats, stage):
+    """Accumulate how many pairs each stage eliminated into stats"""
+    stats["candidates"] += len(stage)
+    stats["remaining"] += int(np.count_nonzero(stage == KEPT))
+    for code, name in STAGE_NAMES.items():
+        stats[name] += int(np.count_nonzero(stage == code))
+    return stats
+
+
+def _shell_partners(elements, pad_km):
+    # with objects sorted by perigee, a's partners are the contiguous run of
+    # later objects whose perigee is below a's apogee + pad
+    order = np.argsort(elements["perigee_km"], kind="stable")
+    perigee = elements["perigee_km"][order]
+    stop = np.searchsorted(perigee, elements["apogee_km"][order] + pad_km, side="right")
+    return order, np.maximum(stop - np.arange(len(order)) - 1, 0)
+
+
+def shell_pair_count(elements, pad_km):
+    """Number of pairs shell_overlap_pairs would yield, without building them"""
+    return int(_shell_partners(elements, pad_km)[1].sum())
+
+
+def shell_overlap_pairs(elements, pad_km, max_pairs=2_000_000):
+    """
+    Yield blocks of (K, 2) pairs whose apogee/perigee shells overlap, without
+    enumerating the rest.
+    """
+    order, counts = _shell_partners(elements, pad_km)
+    n = len(order)
+    positions = np.arange(n)
+    ends = np.cumsum(counts)
+
+    first = 0
+    while first < n:
+        last = max(int(np.searchsorted(ends, ends[first] - counts[first] + max_pairs, side="right")), first + 1)
+        block_counts = counts[first:last]
+        a = np.repeat(positions[first:last], block_counts)
+        starts = np.repeat(np.cumsum(block_counts) - block_counts, block_counts)
+        b = a + 1 + (np.arange(len(a)) - starts)
+        pairs = np.sort(np.stack([order[a], order[b]], axis=1), axis=1)
+        if len(pairs):
+            yield pairs
+        first = last
+
+
+def candidate_pairs(elements, pad_km=20.0, start_jd=None, window_seconds=None):
+    """
+    Run the pipeline over every pair i < j of the catalog, one block at a
+    time so memory stays bounded. Returns the surviving (K, 2) pairs and
+    per-stage elimination counts.
+    """
+    n = len(elements["inclination"])
+    stats = empty_stats()
+    stats["candidates"] = n * (n - 1) // 2
+    geometry = _geometry_for(elements, start_jd, window_seconds)
+    kept = []
+    shell_pairs = 0
+    for pairs in shell_overlap_pairs(elements, pad_km):
+        shell_pairs += len(pairs)
+        stage = np.full(len(pairs), KEPT, dtype=np.int8)
+        separation = np.zeros(len(pairs))
+        _path_and_time_stages(geometry, pairs[:, 0], pairs[:, 1], pad_km, stage, separation)
+        for code, name in STAGE_NAMES.items():
+            stats[name] += int(np.count_nonzero(stage == code))
+        kept.append(pairs[stage == KEPT])
+
+    stats["apogee_perigee"] = stats["candidates"] - shell_pairs
+    kept = np.concatenate(kept) if kept else np.empty((0, 2), dtype=np.int64)
+    stats["remaining"] = len(kept)
+    return kept, stats
+
+
+def catalog_candidates(satrecs, start_jd, window_seconds, pad_km=20.0, max_shell_pairs=None):
+    """
+    Anchor a catalog to the window and return its surviving pairs and stage
+    counts. When the propagated shells overlap for more than max_shell_pairs
+    pairs, the later stages are not run and the pairs are None (every pair
+    is a candidate); stats["skipped"] says which happened.
+    """
+    elements = anchor_elements(orbital_elements(satrecs), satrecs, start_jd, window_seconds)
+    if max_shell_pairs is not None and shell_pair_count(elements, pad_km) > max_shell_pairs:
+        n = len(satrecs)
+        stats = empty_stats()
+        stats["candidates"] = stats["remaining"] = n * (n - 1) // 2
+        stats["skipped"] = True
+        return None, stats
+    candidates, stats = candidate_pairs(elements, pad_km, start_jd, window_seconds)
+    stats["skipped"] = False
+    return candidates, stats
@@ -0,0 +1,101 @@
+import datetime
+import numpy as np
+from sgp4.api import Satrec, SatrecArray, jday # type: ignore
+
+SECONDS_PER_DAY = 86400.0
+
+
+def julian_date(when):
+    """Split a datetime into the (jd, fr) pair used by sgp4"""
+    return jday(
+        when.year, when.month, when.day,
+        when.hour, when.minute, when.second + when.microsecond / 1e6
+    )
+
+
+def time_grid(start, offsets_seconds):
+    """
+    Build the jd/fr arrays for a set of offsets (in seconds) from start.
+    The clock is read and converted once; every sample is an offset from it.
+    """
+    jd0, fr0 = julian_date(start)
+    offsets = np.asarray(offsets_seconds, dtype=np.float64)
+    fr = fr0 + offsets / SECONDS_PER_DAY
+    # keep fr within [0, 1) so the sgp4 time math stays precise over long windows
+    whole_days = np.floor(fr)
+    jd = np.full(offsets.shape, jd0) + whole_days
+    fr = fr - whole_days
+    return jd, fr
+
+
+def uniform_offsets(duration_seconds, num_steps):
+    """Evenly spaced offsets covering duration_seconds (end excluded)"""
+    return np.arange(num_steps, dtype=np.float64) * (duration_seconds / num_steps)
+
+
+def hold_last_good(values, errors):
+    """
+    Replace samples that failed to propagate with the last good sample.
+    Samples before the first good one become zeros. Works along the last
+    time axis, so values can be (N, 3) or (M, N, 3) with errors (N,) or (M, N).
+    """
+    values = np.asarray(values)
+    errors = np.asarray(errors)
+    steps = np.arange(errors.shape[-1])
+    last_good = np.where(errors == 0, steps, -1)
+    last_good = np.maximum.accumulate(last_good, axis=-1)
+
+    filled = np.take_along_axis(values, np.maximum(last_good, 0)[..., None], axis=-2)
+    filled[last_good < 0] = 0.0
+    return np.ascontiguousarray(filled)
+
+
+def propagate(sat, jd, fr):
+    """
+    Propagate one Satrec over the jd/fr arrays in a single call.
+    Returns contiguous (N, 3) positions and velocities plus (N,) error codes.
+    """
+    errors, positions, velocities = sat.sgp4_array(jd, fr)
+    return (
+        np.ascontiguousarray(positions),
+        np.ascontiguousarray(velocities),
+        errors,
+    )
+
+
+def propagate_many(sats, jd, fr):
+    """
+    Propagate a list of Satrec (or a prebuilt SatrecArray) over shared jd/fr arrays.
+    Returns (M, N, 3) positions and velocities plus (M, N) error codes.
+    """
+    sat_array = sats if isinstance(sats, SatrecArray) else SatrecArray(list(sats))
+    errors, positions, velocities = sat_array.sgp4(jd, fr)
+    return positions, velocities, errors
+
+
+def propagate_tle(tle_line1, tle_line2, offsets_seconds, start=None):
+    """
+    Propagate a TLE over offsets from start (defaults to now, read once).
+    Failed samples hold the last good position and velocity.
+    """
+    if start is None:
+        start = datetime.datetime.now(datetime.timezone.utc)
+    sat = Satrec.twoline2rv(tle_line1, tle_line2)
+    jd, fr = time_grid(start, offsets_seconds)
+    positions, velocities, errors = propagate(sat, jd, fr)
+    return hold_last_good(positions, errors), hold_last_good(velocities, errors), errors
+
+
+def iter_propagation_windows(sat, start, num_steps, step_seconds, window_steps):
+    """
+    Propagate num_steps samples spaced step_seconds apart from start, one
+    window of at most window_steps samples at a time, so memory stays bounded
+    by the window size rather than the full duration.
+    Yields (offsets, positions, velocities, errors) per window.
+    """
+    for first in range(0, num_steps, window_steps):
+        last = min(first + window_steps, num_steps)
+        offsets = np.arange(first, last, dtype=np.float64) * step_seconds
+        jd, fr = time_grid(start, offsets)
+        positions, velocities, errors = propagate(sat, jd, fr)
+        yield offsets, positions, velocities, errors
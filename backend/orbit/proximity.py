@@ -0,0 +1,193 @@
+"""
+One-versus-catalog proximity queries: what comes near this object in the
+next hours?
+
+A ShellIndex buckets the catalog by orbital radius. Each object is listed
+in every altitude band its [perigee, apogee] shell touches. So the only
+objects that can come within pad_km of a query orbit are the ones listed
+in the bands that orbit's padded shell covers. The shells are the radii
+SGP4 reaches (prefilters.propagated_shells), not the epoch mean a(1 ± e),
+which drag moves objects out of within days. One index covers a UTC day
+plus the longest query window; it is built once per catalog version and
+day and kept for the life of the process.
+
+Inclination alone cannot rule a pair out, since every orbit crosses the
+equator. The orbit-path and time-window prefilters therefore test the
+planes and the timing of the shell candidates. Only the survivors are
+propagated, against the query object alone, and each approach is refined
+to its true time of closest approach.
+"""
+import datetime
+from functools import lru_cache
+
+import numpy as np
+from sgp4.api import SatrecArray # type: ignore
+
+from .prefilters import KEPT, anchor_elements, orbital_elements, prefilter_pairs
+from .propagation import julian_date, time_grid
+from .screening import (
+    PREFILTER_MARGIN_KM, ConjunctionTracker, catalog_key, get_catalog, refine_conjunctions, select_events
+)
+
+# radial width of one index band
+SHELL_BAND_KM = 50.0
+# slack for the bend of the relative path over half a step, beyond the straight-line prediction
+PREDICTION_MARGIN_KM = 10.0
+# time an index covers from the midnight before a query: the day plus the longest query window
+INDEX_SPAN_SECONDS = (24.0 + 72.0) * 3600
+
+
+class ShellIndex:
+    """Catalog rows bucketed by the altitude bands their perigee/apogee shells touch"""
+
+    def __init__(self, perigee_km, apogee_km, band_km=SHELL_BAND_KM):
+        self.perigee_km = np.asarray(perigee_km, dtype=np.float64)
+        self.apogee_km = np.asarray(apogee_km, dtype=np.float64)
+        self.band_km = band_km
+        first = np.floor(self.perigee_km / band_km).astype(np.int64)
+        last = np.floor(self.apogee_km / band_km).astype(np.int64)
+        counts = last - first + 1
+        # one entry per (band, row); entries of a band are contiguous, found through offsets
+        starts = np.cumsum(counts) - counts
+        bands = np.repeat(first, counts) + (np.arange(counts.sum()) - np.repeat(starts, counts))
+        order = np.argsort(bands, kind="stable")
+        self.rows = np.repeat(np.arange(len(counts)), counts)[order]
+        self.offsets = np.searchsorted(bands[order], np.arange((last.max() + 2) if len(last) else 1))
+
+    def __len__(self):
+        return len(self.perigee_km)
+
+    def query(self, perigee_km, apogee_km, pad_km):
+        """Rows whose shells come within pad_km of [perigee_km, apogee_km], read from the overlapping bands only"""
+        low, high = perigee_km - pad_km, apogee_km + pad_km
+        first = int(np.clip(np.floor(low / self.band_km), 0, len(self.offsets) - 1))
+        last = int(np.clip(np.floor(high / self.band_km) + 1, 0, len(self.offsets) - 1))
+        rows = np.unique(self.rows[self.offsets[first]:self.offsets[last]])
+        return rows[(self.perigee_km[rows] <= high) & (self.apogee_km[rows] >= low)]
+
+
+def _propagated_index(elements, satrecs, start, span_seconds):
+    jd, fr = julian_date(start)
+    shells = anchor_elements(elements, satrecs, jd + fr, span_seconds)
+    return ShellIndex(shells["perigee_km"], shells["apogee_km"])
+
+
+@lru_cache(maxsize=4)
+def _cached_index(source, key, midnight):
+    _, _, satrecs = get_catalog(source)
+    elements = orbital_elements(satrecs)
+    return _propagated_index(elements, satrecs, midnight, INDEX_SPAN_SECONDS), elements
+
+
+def get_shell_index(source, start, duration_seconds):
+    """
+    (ShellIndex, orbital elements) of a get_catalog source whose shells hold
+    over the window; rebuilt when the catalog changes or the day rolls over.
+    Windows running past the day's index get an index of their own.
+    """
+    midnight = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    if start + datetime.timedelta(seconds=duration_seconds) <= midnight + datetime.timedelta(seconds=INDEX_SPAN_SECONDS):
+        return _cached_index(source, catalog_key(source), midnight)
+    _, _, satrecs = get_catalog(source)
+    elements = orbital_elements(satrecs)
+    return _propagated_index(elements, satrecs, start, duration_seconds), elements
+
+
+def proximity_candidates(target, index, elements, satrecs, start, duration_seconds, pad_km, exclude=None):
+    """
+    Catalog rows that may come within pad_km of target over the window:
+    the shell index candidates that pass the orbit-path and time-window
+    prefilters. Rows in exclude are never returned.
+    Returns (rows, number of shell candidates).
+    """
+    jd, fr = julian_date(start)
+    start_jd = jd + fr
+    target_elements = orbital_elements([target])
+    target_shell = anchor_elements(target_elements, [target], start_jd, duration_seconds)
+    rows = index.query(float(target_shell["perigee_km"][0]), float(target_shell["apogee_km"][0]), pad_km)
+    if exclude is not None:
+        rows = rows[~np.isin(rows, exclude)]
+    shell_count = len(rows)
+    if shell_count == 0:
+        return rows, 0
+
+    combined = {key: np.concatenate([target_elements[key], elements[key][rows]]) for key in elements}
+    combined = anchor_elements(combined, [target] + [satrecs[row] for row in rows], start_jd, duration_seconds)
+    pairs = np.stack([np.zeros(shell_count, dtype=np.int64), np.arange(1, shell_count + 1)], axis=1)
+    stage, _ = prefilter_pairs(combined, pairs, pad_km, start_jd, duration_seconds)
+    return rows[stage == KEPT], shell_count
+
+
+def closest_approaches(target, others, start, duration_seconds, step_seconds=60.0, threshold_km=5.0,
+                       margin_km=PREDICTION_MARGIN_KM, chunk_steps=120):
+    """
+    Approaches of each Satrec in others to target within threshold_km,
+    refined to their true TCA. At every step, an object is flagged when its
+    straight-line motion relative to the target passes within threshold_km
+    + margin_km during the half steps either side; margin_km covers the
+    curvature the straight line ignores. Events have i = 0 (target) and
+    j = 1 + the index into others, and are sorted by miss distance.
+    """
+    if not others:
+        return []
+    satrecs = [target] + list(others)
+    sat_array = SatrecArray(satrecs)
+    num_steps = int(duration_seconds // step_seconds) + 1
+    tracker = ConjunctionTracker()
+    for first in range(0, num_steps, chunk_steps):
+        last = min(first + chunk_steps, num_steps)
+        errors, positions, velocities = sat_array.sgp4(*time_grid(start, np.arange(first, last) * step_seconds))
+        positions[errors != 0] = np.nan
+        # (others, steps) relative states; NaN compares false, so failed samples are never flagged
+        offset_km = positions[1:] - positions[:1]
+        closing = velocities[1:] - velocities[:1]
+        distances = np.linalg.norm(offset_km, axis=2)
+        speed2 = np.maximum(np.einsum("ijk,ijk->ij", closing, closing), 1e-12)
+        seconds = np.clip(-np.einsum("ijk,ijk->ij", offset_km, closing) / speed2, -step_seconds / 2, step_seconds / 2)
+        nearest = np.linalg.norm(offset_km + closing * seconds[..., None], axis=2)
+        flagged = nearest <= threshold_km + margin_km
+        for offset in range(last - first):
+            close = np.flatnonzero(flagged[:, offset])
+            pairs = np.stack([np.zeros(len(close), dtype=np.int64), close + 1], axis=1)
+            # events keep the sampled distance, so refinement always replaces it with the true minimum
+            tracker.update(first + offset, pairs, distances[close, offset])
+
+    events = refine_conjunctions(tracker.finish(), satrecs, start, duration_seconds, step_seconds)
+    return select_events(events, threshold_km)
+
+
+def proximity_query(target, start, duration_seconds, source="active", step_seconds=60.0, threshold_km=5.0,
+                    exclude_satnum=None):
+    """
+    Closest approaches of target to the catalog objects of source, closest
+    first. Catalog objects with NORAD id exclude_satnum (the target's own
+    entry) are skipped. Returns the events with j replaced by the catalog
+    row of the other object, and per-stage candidate counts.
+    """
+    names, satnums, satrecs = get_catalog(source)
+    index, elements = get_shell_index(source, start, duration_seconds)
+    exclude = np.flatnonzero(satnums == exclude_satnum) if exclude_satnum is not None else None
+    rows, shell_count = proximity_candidates(
+        target, index, elements, satrecs, start, duration_seconds, threshold_km + PREFILTER_MARGIN_KM,
+        exclude=exclude
+    )
+    events = closest_approaches(
+        target, [satrecs[row] for row in rows], start, duration_seconds, step_seconds=step_seconds,
+        threshold_km=threshold_km
+    )
+    for event in events:
+        event["j"] = int(rows[event["j"] - 1])
+    stats = {"catalog": len(satrecs), "shell": shell_count, "propagated": len(rows)}
+    return events, stats
+
+
+def describe_approach(event, names, satnums, start, step_seconds):
+    """A proximity_query event in the JSON shape returned by the API"""
+    seconds = event.get("tca_seconds", event["tca_step"] * step_seconds)
+    return {
+        "name": names[event["j"]],
+        "norad_id": int(satnums[event["j"]]),
+        "time": (start + datetime.timedelta(seconds=seconds)).isoformat(),
+        "miss_distance_km": event["miss_distance_km"],
+        "relative_velocity_km_s": event.get("relative_velocity_km_s"),
+    }
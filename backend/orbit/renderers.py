@@ -0,0 +1,156 @@
+"""
+Renderers for trail and position payloads.
+
+Views that support the compact layouts list all three renderer classes and
+build a columnar payload (epoch plus step instead of per-point timestamps,
+NumPy arrays instead of lists of points) when wants_columnar() is true.
+Clients pick a layout with the Accept header or DRF's ?format= parameter:
+
+- json (default): the endpoint's original shape.
+- columnar: the columnar payload as JSON. Arrays are flattened row-major
+  with their shapes listed under "shapes", floats are written with no more
+  digits than float32 holds, and NaN (failed samples) becomes null.
+- bin: the columnar payload packed for typed arrays. Layout:
+    4 bytes   magic b"ORBA"
+    uint32    header length H (little-endian)
+    H bytes   UTF-8 JSON header, space padded to a multiple of 8 bytes: the
+              non-array fields plus "arrays": {name: {"dtype", "shape",
+              "offset"}}, offsets counted from the end of the header
+    arrays    little-endian, each 8-byte aligned, so
+              new Float32Array(buffer, 8 + H + offset, length) reads them
+              in place.
+"""
+import json
+import struct
+
+import numpy as np
+from rest_framework import renderers # type: ignore
+
+from .metrics import span
+
+COLUMNAR_FORMATS = {"columnar", "bin"}
+PACKED_MAGIC = b"ORBA"
+_PREFIX = struct.Struct("<4sI")
+_ALIGN = 8
+# dtype names as JavaScript typed arrays know them
+_DTYPES = {"f4": "float32", "f8": "float64", "i4": "int32", "u4": "uint32", "i2": "int16", "u2": "uint16",
+           "i1": "int8", "u1": "uint8"}
+
+
+def wants_columnar(request):
+    """True when content negotiation picked one of the compact layouts"""
+    return getattr(getattr(request, "accepted_renderer", None), "format", None) in COLUMNAR_FORMATS
+
+
+def _float_decimals(values):
+    """Decimal places that keep the ~7 significant digits float32 carries"""
+    finite = values[np.isfinite(values)]
+    largest = float(np.abs(finite).max()) if len(finite) else 0.0
+    return int(max(0, 7 - (int(np.floor(np.log10(largest))) + 1 if largest >= 1 else 0)))
+
+
+def columnar_json_data(data):
+    """Replace array fields by flat lists and record their shapes"""
+    if not isinstance(data, dict):
+        return data
+    out, shapes = {}, {}
+    for key, value in data.items():
+        if not isinstance(value, np.ndarray):
+            out[key] = value
+            continue
+        shapes[key] = list(value.shape)
+        flat = value.ravel()
+        if flat.dtype.kind == "f":
+            flat = flat.astype(np.float64)
+            missing = np.flatnonzero(~np.isfinite(flat))
+            flat = np.round(flat, _float_decimals(flat)).tolist()
+            for index in missing.tolist():
+                flat[index] = None
+        else:
+            flat = flat.tolist()
+        out[key] = flat
+    if shapes:
+        out["shapes"] = shapes
+    return out
+
+
+def nested_json_data(data):
+    """Replace array fields by nested lists, NaN and infinities by None"""
+    if not isinstance(data, dict):
+        return data
+    out = {}
+    for key, value in data.items():
+        if isinstance(value, np.ndarray) and value.dtype.kind == "f":
+            missing = ~np.isfinite(value)
+            value = value.astype(object)
+            value[missing] = None
+        out[key] = value.tolist() if isinstance(value, np.ndarray) else value
+    return out
+
+
+def pack_arrays(data):
+    """A dict holding NumPy arrays -> bytes in the packed layout described above"""
+    data = data if isinstance(data, dict) else {"data": data}
+    header = {key: value for key, value in data.items() if not isinstance(value, np.ndarray)}
+    arrays = [(key, np.ascontiguousarray(value, dtype=value.dtype.newbyteorder("<")))
+              for key, value in data.items() if isinstance(value, np.ndarray)]
+
+    descriptors, offset = {}, 0
+    for key, array in arrays:
+        descriptors[key] = {"dtype": _DTYPES[array.dtype.str[1:]], "shape": list(array.shape), "offset": offset}
+        offset += array.nbytes + (-array.nbytes % _ALIGN)
+    header["arrays"] = descriptors
+    encoded = json.dumps(header, separators=(",", ":")).encode()
+    encoded += b" " * (-(_PREFIX.size + len(encoded)) % _ALIGN)
+
+    parts = [_PREFIX.pack(PACKED_MAGIC, len(encoded)), encoded]
+    for _, array in arrays:
+        parts.append(array.tobytes())
+        parts.append(b"\0" * (-array.nbytes % _ALIGN))
+    return b"".join(parts)
+
+
+def unpack_arrays(blob):
+    """bytes in the packed layout -> dict with the header fields and the arrays"""
+    magic, header_length = _PREFIX.unpack_from(blob, 0)
+    if magic != PACKED_MAGIC:
+        raise ValueError("Not a packed array payload")
+    data_start = _PREFIX.size + header_length
+    header = json.loads(blob[_PREFIX.size:data_start])
+    for key, descriptor in header.pop("arrays").items():
+        dtype = np.dtype(descriptor["dtype"]).newbyteorder("<")
+        count = int(np.prod(descriptor["shape"]))
+        array = np.frombuffer(blob, dtype=dtype, count=count, offset=data_start + descriptor["offset"])
+        header[key] = array.reshape(descriptor["shape"])
+    return header
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """DRF's JSON renderer, timed as the "serialize" stage"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with span("serialize"):
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class ColumnarJSONRenderer(renderers.JSONRenderer):
+    media_type = "application/vnd.orbit.columnar+json"
+    format = "columnar"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with span("serialize"):
+            return super().render(columnar_json_data(data), accepted_media_type, renderer_context)
+
+
+class PackedArrayRenderer(renderers.BaseRenderer):
+    media_type = "application/vnd.orbit.arrays"
+    format = "bin"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with span("serialize"):
+            return pack_arrays(data)
+
+
+ARRAY_RENDERERS = [JSONRenderer, ColumnarJSONRenderer, PackedArrayRenderer]
@@ -0,0 +1,173 @@
+"""
+In-process cache for prediction/trail results.
+
+Keys are a SHA-1 of the normalised TLE lines plus the request parameters
+(trail window, step, start bucket, model version), so a replayed scenario
+maps to the same entry whatever whitespace the client sent. Values are
+packed bytes (a small header plus float32 position arrays) rather than
+lists of dicts. Entries are evicted least-recently-used once the byte or
+entry budget is exceeded, and expire after a TTL that grows with the age
+of the TLE epoch (fresh element sets get replaced sooner). Entries are
+tagged with the NORAD ids they were computed for; when an ingest changes or
+removes an object, only the entries tagged with it are dropped.
+"""
+import hashlib
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+_HEADER = struct.Struct("<16sdfH")  # prediction label, start timestamp, step seconds, trail count
+_TRAIL = struct.Struct("<I")  # points in the trail
+
+
+def normalize_tle(tle):
+    """Strip surrounding whitespace and blank lines from a multi-line TLE string"""
+    return "\n".join(line.strip() for line in str(tle).strip().splitlines() if line.strip())
+
+
+def request_key(tles, **params):
+    """Content hash of the TLEs plus request parameters"""
+    digest = hashlib.sha1()
+    for tle in tles:
+        digest.update(normalize_tle(tle).encode())
+        digest.update(b"\0")
+    for name in sorted(params):
+        digest.update(f"{name}={params[name]!r};".encode())
+    return digest.hexdigest()
+
+
+def epoch_ttl(sats, now, fraction=0.1, min_seconds=60.0, max_seconds=3600.0):
+    """
+    TTL from the age of the newest TLE epoch: fraction of the age, clamped.
+    A TLE hours old is likely to be superseded soon; one days old is not.
+    """
+    newest = max(sat.jdsatepoch + sat.jdsatepochF for sat in sats)
+    age_seconds = (now.timestamp() / 86400.0 + 2440587.5 - newest) * 86400.0
+    return float(np.clip(age_seconds * fraction, min_seconds, max_seconds))
+
+
+def pack_result(label, start_timestamp, step_seconds, trails):
+    """Prediction label plus (N, 3) trail arrays -> bytes"""
+    parts = [_HEADER.pack(label.encode(), start_timestamp, step_seconds, len(trails))]
+    for positions in trails:
+        positions = np.ascontiguousarray(positions, dtype="<f4").reshape(-1, 3)
+        parts.append(_TRAIL.pack(len(positions)))
+        parts.append(positions.tobytes())
+    return b"".join(parts)
+
+
+def unpack_result(blob):
+    """bytes -> (label, start_timestamp, step_seconds, [(N, 3) float32 arrays])"""
+    label, start_timestamp, step_seconds, count = _HEADER.unpack_from(blob, 0)
+    offset = _HEADER.size
+    trails = []
+    for _ in range(count):
+        (points,) = _TRAIL.unpack_from(blob, offset)
+        offset += _TRAIL.size
+        trails.append(np.frombuffer(blob, dtype="<f4", count=3 * points, offset=offset).reshape(points, 3))
+        offset += 12 * points
+    return label.rstrip(b"\0").decode(), start_timestamp, step_seconds, trails
+
+
+class ResultCache:
+    """Thread-safe LRU of bytes values bounded by total size and entry count, with per-entry TTL"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_entries=4096):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, blob, tags)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidated = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._remove(key)
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, blob, ttl_seconds, tags=()):
+        if len(blob) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl_seconds, blob, frozenset(tags))
+            self._bytes += len(blob)
+            while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, blob, _ = self._entries.pop(key)
+        self._bytes -= len(blob)
+
+    def invalidate(self, tags):
+        """Drop every entry tagged with any of tags; returns how many were dropped"""
+        tags = set(tags)
+        with self._lock:
+            stale = [key for key, (_, _, entry_tags) in self._entries.items() if not entry_tags.isdisjoint(tags)]
+            for key in stale:
+                self._remove(key)
+            self.invalidated += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "invalidated": self.invalidated,
+            }
+
+
+_cache = None
+_changes = None
+
+
+def get_result_cache():
+    """
+    The process-wide result cache, sized from settings. Each call also
+    follows the catalog change log, dropping entries for objects that an
+    ingest changed since the last call.
+    """
+    global _cache, _changes
+    if _cache is None:
+        from django.conf import settings
+        from .ingest import ChangeFollower, changes_path
+        _cache = ResultCache(settings.ORBIT_RESULT_CACHE_MAX_BYTES, settings.ORBIT_RESULT_CACHE_MAX_ENTRIES)
+        _changes = ChangeFollower(changes_path())
+    satnums = _changes.poll()
+    if satnums is None:
+        _cache.clear()
+    elif satnums:
+        _cache.invalidate(satnums)
+    return _cache
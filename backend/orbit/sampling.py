@@ -0,0 +1,130 @@
+"""
+Trail sampling bounded by chordal error.
+
+A polyline through samples dt apart cuts inside the orbit by about
+a_n * dt**2 / 8, where a_n is the acceleration normal to the path. Gravity
+bounds a_n by mu / r**2, which is largest at perigee. So the step that keeps
+every chord within a tolerance follows from the mean motion and
+eccentricity alone. It is long for GEO, where one step fits hundreds of
+kilometres of arc, and short for a low perigee.
+
+A uniform step that is right at perigee oversamples the rest of an
+eccentric orbit. decimate() then drops every sample that the chord between
+its kept neighbours passes within the tolerance (Douglas-Peucker). Near
+perigee, where the sampling error is largest, nothing is dropped, and
+towards apogee the sampling error is small. The two errors add only in
+between, so the kept polyline stays within about the tolerance of the true
+orbit (less than 10% over in the tests and on the active catalog).
+
+trail_positions, trail_step and trail_points build the trails the
+visualization view and the trail jobs serve.
+"""
+import datetime
+
+import numpy as np
+from django.conf import settings
+
+from .ephemeris import lookup_positions
+from .features import EARTH_RADIUS_KM, MU_KM3_S2
+from .propagation import propagate, time_grid
+
+# upper bound on the angle one step may sweep, so the small-angle chord estimate holds
+MIN_SAMPLES_PER_ORBIT = 36
+
+TRAIL_MINUTES = 1440
+TRAIL_STEP_SECONDS = 60
+
+
+def orbital_period_seconds(sat):
+    return 2.0 * np.pi / (sat.no_kozai / 60.0)
+
+
+def chord_step_seconds(perigee_km, tolerance_km):
+    """Step whose chords stay within tolerance_km of an orbit with this perigee radius"""
+    return float(np.sqrt(8.0 * tolerance_km * perigee_km ** 2 / MU_KM3_S2))
+
+
+def trail_step_seconds(sat, tolerance_km):
+    """Whole-second sampling step for a Satrec, from its mean motion (no_kozai) and eccentricity (ecco)"""
+    mean_motion = sat.no_kozai / 60.0  # radians/second
+    semi_major_km = (MU_KM3_S2 / mean_motion ** 2) ** (1.0 / 3.0)
+    perigee_km = semi_major_km * (1.0 - min(sat.ecco, 0.99))
+    step = min(chord_step_seconds(perigee_km, tolerance_km), orbital_period_seconds(sat) / MIN_SAMPLES_PER_ORBIT)
+    return max(1, int(step))
+
+
+def min_trail_step_seconds(tolerance_km):
+    """Shortest step trail_step_seconds can return: a perigee at the Earth's surface"""
+    return max(1, int(chord_step_seconds(EARTH_RADIUS_KM, tolerance_km)))
+
+
+def decimate(positions, tolerance_km):
+    """
+    Indices of the samples Douglas-Peucker keeps from an (N, 3) polyline.
+    Every dropped sample lies within tolerance_km of the chord between the
+    kept samples either side of it. The first and last samples are always kept.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    count = len(positions)
+    if count <= 2:
+        return np.arange(count)
+    keep = np.zeros(count, dtype=bool)
+    keep[[0, -1]] = True
+    spans = [(0, count - 1)]
+    while spans:
+        first, last = spans.pop()
+        if last - first < 2:
+            continue
+        origin = positions[first]
+        chord = positions[last] - origin
+        inner = positions[first + 1:last] - origin
+        length2 = chord @ chord
+        along = np.clip(inner @ chord / length2, 0.0, 1.0) if length2 > 0 else np.zeros(len(inner))
+        deviation = np.linalg.norm(inner - along[:, None] * chord, axis=1)
+        farthest = int(np.argmax(deviation))
+        if deviation[farthest] > tolerance_km:
+            split = first + 1 + farthest
+            keep[split] = True
+            spans += [(first, split), (split, last)]
+    return np.flatnonzero(keep)
+
+
+def trail_positions(sat, minutes=TRAIL_MINUTES, step_sec=TRAIL_STEP_SECONDS, start=None):
+    """
+    (N, 3) trail positions in km. Served from the ephemeris table when it
+    covers the window, otherwise propagated in one call; the trail stops at
+    the first sample that fails to propagate.
+    """
+    now = start or datetime.datetime.now(datetime.timezone.utc)
+    offsets = np.arange(0, minutes * 60, step_sec, dtype=np.float64)
+    positions = lookup_positions(sat, now, offsets)
+    if positions is None:
+        jd, fr = time_grid(now, offsets)
+        positions, _, errors = propagate(sat, jd, fr)
+        failed = np.flatnonzero(errors)
+        if len(failed):
+            positions = positions[:failed[0]]
+    return positions
+
+
+def trail_points(start, step_sec, positions, indices=None):
+    """Trail positions as the timestamped points the frontend draws; indices are sample numbers of a decimated trail"""
+    positions = np.asarray(positions).tolist()
+    indices = range(len(positions)) if indices is None else np.asarray(indices).tolist()
+    return [
+        {
+            "timestamp": (start + datetime.timedelta(seconds=k * step_sec)).isoformat(),
+            "position": position  # in kilometers
+        }
+        for k, position in zip(indices, positions)
+    ]
+
+
+def trail_step(sats, tolerance_km=None):
+    """
+    One sampling step for trails drawn together, so sample k of every trail
+    is the same instant: the shortest step any of the orbits needs to keep
+    its chords within tolerance_km (ORBIT_TRAIL_TOLERANCE_KM by default)
+    """
+    tolerance_km = settings.ORBIT_TRAIL_TOLERANCE_KM if tolerance_km is None else tolerance_km
+    return min(trail_step_seconds(sat, tolerance_km) for sat in sats)
@@ -0,0 +1,67 @@
+"""
+Storage for custom satellites.
+
+Each satellite is its own CustomSatellite row, so adds and removes are
+single atomic statements (the unique name constraint settles concurrent
+adds) instead of a read-modify-write of one shared cache blob. Polling
+reads only the 12-byte position each satellite is at right now, sliced out
+of the packed blob by the database.
+"""
+import numpy as np
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Mod, Substr
+
+from .models import POSITION_BYTES, POSITION_DTYPE, CustomSatellite
+
+
+def add_satellite(name, tle_line1, tle_line2, positions):
+    """Store a new satellite; returns None if the name is already taken"""
+    satellite = CustomSatellite(name=name, tle_line1=tle_line1, tle_line2=tle_line2)
+    satellite.set_positions(positions)
+    try:
+        with transaction.atomic():
+            satellite.save()
+    except IntegrityError:
+        return None
+    return satellite
+
+
+def remove_satellite(name):
+    """Delete a satellite by name; returns False if it did not exist"""
+    deleted, _ = CustomSatellite.objects.filter(name=name).delete()
+    return deleted > 0
+
+
+def list_satellites():
+    """Name, position count and creation time of every satellite, without the position blobs"""
+    return list(CustomSatellite.objects.values("name", "positions_count", "created_at"))
+
+
+def get_satellites(names=None):
+    """Full rows (positions included) for the given names, or for every satellite"""
+    satellites = CustomSatellite.objects.all()
+    if names is not None:
+        satellites = satellites.filter(name__in=list(names))
+    return list(satellites)
+
+
+def current_positions(tick):
+    """
+    (name, position) for every satellite at loop index tick % positions_count.
+    Only the selected triple of each blob leaves the database.
+    """
+    rows = (
+        CustomSatellite.objects.filter(positions_count__gt=0)
+        .annotate(current=Substr(
+            "positions",
+            Mod(Value(tick), F("positions_count")) * POSITION_BYTES + 1,
+            POSITION_BYTES,
+            output_field=models.BinaryField(),
+        ))
+        .values_list("name", "current")
+    )
+    return [
+        (name, np.frombuffer(bytes(current), dtype=POSITION_DTYPE).astype(float).tolist())
+        for name, current in rows
+    ]
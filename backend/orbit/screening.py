@@ -0,0 +1,303 @@
+"""
+Catalog-wide conjunction screening.
+
+Every object is propagated on a shared time grid and, at each step, close
+pairs are found with a k-d tree instead of checking all n^2 pairs.
+Consecutive steps where the same pair stays within the threshold are merged
+into one conjunction reported at its closest sampled approach.
+"""
+import datetime
+import os
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+from sgp4.api import Satrec, SatrecArray # type: ignore
+
+from .catalog import open_default_catalog, read_tle_lines
+from .prefilters import catalog_candidates
+from .propagation import julian_date, time_grid
+from .tca import refine_between
+
+# extra distance the prefilters allow beyond the screening threshold
+PREFILTER_MARGIN_KM = 15.0
+# the prefilter stages cost about one screened object-step per pair, and in a
+# dense catalog almost every object keeps some candidate, so they only run when
+# the shell-overlapping pairs are at most this fraction of the object-steps
+PREFILTER_PAIR_BUDGET = 0.1
+
+CATALOG_SOURCES = {
+    "active": os.path.join(settings.BASE_DIR, "orbit", "active.txt"),
+    "tle_data": os.path.join(settings.BASE_DIR, "ML", "tle_data.csv"),
+}
+
+
+def load_catalog(path):
+    """
+    Parse a TLE file into names, NORAD ids and Satrec objects.
+    Element sets that fail to initialise are skipped.
+    """
+    names, satnums, satrecs = [], [], []
+    for name, line1, line2 in zip(*read_tle_lines(path)):
+        try:
+            sat = Satrec.twoline2rv(line1, line2)
+        except Exception as e:
+            print(f"Skipping {name}: {e}")
+            continue
+        if sat.error != 0:
+            continue
+        names.append(name)
+        satnums.append(sat.satnum)
+        satrecs.append(sat)
+    return names, np.array(satnums, dtype=np.int64), satrecs
+
+
+def load_store(store):
+    """Names, NORAD ids and Satrecs straight from a binary catalog store"""
+    satrecs = store.satrecs()
+    ok = [row for row, sat in enumerate(satrecs) if sat.error == 0]
+    names = store.names
+    return [names[row] for row in ok], store.satnums[ok].astype(np.int64), [satrecs[row] for row in ok]
+
+
+@lru_cache(maxsize=4)
+def _cached_catalog(path, mtime):
+    # the binary store is used whenever it was built from this exact file
+    store = open_default_catalog()
+    if store is not None and store.meta.get("source") == path and store.meta.get("source_mtime") == mtime:
+        return load_store(store)
+    return load_catalog(path)
+
+
+@lru_cache(maxsize=1)
+def _cached_store(version):
+    return load_store(open_default_catalog())
+
+
+def catalog_key(source="active"):
+    """Version key of a catalog source: ("store", version), or (path, mtime) for a file"""
+    if source == "store":
+        store = open_default_catalog()
+        if store is None:
+            raise FileNotFoundError("No catalog store; run `manage.py build_catalog` first")
+        return "store", store.version
+    path = os.path.abspath(CATALOG_SOURCES.get(source, source))
+    return path, os.path.getmtime(path)
+
+
+def get_catalog(source="active"):
+    """
+    Load a catalog once per process (reloaded if the file changes).
+    source is a CATALOG_SOURCES name, a TLE/CSV path, or "store" for the
+    binary catalog written by build_catalog.
+    """
+    key = catalog_key(source)
+    if source == "store":
+        return _cached_store(key[1])
+    return _cached_catalog(*key)
+
+
+def close_pairs(positions, radius_km):
+    """
+    Find all pairs of rows in an (M, 3) position array closer than radius_km.
+    Rows that are not finite (failed propagation) are ignored.
+    Returns (K, 2) global row indices with i < j and the (K,) distances.
+    """
+    valid = np.flatnonzero(np.isfinite(positions).all(axis=1))
+    if len(valid) < 2:
+        return np.empty((0, 2), dtype=np.int64), np.empty(0)
+
+    points = positions[valid]
+    from scipy.spatial import cKDTree # type: ignore  # imported on first screen, not at start-up
+    pairs = cKDTree(points).query_pairs(radius_km, output_type="ndarray")
+    if len(pairs) == 0:
+        return np.empty((0, 2), dtype=np.int64), np.empty(0)
+
+    distances = np.linalg.norm(points[pairs[:, 0]] - points[pairs[:, 1]], axis=1)
+    return np.sort(valid[pairs], axis=1), distances
+
+
+class ConjunctionTracker:
+    """
+    Merge per-step close pairs into conjunction events.
+    A pair seen on consecutive steps is one event; the event keeps the step
+    with the smallest sampled distance.
+    """
+
+    def __init__(self):
+        self.active = {}
+        self.events = []
+
+    def update(self, step, pairs, distances):
+        for (i, j), distance in zip(pairs.tolist(), distances.tolist()):
+            event = self.active.get((i, j))
+            if event is None:
+                self.active[(i, j)] = {
+                    "i": i, "j": j,
+                    "start_step": step, "end_step": step,
+                    "tca_step": step, "miss_distance_km": distance,
+                }
+                continue
+            event["end_step"] = step
+            if distance < event["miss_distance_km"]:
+                event["miss_distance_km"] = distance
+                event["tca_step"] = step
+
+        for key in [key for key, event in self.active.items() if event["end_step"] < step]:
+            self.events.append(self.active.pop(key))
+
+    def finish(self):
+        self.events.extend(self.active.values())
+        self.active = {}
+        return self.events
+
+
+def refine_conjunctions(events, satrecs, start, duration_seconds, step_seconds):
+    """
+    Replace each event's sampled minimum with the true time of closest
+    approach, searched between the steps either side of the event.
+    """
+    for event in events:
+        first = max(event["start_step"] - 1, 0) * step_seconds
+        last = min((event["end_step"] + 1) * step_seconds, duration_seconds)
+        approach = refine_between(
+            satrecs[event["i"]], satrecs[event["j"]], start, first, last, coarse_step=step_seconds
+        )
+        if approach is None or approach["miss_distance_km"] > event["miss_distance_km"]:
+            continue
+        event["tca_seconds"] = approach["tca_seconds"]
+        event["miss_distance_km"] = approach["miss_distance_km"]
+        event["relative_velocity_km_s"] = approach["relative_velocity_km_s"]
+    return events
+
+
+def screen_rows(n, candidates):
+    """
+    Catalog rows to propagate and the sorted i * n + j keys of the allowed
+    pairs (None when every pair is screened)
+    """
+    if candidates is None:
+        return np.arange(n), None
+    candidates = np.sort(np.asarray(candidates, dtype=np.int64).reshape(-1, 2), axis=1)
+    return np.unique(candidates), np.unique(candidates[:, 0] * n + candidates[:, 1])
+
+
+def sorted_member(keys, sorted_keys):
+    """Which keys are in sorted_keys: one binary search per key, no re-sorting of the candidates every step"""
+    if len(sorted_keys) == 0:
+        return np.zeros(len(keys), dtype=bool)
+    found = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+    return sorted_keys[found] == keys
+
+
+def screen_steps(sat_array, rows, n, candidate_keys, start, first_step, last_step, step_seconds,
+                 search_radius_km, tracker, chunk_steps=60, progress=None):
+    """
+    Propagate the objects of sat_array (catalog rows rows) over steps
+    [first_step, last_step) of the grid and feed each step's close pairs,
+    as full catalog row pairs, to tracker
+    """
+    for first in range(first_step, last_step, chunk_steps):
+        last = min(first + chunk_steps, last_step)
+        jd, fr = time_grid(start, np.arange(first, last) * step_seconds)
+        errors, positions, _ = sat_array.sgp4(jd, fr)
+        positions[errors != 0] = np.nan
+
+        for offset in range(last - first):
+            pairs, distances = close_pairs(positions[:, offset], search_radius_km)
+            pairs = rows[pairs]
+            if candidate_keys is not None:
+                wanted = sorted_member(pairs[:, 0] * n + pairs[:, 1], candidate_keys)
+                pairs, distances = pairs[wanted], distances[wanted]
+            tracker.update(first + offset, pairs, distances)
+
+        if progress:
+            progress(last, last_step)
+
+
+def select_events(events, threshold_km):
+    """Events within the threshold, closest first"""
+    events = [event for event in events if event["miss_distance_km"] <= threshold_km]
+    return sorted(events, key=lambda event: event["miss_distance_km"])
+
+
+def screen_catalog(satrecs, start, duration_seconds, step_seconds=10, threshold_km=5.0,
+                   chunk_steps=60, candidates=None, search_radius_km=None, refine=True, progress=None,
+                   workers=1):
+    """
+    Screen every object in satrecs against every other over a time window.
+    candidates optionally restricts screening to (K, 2) catalog row pairs
+    (e.g. the output of prefilters.candidate_pairs); objects that appear in
+    no candidate pair are never propagated. Event indices always refer to
+    the full satrecs list.
+    With refine, every event is refined to its true TCA; pairs are then
+    collected within search_radius_km (defaults to threshold_km) and kept if
+    the refined miss distance is within threshold_km. A radius of about
+    threshold + 7.5 km/s * step lets coarse steps catch fast crossings.
+    workers other than 1 shards the window in time across that many
+    processes (None: every core); see orbit.parallel_screening.
+    Returns conjunction events sorted by miss distance.
+    """
+    if workers != 1:
+        from .parallel_screening import parallel_screen
+        return parallel_screen(
+            satrecs, start, duration_seconds, step_seconds=step_seconds, threshold_km=threshold_km,
+            chunk_steps=chunk_steps, candidates=candidates, search_radius_km=search_radius_km,
+            refine=refine, progress=progress, workers=workers
+        )
+
+    search_radius_km = threshold_km if search_radius_km is None else max(search_radius_km, threshold_km)
+    n = len(satrecs)
+    rows, candidate_keys = screen_rows(n, candidates)
+
+    tracker = ConjunctionTracker()
+    if len(rows) < 2:
+        return []
+
+    sat_array = SatrecArray([satrecs[row] for row in rows])
+    num_steps = int(duration_seconds // step_seconds) + 1
+    screen_steps(sat_array, rows, n, candidate_keys, start, 0, num_steps, step_seconds, search_radius_km,
+                 tracker, chunk_steps=chunk_steps, progress=progress)
+
+    events = tracker.finish()
+    if refine:
+        events = refine_conjunctions(events, satrecs, start, duration_seconds, step_seconds)
+    return select_events(events, threshold_km)
+
+
+def prefiltered_screen(satrecs, start, duration_seconds, step_seconds=10, threshold_km=5.0,
+                       progress=None, **kwargs):
+    """
+    Run the orbital-geometry prefilters, then screen only the surviving pairs.
+    When the propagated shells overlap for more pairs than
+    PREFILTER_PAIR_BUDGET allows, the later stages would cost more than they
+    can save and every pair is screened instead (stats["skipped"]). Either
+    way the events are the same.
+    Returns the events and the per-stage elimination counts.
+    """
+    jd, fr = julian_date(start)
+    pad_km = max(threshold_km, kwargs.get("search_radius_km") or 0.0) + PREFILTER_MARGIN_KM
+    object_steps = len(satrecs) * (int(duration_seconds // step_seconds) + 1)
+    candidates, stats = catalog_candidates(
+        satrecs, jd + fr, duration_seconds, pad_km=pad_km, max_shell_pairs=PREFILTER_PAIR_BUDGET * object_steps
+    )
+    events = screen_catalog(
+        satrecs, start, duration_seconds, step_seconds=step_seconds, threshold_km=threshold_km,
+        candidates=candidates, progress=progress, **kwargs
+    )
+    return events, stats
+
+
+def describe_conjunction(event, names, satnums, start, step_seconds):
+    """Turn a tracker event into the JSON shape returned by the API"""
+    seconds = event.get("tca_seconds", event["tca_step"] * step_seconds)
+    tca = start + datetime.timedelta(seconds=seconds)
+    return {
+        "sat1": names[event["i"]],
+        "sat2": names[event["j"]],
+        "norad1": int(satnums[event["i"]]),
+        "norad2": int(satnums[event["j"]]),
+        "time": tca.isoformat(),
+        "miss_distance_km": event["miss_distance_km"],
+        "relative_velocity_km_s": event.get("relative_velocity_km_s"),
+    }
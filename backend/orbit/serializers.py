@@ -1,12 +1,131 @@
+import datetime
+from django.conf import settings
 from rest_framework import serializers
 
+from .frames import FRAMES
+from .sampling import min_trail_step_seconds
+
+# epoch the position endpoint used before it became a request parameter
+DEFAULT_POSITION_EPOCH = datetime.datetime(2024, 6, 26, tzinfo=datetime.timezone.utc)
+
+# upper bound on samples built in memory for the "points" and "columnar" outputs
+MAX_BUFFERED_SAMPLES = 36000
+
+FRAME_HELP = "teme: raw SGP4 output; ecef: Earth-fixed; geodetic: latitude/longitude in degrees and height in km"
+
+# upper bound on pairs scored by one batch prediction request
+MAX_BATCH_PAIRS = 5000
+
 class TLERequestSerializer(serializers.Serializer):
     line1 = serializers.CharField()
     line2 = serializers.CharField()
-    duration_seconds = serializers.IntegerField(default=30)
+    duration_seconds = serializers.IntegerField(default=30, min_value=1)
+    epoch = serializers.DateTimeField(default=DEFAULT_POSITION_EPOCH, help_text="Start of the propagation window")
+    step_seconds = serializers.FloatField(default=0.1, min_value=0.001)
+    output = serializers.ChoiceField(choices=["points", "columnar", "stream"], default="points")
+    window_steps = serializers.IntegerField(default=3600, min_value=1, max_value=MAX_BUFFERED_SAMPLES,
+                                            help_text="Samples per chunk in stream output")
+    frame = serializers.ChoiceField(choices=FRAMES, default="teme", help_text=FRAME_HELP)
+
+    def validate(self, data):
+        num_steps = max(1, int(round(data['duration_seconds'] / data['step_seconds'])))
+        if data['output'] != "stream" and num_steps > MAX_BUFFERED_SAMPLES:
+            raise serializers.ValidationError(
+                f"{num_steps} samples requested; use output='stream' above {MAX_BUFFERED_SAMPLES}"
+            )
+        data['num_steps'] = num_steps
+        return data
+
+class LivePositionsSerializer(serializers.Serializer):
+    mode = serializers.ChoiceField(choices=["loop", "live"], default="loop",
+                                   help_text="loop: custom satellites on their stored orbits; live: propagate the tracked set")
+    time = serializers.DateTimeField(required=False, help_text="Instant to propagate to (defaults to now)")
+    norad_ids = serializers.CharField(required=False, help_text="Comma-separated NORAD ids")
+    min_altitude_km = serializers.FloatField(required=False)
+    max_altitude_km = serializers.FloatField(required=False)
+    limit = serializers.IntegerField(required=False, min_value=1)
+    frame = serializers.ChoiceField(choices=FRAMES, default="teme", help_text=FRAME_HELP)
+
+    def validate_norad_ids(self, value):
+        try:
+            return [int(item) for item in value.split(",") if item.strip()]
+        except ValueError:
+            raise serializers.ValidationError("norad_ids must be comma-separated integers")
+
+class BatchPredictionSerializer(serializers.Serializer):
+    pairs = serializers.ListField(
+        child=serializers.DictField(), min_length=1, max_length=MAX_BATCH_PAIRS,
+        help_text="Pairs of {tle1|norad1, tle2|norad2}; tle values are the two TLE lines joined by a newline"
+    )
+
+# upper bounds on the work one background job may queue
+MAX_JOB_PAIRS = 200000
+MAX_JOB_TRAILS = 1000
+MAX_JOB_TRAIL_SAMPLES = 10_000_000  # 120 MB of float32 positions
+
+class TrailJobSerializer(serializers.Serializer):
+    tles = serializers.ListField(
+        child=serializers.CharField(), min_length=1, max_length=MAX_JOB_TRAILS,
+        help_text="TLEs, each the two lines joined by a newline"
+    )
+    start = serializers.DateTimeField(required=False, help_text="Start of the trails (defaults to submission time)")
+    minutes = serializers.IntegerField(default=1440, min_value=1, max_value=7 * 1440)
+    step_seconds = serializers.IntegerField(required=False, min_value=1,
+                                            help_text="Fixed step; by default each trail's step adapts to its orbit")
+    decimate = serializers.BooleanField(default=False,
+                                        help_text="Keep only the samples needed to stay within ORBIT_TRAIL_TOLERANCE_KM")
+
+    def validate_tles(self, value):
+        for index, tle in enumerate(value):
+            if len(tle.strip().split("\n")) != 2:
+                raise serializers.ValidationError(f"TLE {index} must be exactly 2 lines")
+        return value
+
+    def validate(self, data):
+        step_seconds = data.get('step_seconds') or min_trail_step_seconds(settings.ORBIT_TRAIL_TOLERANCE_KM)
+        samples = len(data['tles']) * -(-data['minutes'] * 60 // step_seconds)
+        if samples > MAX_JOB_TRAIL_SAMPLES:
+            raise serializers.ValidationError(f"{samples} trail samples requested; the limit is {MAX_JOB_TRAIL_SAMPLES}")
+        return data
+
+class BatchPredictionJobSerializer(serializers.Serializer):
+    pairs = serializers.ListField(
+        child=serializers.DictField(), min_length=1, max_length=MAX_JOB_PAIRS,
+        help_text="Pairs as for /predict/batch/, without its per-request limit"
+    )
+
+class JobRequestSerializer(serializers.Serializer):
+    kind = serializers.ChoiceField(choices=["trail", "predict", "screen"])
+    params = serializers.DictField(default=dict, help_text="Parameters of the job kind")
 
 class CustomSatelliteSerializer(serializers.Serializer):
     tle = serializers.CharField(help_text="TLE data (2 lines)")
     satellite_name = serializers.CharField(help_text="Name of the satellite")
 
-# JSON <-> py objects
\ No newline at end of file
+class ScreeningRequestSerializer(serializers.Serializer):
+    source = serializers.ChoiceField(choices=["active", "tle_data", "store"], default="active")
+    start = serializers.DateTimeField(required=False, help_text="Start of the screening window (defaults to now)")
+    window_hours = serializers.FloatField(default=1.0, min_value=0.0, max_value=24.0)
+    step_seconds = serializers.FloatField(default=10.0, min_value=1.0)
+    threshold_km = serializers.FloatField(default=5.0, min_value=0.0, max_value=100.0)
+    max_results = serializers.IntegerField(default=500, min_value=1)
+    prefilter = serializers.BooleanField(default=True, help_text="Prune pairs by orbital geometry before propagation, when that is cheaper than screening them")
+    search_radius_km = serializers.FloatField(required=False, min_value=0.0, max_value=1000.0,
+                                              help_text="Pair collection radius per step (defaults to threshold_km)")
+
+class ProximityRequestSerializer(serializers.Serializer):
+    tle = serializers.CharField(required=False, help_text="The object's two TLE lines joined by a newline")
+    norad_id = serializers.IntegerField(required=False, min_value=0, help_text="NORAD id of an object in the catalog")
+    source = serializers.ChoiceField(choices=["active", "tle_data", "store"], default="active")
+    start = serializers.DateTimeField(required=False, help_text="Start of the query window (defaults to now)")
+    window_hours = serializers.FloatField(default=24.0, min_value=0.0, max_value=72.0)
+    step_seconds = serializers.FloatField(default=60.0, min_value=1.0, max_value=300.0)
+    threshold_km = serializers.FloatField(default=5.0, min_value=0.0, max_value=100.0)
+    max_results = serializers.IntegerField(default=100, min_value=1)
+
+    def validate(self, data):
+        if ("tle" in data) == ("norad_id" in data):
+            raise serializers.ValidationError("Give exactly one of tle and norad_id")
+        return data
+
+# JSON <-> py objects
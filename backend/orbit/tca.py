@@ -0,0 +1,104 @@
+"""
+Time of closest approach (TCA) between two satellites.
+
+The pair is screened on a coarse grid; every interval where the range rate
+goes from negative to positive brackets a local minimum of the distance,
+which is then refined with Brent's method on re-propagated states. This
+gives metre-level miss distances from 60-120 s grids instead of relying on
+a fine fixed step.
+"""
+import datetime
+
+import numpy as np
+
+from .propagation import julian_date, propagate, time_grid
+
+
+def _relative_state(sat1, sat2, jd, fr):
+    """Relative position/velocity of sat2 w.r.t. sat1 plus a mask of samples where both propagated"""
+    r1, v1, e1 = propagate(sat1, jd, fr)
+    r2, v2, e2 = propagate(sat2, jd, fr)
+    return r2 - r1, v2 - v1, (e1 == 0) & (e2 == 0)
+
+
+def _describe(sat1, sat2, start, jd0, fr0, seconds):
+    """Miss distance and relative speed at seconds after start"""
+    fr = fr0 + seconds / 86400.0
+    e1, r1, v1 = sat1.sgp4(jd0, fr)
+    e2, r2, v2 = sat2.sgp4(jd0, fr)
+    if e1 != 0 or e2 != 0:
+        return None
+    dr = np.subtract(r2, r1)
+    dv = np.subtract(v2, v1)
+    return {
+        "tca_seconds": seconds,
+        "tca": start + datetime.timedelta(seconds=seconds),
+        "miss_distance_km": float(np.linalg.norm(dr)),
+        "relative_velocity_km_s": float(np.linalg.norm(dv)),
+    }
+
+
+def find_close_approaches(sat1, sat2, start, duration_seconds, coarse_step=60.0, tolerance_seconds=1e-3):
+    """
+    Find every local minimum of the distance between sat1 and sat2 in
+    [start, start + duration_seconds].
+    Returns a list of dicts with tca (datetime), tca_seconds,
+    miss_distance_km and relative_velocity_km_s, ordered by time. Window
+    endpoints are reported when the distance is still shrinking there.
+    """
+    from scipy.optimize import brentq # type: ignore  # imported on first use, not at start-up
+
+    offsets = np.arange(0.0, duration_seconds, coarse_step)
+    offsets = np.append(offsets, float(duration_seconds))
+    jd, fr = time_grid(start, offsets)
+    dr, dv, ok = _relative_state(sat1, sat2, jd, fr)
+    # d/dt |dr|^2 / 2; same sign as the range rate
+    rate = np.einsum("ij,ij->i", dr, dv)
+
+    jd0, fr0 = julian_date(start)
+
+    def range_rate(seconds):
+        fr_t = fr0 + seconds / 86400.0
+        e1, r1, v1 = sat1.sgp4(jd0, fr_t)
+        e2, r2, v2 = sat2.sgp4(jd0, fr_t)
+        if e1 != 0 or e2 != 0:
+            raise ValueError(f"sgp4 error {e1 or e2} at {seconds} s")
+        return float(np.dot(np.subtract(r2, r1), np.subtract(v2, v1)))
+
+    candidates = []
+    if ok[0] and rate[0] >= 0:
+        candidates.append(offsets[0])
+
+    brackets = np.flatnonzero((rate[:-1] < 0) & (rate[1:] >= 0) & ok[:-1] & ok[1:])
+    for k in brackets:
+        try:
+            candidates.append(brentq(range_rate, offsets[k], offsets[k + 1], xtol=tolerance_seconds))
+        except ValueError:
+            # sign change vanished on re-propagation, or an object failed to propagate
+            # inside the bracket (e.g. dipped below the surface); fall back to the closer sample
+            candidates.append(offsets[k] if np.linalg.norm(dr[k]) < np.linalg.norm(dr[k + 1]) else offsets[k + 1])
+
+    if ok[-1] and rate[-1] < 0:
+        candidates.append(offsets[-1])
+
+    approaches = [_describe(sat1, sat2, start, jd0, fr0, seconds) for seconds in candidates]
+    return [approach for approach in approaches if approach is not None]
+
+
+def closest_approach(sat1, sat2, start, duration_seconds, coarse_step=60.0, tolerance_seconds=1e-3):
+    """The single closest approach in the window, or None if neither satellite could be propagated"""
+    approaches = find_close_approaches(sat1, sat2, start, duration_seconds, coarse_step, tolerance_seconds)
+    if not approaches:
+        return None
+    return min(approaches, key=lambda approach: approach["miss_distance_km"])
+
+
+def refine_between(sat1, sat2, start, first_seconds, last_seconds, coarse_step=60.0, tolerance_seconds=1e-3):
+    """Closest approach inside [first_seconds, last_seconds] after start"""
+    window_start = start + datetime.timedelta(seconds=first_seconds)
+    span = max(last_seconds - first_seconds, 1e-6)
+    approach = closest_approach(sat1, sat2, window_start, span, coarse_step=min(coarse_step, span),
+                                tolerance_seconds=tolerance_seconds)
+    if approach is not None:
+        approach["tca_seconds"] += first_seconds
+    return approach
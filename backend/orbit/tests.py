@@ -1,3 +1,893 @@
-from django.test import TestCase
+import datetime
+import json
+import os
+import tempfile
+from unittest import mock
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+from sgp4.api import WGS72, Satrec, jday # type: ignore
 
-# Create your tests here.
+from .propagation import hold_last_good, propagate_tle, uniform_offsets
+from .benchmarks import compare_results, synthetic_records
+from .broadcast import PositionTicker
+from .catalog import Catalog, parse_tle_records, save_catalog
+from .forest import CompiledForest, export_forest
+from .jobs import purge_expired, run_worker
+from . import label_collisions
+from .ingest import ChangeFollower, changes_path, ingest_catalog
+from .ephemeris import EphemerisTable, build_ephemeris, get_ephemeris, refresh_ephemeris
+from .features import FeatureStore
+from .frames import WGS84_A_KM, WGS84_E2, ecef_to_geodetic, gmst, teme_to_ecef
+from .models import Job
+from .parallel_screening import merge_slice_events
+from .proximity import ShellIndex, closest_approaches
+from .prefilters import (
+    KEPT, REJECTED_APOGEE_PERIGEE, apogee_perigee_filter, orbital_elements, prefilter_pairs,
+    shell_overlap_pairs
+)
+from .metrics import registry, span
+from .model_registry import ModelRegistry
+from .prediction import batch_features, tle_features
+from .propagation import time_grid, propagate
+from .renderers import columnar_json_data, pack_arrays, unpack_arrays
+from .sampling import decimate, trail_positions, trail_step_seconds
+from .result_cache import ResultCache, pack_result, request_key, unpack_result
+from .satellite_store import add_satellite, current_positions, list_satellites, remove_satellite
+from .screening import (
+    ConjunctionTracker, close_pairs, get_catalog, prefiltered_screen, screen_catalog, screen_rows
+)
+from .tca import closest_approach, find_close_approaches
+from .tracking import TrackedSet, snapshot
+from .versioned import KEEP_VERSIONS, VERSIONS_DIR, new_version_dir
+
+# sample ISS TLE
+ISS_LINE1 = "1 25544U 98067A   24176.43130787  .00015944  00000+0  28697-3 0  9997"
+ISS_LINE2 = "2 25544  51.6405  97.6018 0005068 185.9944 276.2257 15.50387286453432"
+
+# formation-flying pair from active.txt
+PIESAT_A = ("1 56153U 23047A   25185.90804233  .00002135  00000+0  12020-3 0  9994",
+            "2 56153  97.5024  12.9978 0001693  89.1814 270.9612 15.14303137125244")
+PIESAT_B = ("1 56154U 23047B   25185.84196275  .00002170  00000+0  12212-3 0  9990",
+            "2 56154  97.5010  12.9318 0001491 113.2889 246.8500 15.14302737125237")
+
+
+class PropagationTests(SimpleTestCase):
+    def test_matches_scalar_sgp4(self):
+        start = datetime.datetime(2024, 6, 26, tzinfo=datetime.timezone.utc)
+        offsets = uniform_offsets(5400, 100)
+        positions, velocities, errors = propagate_tle(ISS_LINE1, ISS_LINE2, offsets, start=start)
+
+        self.assertEqual(positions.shape, (100, 3))
+        self.assertTrue(positions.flags["C_CONTIGUOUS"])
+        sat = Satrec.twoline2rv(ISS_LINE1, ISS_LINE2)
+        for step in (0, 37, 99):
+            jd, fr = jday(2024, 6, 26, 0, 0, offsets[step])
+            _, pos, vel = sat.sgp4(jd, fr)
+            np.testing.assert_allclose(positions[step], pos, atol=1e-6)
+            np.testing.assert_allclose(velocities[step], vel, atol=1e-9)
+
+    def test_hold_last_good(self):
+        values = np.arange(15, dtype=float).reshape(5, 3)
+        errors = np.array([1, 0, 3, 3, 0])
+        filled = hold_last_good(values, errors)
+        np.testing.assert_array_equal(filled[0], [0, 0, 0])
+        np.testing.assert_array_equal(filled[2], values[1])
+        np.testing.assert_array_equal(filled[3], values[1])
+        np.testing.assert_array_equal(filled[4], values[4])
+
+    def test_columnar_and_streamed_positions(self):
+        payload = {"line1": PIESAT_A[0], "line2": PIESAT_A[1], "epoch": "2025-07-06T00:00:00Z",
+                   "duration_seconds": 25, "step_seconds": 1}
+        points = self.client.post("/api/orbit/positions/", payload, content_type="application/json").json()
+        columnar = self.client.post("/api/orbit/positions/", {**payload, "output": "columnar"},
+                                    content_type="application/json").json()
+        self.assertEqual(set(columnar), {"epoch", "step_seconds", "frame", "times", "positions", "velocities", "errors"})
+        self.assertEqual(columnar["times"], [float(second) for second in range(25)])
+        self.assertEqual(columnar["errors"], [0] * 25)
+        self.assertEqual(columnar["positions"], [list(point["position"]) for point in points["positions"]])
+
+        response = self.client.post("/api/orbit/positions/", {**payload, "output": "stream", "window_steps": 10},
+                                    content_type="application/json")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        header, *windows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual((header["count"], header["step_seconds"], header["frame"]), (25, 1.0, "teme"))
+        self.assertEqual([len(window["times"]) for window in windows], [10, 10, 5])
+        self.assertEqual(sum((window["times"] for window in windows), []), columnar["times"])
+        self.assertEqual(sum((window["positions"] for window in windows), []), columnar["positions"])
+
+    def test_buffered_outputs_are_capped(self):
+        from .serializers import MAX_BUFFERED_SAMPLES
+
+        payload = {"line1": PIESAT_A[0], "line2": PIESAT_A[1], "duration_seconds": MAX_BUFFERED_SAMPLES + 1,
+                   "step_seconds": 1}
+        for output in ("points", "columnar"):
+            response = self.client.post("/api/orbit/positions/", {**payload, "output": output},
+                                        content_type="application/json")
+            self.assertEqual(response.status_code, 400)
+        streamed = self.client.post("/api/orbit/positions/", {**payload, "output": "stream"},
+                                    content_type="application/json")
+        self.assertEqual(streamed.status_code, 200)
+
+
+class ScreeningTests(SimpleTestCase):
+    def test_close_pairs_skips_failed_rows(self):
+        positions = np.array([
+            [7000.0, 0.0, 0.0],
+            [7000.5, 0.0, 0.0],
+            [np.nan, np.nan, np.nan],
+            [0.0, 7000.0, 0.0],
+            [7000.0, 0.3, 0.0],
+        ])
+        pairs, distances = close_pairs(positions, 1.0)
+        found = {tuple(pair): distance for pair, distance in zip(pairs.tolist(), distances)}
+        self.assertEqual(set(found), {(0, 1), (0, 4), (1, 4)})
+        self.assertAlmostEqual(found[(0, 1)], 0.5)
+
+    def test_tracker_merges_consecutive_steps(self):
+        tracker = ConjunctionTracker()
+        tracker.update(0, np.array([[0, 1]]), np.array([3.0]))
+        tracker.update(1, np.array([[0, 1]]), np.array([1.0]))
+        tracker.update(2, np.array([[0, 1]]), np.array([2.0]))
+        tracker.update(3, np.empty((0, 2), dtype=int), np.empty(0))
+        tracker.update(4, np.array([[0, 1]]), np.array([4.0]))
+        events = tracker.finish()
+
+        self.assertEqual(len(events), 2)
+        self.assertEqual((events[0]["start_step"], events[0]["end_step"]), (0, 2))
+        self.assertEqual(events[0]["tca_step"], 1)
+        self.assertEqual(events[0]["miss_distance_km"], 1.0)
+        self.assertEqual(events[1]["start_step"], 4)
+
+
+class ParallelScreeningTests(SimpleTestCase):
+    def test_time_shards_match_serial_screening(self):
+        sats = [Satrec.twoline2rv(*PIESAT_A), Satrec.twoline2rv(*PIESAT_B), Satrec.twoline2rv(*PIESAT_A)]
+        start = datetime.datetime(2025, 7, 5, tzinfo=datetime.timezone.utc)
+        serial = screen_catalog(sats, start, 1200, step_seconds=10, threshold_km=5.0)
+        sharded = screen_catalog(sats, start, 1200, step_seconds=10, threshold_km=5.0, workers=2)
+        self.assertEqual(len(sharded), 3)
+        for expected, event in zip(serial, sharded):
+            # every event spans all 8 slices and comes back whole
+            self.assertEqual((event["i"], event["j"], event["start_step"], event["end_step"]),
+                             (expected["i"], expected["j"], 0, 120))
+            self.assertAlmostEqual(event["miss_distance_km"], expected["miss_distance_km"], places=9)
+
+    def test_merge_joins_only_adjacent_pieces(self):
+        def piece(i, first, last, tca, distance):
+            return {"i": i, "j": 9, "start_step": first, "end_step": last, "tca_step": tca, "miss_distance_km": distance}
+
+        merged = merge_slice_events([piece(0, 10, 14, 12, 2.0), piece(0, 0, 9, 9, 1.0), piece(0, 16, 20, 16, 0.5),
+                                     piece(1, 10, 12, 10, 3.0)])
+        self.assertEqual([(event["i"], event["start_step"], event["end_step"], event["tca_step"]) for event in merged],
+                         [(0, 0, 14, 9), (0, 16, 20, 16), (1, 10, 12, 10)])
+
+
+class PrefilterTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        _, _, satrecs = get_catalog("tle_data")
+        cls.elements = orbital_elements(satrecs[:400])
+
+    def test_shell_sweep_matches_brute_force(self):
+        n = 400
+        i, j = np.triu_indices(n, k=1)
+        keep, _ = apogee_perigee_filter(self.elements, i, j, 20.0)
+        expected = set(zip(i[keep].tolist(), j[keep].tolist()))
+
+        swept = np.concatenate(list(shell_overlap_pairs(self.elements, 20.0, max_pairs=5000)))
+        self.assertEqual(set(map(tuple, swept.tolist())), expected)
+        self.assertEqual(len(swept), len(expected))
+
+    def test_stage_codes(self):
+        low = int(np.argmin(self.elements["apogee_km"]))
+        high = int(np.argmax(self.elements["perigee_km"]))
+        # an object against itself can never be pruned; the lowest and highest shells always are
+        stage, separation = prefilter_pairs(self.elements, [[5, 5], [low, high]], pad_km=20.0)
+        self.assertEqual(stage[0], KEPT)
+        self.assertEqual(stage[1], REJECTED_APOGEE_PERIGEE)
+        gap = self.elements["perigee_km"][high] - self.elements["apogee_km"][low]
+        self.assertAlmostEqual(separation[1], gap)
+
+    def test_prefiltered_screen_keeps_drifting_pairs(self):
+        # raising Starlinks whose propagated radius has left their epoch mean shell by tens of km
+        names, satnums, satrecs = get_catalog("active")
+        rows = [int(np.flatnonzero(satnums == satnum)[0]) for satnum in (60274, 64215, 59353, 63942, 60035, 64316)]
+        sats = [satrecs[row] for row in rows]
+        start = datetime.datetime(2025, 7, 10, tzinfo=datetime.timezone.utc)
+        full = screen_catalog(sats, start, 3600, step_seconds=10, threshold_km=5.0)
+        prefiltered, stats = prefiltered_screen(sats, start, 3600, step_seconds=10, threshold_km=5.0)
+        self.assertFalse(stats["skipped"])
+        self.assertTrue({(0, 1), (2, 3), (4, 5)} <= {(event["i"], event["j"]) for event in full})
+        self.assertEqual([(event["i"], event["j"]) for event in prefiltered],
+                         [(event["i"], event["j"]) for event in full])
+
+    def test_dense_catalog_skips_prefilters(self):
+        names, satnums, satrecs = get_catalog("active")
+        sats = [satrecs[int(np.flatnonzero(satnums == satnum)[0])] for satnum in (60274, 64215, 59353)]
+        start = datetime.datetime(2025, 7, 10, tzinfo=datetime.timezone.utc)
+        with mock.patch("orbit.screening.PREFILTER_PAIR_BUDGET", 0.0):
+            events, stats = prefiltered_screen(sats, start, 1200, step_seconds=10, threshold_km=5.0)
+        self.assertTrue(stats["skipped"])
+        self.assertEqual(stats["remaining"], 3)
+        self.assertEqual([(event["i"], event["j"]) for event in events],
+                         [(event["i"], event["j"]) for event in screen_catalog(sats, start, 1200, threshold_km=5.0)])
+
+    def test_sparse_catalog_screens_fewer_rows(self):
+        # the drifting Starlink pairs plus every 200th object by perigee, from LEO to GEO
+        names, satnums, satrecs = get_catalog("active")
+        rows = [int(np.flatnonzero(satnums == satnum)[0]) for satnum in (60274, 64215, 59353, 63942, 60035, 64316)]
+        rows += np.argsort(orbital_elements(satrecs)["perigee_km"])[::200].tolist()
+        sats = [satrecs[row] for row in rows]
+        start = datetime.datetime(2025, 7, 10, tzinfo=datetime.timezone.utc)
+        with mock.patch("orbit.screening.screen_catalog", wraps=screen_catalog) as screen:
+            events, stats = prefiltered_screen(sats, start, 3600, step_seconds=10, threshold_km=5.0)
+        self.assertFalse(stats["skipped"])
+        self.assertLess(stats["remaining"] * 50, stats["candidates"])
+        screened, _ = screen_rows(len(sats), screen.call_args.kwargs["candidates"])
+        self.assertLess(len(screened), len(sats) // 2)
+        self.assertEqual([(event["i"], event["j"]) for event in events],
+                         [(event["i"], event["j"]) for event in screen_catalog(sats, start, 3600, threshold_km=5.0)])
+
+
+class ProximityTests(SimpleTestCase):
+    def test_shell_index_matches_every_overlapping_shell(self):
+        rng = np.random.default_rng(3)
+        perigee = rng.uniform(6500.0, 8000.0, 500)
+        apogee = perigee + rng.exponential(200.0, 500)
+        index = ShellIndex(perigee, apogee)
+        for low, high in ((6400.0, 6450.0), (6900.0, 6910.0), (7000.0, 9000.0), (9500.0, 9600.0)):
+            expected = np.flatnonzero((perigee <= high + 20.0) & (apogee >= low - 20.0))
+            self.assertEqual(index.query(low, high, 20.0).tolist(), expected.tolist())
+
+    def test_closest_approach_matches_dense_sampling(self):
+        a, b = Satrec.twoline2rv(*PIESAT_A), Satrec.twoline2rv(*PIESAT_B)
+        start = datetime.datetime(2025, 7, 6)
+        events = closest_approaches(a, [b], start, 6 * 3600, threshold_km=5.0)
+        self.assertTrue(events)
+        self.assertEqual((events[0]["i"], events[0]["j"]), (0, 1))
+        jd, fr = time_grid(start, np.arange(0.0, 6 * 3600 + 1))
+        dense = np.linalg.norm(propagate(a, jd, fr)[0] - propagate(b, jd, fr)[0], axis=1)
+        self.assertLessEqual(events[0]["miss_distance_km"], dense.min() + 1e-6)
+        self.assertGreater(events[0]["miss_distance_km"], dense.min() - 0.05)
+
+    def test_query_by_norad_id(self):
+        payload = {"norad_id": 56153, "start": "2025-07-06T00:00:00Z", "window_hours": 1}
+        response = self.client.post("/api/orbit/proximity/", payload, content_type="application/json").json()
+        self.assertEqual(response["target"]["norad_id"], 56153)
+        self.assertLess(response["candidates"]["propagated"], response["candidates"]["shell"])
+        misses = [approach["miss_distance_km"] for approach in response["approaches"]]
+        self.assertEqual(misses, sorted(misses))
+        self.assertIn(56154, [approach["norad_id"] for approach in response["approaches"]])
+        self.assertNotIn(56153, [approach["norad_id"] for approach in response["approaches"]])
+
+        both = self.client.post("/api/orbit/proximity/", {**payload, "tle": "\n".join(PIESAT_A)},
+                                content_type="application/json")
+        self.assertEqual(both.status_code, 400)
+        missing = self.client.post("/api/orbit/proximity/", {**payload, "norad_id": 1},
+                                   content_type="application/json")
+        self.assertEqual(missing.status_code, 404)
+
+    def test_query_finds_object_outside_its_epoch_shell(self):
+        # 64215 has risen ~36 km since its TLE epoch and now passes within 5 km of 60274
+        payload = {"norad_id": 64215, "start": "2025-07-10T00:00:00Z", "window_hours": 1, "step_seconds": 60}
+        response = self.client.post("/api/orbit/proximity/", payload, content_type="application/json").json()
+        self.assertIn(60274, [approach["norad_id"] for approach in response["approaches"]])
+
+
+class ClosestApproachTests(SimpleTestCase):
+    def test_coarse_grid_matches_fine_sampling(self):
+        sat1 = Satrec.twoline2rv(*PIESAT_A)
+        sat2 = Satrec.twoline2rv(*PIESAT_B)
+        start = datetime.datetime(2025, 7, 6, tzinfo=datetime.timezone.utc)
+
+        approach = closest_approach(sat1, sat2, start, 3600, coarse_step=120)
+
+        offsets = np.arange(0, 3600, 0.05)
+        jd, fr = time_grid(start, offsets)
+        r1, _, _ = propagate(sat1, jd, fr)
+        r2, _, _ = propagate(sat2, jd, fr)
+        distances = np.linalg.norm(r2 - r1, axis=1)
+        self.assertLessEqual(approach["miss_distance_km"], distances.min() + 1e-6)
+        self.assertAlmostEqual(approach["miss_distance_km"], distances.min(), delta=1e-3)
+        self.assertAlmostEqual(approach["tca_seconds"], offsets[distances.argmin()], delta=1.0)
+        self.assertGreater(approach["relative_velocity_km_s"], 0)
+
+    def test_decaying_object_falls_back_to_grid_sample(self):
+        # perigee 18 km below the surface: sgp4 fails for a few minutes around each perigee pass,
+        # inside the bracket where the range rate to a low circular orbit turns positive
+        perigee_km, apogee_km = 6360.0, 7400.0
+        mean_motion = np.sqrt(398600.8 / ((perigee_km + apogee_km) / 2) ** 3) * 60.0
+        circular_motion = np.sqrt(398600.8 / 6420.0 ** 3) * 60.0
+        decaying, low = Satrec(), Satrec()
+        eccentricity = (apogee_km - perigee_km) / (apogee_km + perigee_km)
+        decaying.sgp4init(WGS72, "i", 99997, 27000.0, 0.0, 0.0, 0.0, eccentricity, 0.0, 0.9, 0.0, mean_motion, 0.0)
+        # reaches the perigee direction when the decaying object returns there, one orbit later
+        low.sgp4init(WGS72, "i", 99996, 27000.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.9,
+                     np.mod(-circular_motion * 2.0 * np.pi / mean_motion, 2.0 * np.pi), circular_motion, 0.0)
+        start = datetime.datetime(2023, 12, 3)  # the epoch, 27000 days in sgp4init's count
+
+        approaches = find_close_approaches(low, decaying, start, 7200, coarse_step=600)
+        self.assertEqual([approach["tca_seconds"] for approach in approaches], [5400.0])
+        self.assertLess(approaches[0]["miss_distance_km"], 150.0)
+
+
+class TrailSamplingTests(SimpleTestCase):
+    def chord_error(self, sat, start, step, kept, positions):
+        """Largest distance from the orbit, sampled every second, to the polyline through the kept samples"""
+        offsets = np.arange(0.0, (len(positions) - 1) * step, 1.0)
+        truth, _, _ = propagate(sat, *time_grid(start, offsets))
+        segment = np.clip(np.searchsorted(kept * step, offsets, side="right") - 1, 0, len(kept) - 2)
+        a, b = positions[kept][segment], positions[kept][segment + 1]
+        along = np.clip(np.einsum("ij,ij->i", truth - a, b - a) / np.einsum("ij,ij->i", b - a, b - a), 0.0, 1.0)
+        return np.linalg.norm(truth - (a + along[:, None] * (b - a)), axis=1).max()
+
+    def test_step_and_decimation_stay_within_tolerance(self):
+        start = datetime.datetime(2025, 7, 5)
+        leo = Satrec.twoline2rv(*PIESAT_A)
+        eccentric = Satrec()
+        eccentric.sgp4init(WGS72, "i", 99999, leo.jdsatepoch + leo.jdsatepochF - 2433281.5, 0.0, 0.0, 0.0,
+                           0.7, 4.71, 1.1, 0.0, 2.0 * np.pi / 720.0, 0.5)  # 12 h period, perigee ~1260 km up
+        geo = Satrec()
+        geo.sgp4init(WGS72, "i", 99998, leo.jdsatepoch + leo.jdsatepochF - 2433281.5, 0.0, 0.0, 0.0,
+                     0.0001, 0.0, 0.001, 0.0, 2.0 * np.pi / 1436.0, 1.0)
+        self.assertEqual(trail_step_seconds(leo, 5.0), 69)
+        self.assertGreater(trail_step_seconds(geo, 5.0), 6 * 60)
+
+        for sat in (leo, eccentric):
+            step = trail_step_seconds(sat, 5.0)
+            positions, _, _ = propagate(sat, *time_grid(start, np.arange(0.0, 720 * 60, step)))
+            kept = decimate(positions, 5.0)
+            self.assertLess(self.chord_error(sat, start, step, kept, positions), 5.0 * 1.1)
+            if sat is eccentric:
+                self.assertLess(len(kept), len(positions) / 2)  # apogee needs few of the perigee-sized steps
+
+    def test_decimate_keeps_only_deviating_samples(self):
+        line = np.zeros((11, 3))
+        line[:, 0] = np.arange(11.0)
+        line[5, 1] = 3.0
+        # the spike and the samples where the polyline bends into it
+        self.assertEqual(decimate(line, 1.0).tolist(), [0, 4, 5, 6, 10])
+        self.assertEqual(decimate(line, 3.5).tolist(), [0, 10])
+        self.assertEqual(decimate(line[:2], 1.0).tolist(), [0, 1])
+
+
+class CatalogStoreTests(SimpleTestCase):
+    def test_round_trip_matches_twoline2rv(self):
+        bad_checksum = PIESAT_B[0][:-1] + str((int(PIESAT_B[0][-1]) + 1) % 10)
+        records, rejected = parse_tle_records(
+            ["PIESAT A", "PIESAT B", "BROKEN"],
+            [PIESAT_A[0], PIESAT_B[0], bad_checksum],
+            [PIESAT_A[1], PIESAT_B[1], PIESAT_B[1]],
+        )
+        self.assertEqual(rejected, 1)
+        self.assertEqual(records["satnum"].tolist(), [56153, 56154])
+
+        with tempfile.TemporaryDirectory() as directory:
+            save_catalog(records, directory)
+            catalog = Catalog.open(directory)
+            self.assertEqual(catalog.rows_for([56154, 56153, 1]).tolist(), [1, 0, -1])
+            self.assertEqual(catalog.names, ["PIESAT A", "PIESAT B"])
+
+            for sat, lines in zip(catalog.satrecs(), (PIESAT_A, PIESAT_B)):
+                expected = Satrec.twoline2rv(*lines)
+                _, r1, _ = sat.sgp4(2460862.5, 0.25)
+                _, r2, _ = expected.sgp4(2460862.5, 0.25)
+                np.testing.assert_allclose(r1, r2, atol=1e-6)
+
+    def test_saves_swap_whole_versions(self):
+        records, _ = parse_tle_records(["PIESAT A", "PIESAT B"], [PIESAT_A[0], PIESAT_B[0]], [PIESAT_A[1], PIESAT_B[1]])
+        with tempfile.TemporaryDirectory() as directory:
+            first = save_catalog(records, directory)
+            reader = Catalog.open(directory)
+            second = save_catalog(records[:1], directory)
+            # an open catalog keeps reading the version it opened; new opens see the new one whole
+            self.assertEqual((reader.version, len(reader.records), len(reader.index)), (first["version"], 2, 2))
+            latest = Catalog.open(directory)
+            self.assertEqual((latest.version, len(latest.records), len(latest.index)), (second["version"], 1, 1))
+
+            # a version another writer is still filling survives the pruning
+            unpublished = new_version_dir(directory)
+            save_catalog(records[1:], directory)
+            published = [name for name in os.listdir(os.path.join(directory, VERSIONS_DIR)) if not name.startswith(".")]
+            self.assertEqual(len(published), KEEP_VERSIONS)
+            self.assertTrue(os.path.isdir(unpublished))
+            self.assertEqual(Catalog.open(directory).satnums.tolist(), [56154])
+
+
+class DatasetGenerationTests(SimpleTestCase):
+    def test_rerun_skips_finished_chunks(self):
+        import contextlib
+        import io
+        import os
+        import pandas as pd
+        from django.conf import settings
+
+        tle_df = pd.read_csv(os.path.join(settings.BASE_DIR, "ML", "tle_data.csv")).head(40)
+        # a formation-flying pair up front, so some pairs survive the prefilters and are propagated
+        tle_df.loc[[0, 1], ["line1", "line2"]] = [PIESAT_A, PIESAT_B]
+        options = dict(no_collision_limit=30, collision_limit=10, pairs_per_satellite=2, shard_size=16, workers=1)
+        with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+            chunks = label_collisions.generate_dataset(tle_df, directory, **options)
+            # 60 pair numbers (2 past the last row dropped) in 4 shards, then 10 collision rows in 1
+            self.assertEqual(len(chunks), 5)
+            first_run = [open(path).read() for path in chunks]
+            os.remove(chunks[1])
+            with mock.patch.object(label_collisions, "_run_shard", wraps=label_collisions._run_shard) as run:
+                rerun = label_collisions.generate_dataset(tle_df, directory, **options)
+            self.assertEqual(run.call_count, 1)
+            self.assertEqual([open(path).read() for path in rerun], first_run)
+
+            rows = pd.concat([pd.read_csv(path) for path in chunks])
+            self.assertEqual(list(rows.columns), label_collisions.COLUMNS)
+            propagated = rows["distance_stage"] == "propagated"
+            rejected = rows["distance_stage"].isin(["apogee_perigee", "orbit_path", "time_window"])
+            self.assertTrue(propagated.any() and rejected.any())
+            self.assertTrue(rows.loc[propagated, "min_distance_km"].notna().all())
+            self.assertTrue(rows.loc[rejected, "min_distance_km"].isna().all())
+
+            with self.assertRaises(ValueError):
+                label_collisions.generate_dataset(tle_df, directory, **{**options, "seed": 1})
+
+            # same row count and settings, but one element set was replaced
+            changed = tle_df.copy()
+            changed.loc[0, ["line1", "line2"]] = tle_df.loc[2, ["line1", "line2"]].tolist()
+            with self.assertRaises(ValueError):
+                label_collisions.generate_dataset(changed, directory, **options)
+
+
+class FeatureStoreTests(SimpleTestCase):
+    def test_features_match_sgp4init(self):
+        records, _ = parse_tle_records(["PIESAT B", "PIESAT A"], [PIESAT_B[0], PIESAT_A[0]], [PIESAT_B[1], PIESAT_A[1]])
+        store = FeatureStore.from_records(records, version="test")
+        self.assertEqual(store.features["satnum"].tolist(), [56153, 56154])
+
+        for row, lines in enumerate((PIESAT_A, PIESAT_B)):
+            sat = Satrec.twoline2rv(*lines)
+            features = store.features[row]
+            self.assertEqual((features["inclination"], features["eccentricity"], features["mean_motion"]),
+                             (sat.inclo, sat.ecco, sat.no_kozai))
+            self.assertAlmostEqual(features["semi_major_km"], sat.a * 6378.135, places=6)
+            self.assertAlmostEqual(features["apogee_alt_km"], sat.alta * 6378.135, places=6)
+            self.assertAlmostEqual(features["perigee_alt_km"], sat.altp * 6378.135, places=6)
+
+        self.assertEqual(store.rows_for([56154, 1, 56153, 999999]).tolist(), [1, -1, 0, -1])
+        pairs, found = store.pair_features([56154, 56153], [56153, 1])
+        self.assertEqual(found.tolist(), [True, False])
+        np.testing.assert_array_equal(pairs[0], np.concatenate([store.model_block[1], store.model_block[0]]))
+
+        with tempfile.TemporaryDirectory() as directory:
+            store.save(directory)
+            reopened = FeatureStore.open(directory)
+            self.assertEqual(reopened.version, "test")
+            np.testing.assert_array_equal(reopened.features, store.features)
+
+            # a reader keeps the version it opened while another process publishes the next
+            FeatureStore(store.features[:1], "next").save(directory)
+            self.assertEqual(len(reopened), 2)
+            latest = FeatureStore.open(directory)
+            self.assertEqual((latest.version, len(latest)), ("next", 1))
+
+
+def with_checksum(line):
+    """Replace the last column of a TLE line with its modulo-10 checksum"""
+    total = sum(int(c) if c.isdigit() else c == "-" for c in line[:68])
+    return line[:68] + str(total % 10)
+
+
+class EphemerisTests(SimpleTestCase):
+    def test_hermite_interpolation_matches_propagation(self):
+        records, _ = parse_tle_records(["PIESAT A", "PIESAT B"], [PIESAT_A[0], PIESAT_B[0]],
+                                       [PIESAT_A[1], PIESAT_B[1]])
+        start = datetime.datetime(2025, 7, 5, tzinfo=datetime.timezone.utc)
+        with tempfile.TemporaryDirectory() as directory:
+            save_catalog(records, directory + "/catalog")
+            catalog = Catalog.open(directory + "/catalog")
+            build_ephemeris(catalog, directory + "/ephemeris", start, 3 * 3600, step_seconds=60)
+            table = EphemerisTable.open(directory + "/ephemeris")
+
+            sat = catalog.satrecs([1])[0]
+            row = table.row_for(56154, sat.jdsatepoch, sat.jdsatepochF)
+            self.assertEqual(row, 1)
+            self.assertIsNone(table.row_for(56154, sat.jdsatepoch - 1, sat.jdsatepochF))
+
+            # off-grid times are interpolated to within metres of sgp4
+            offsets = np.arange(5.0, 3 * 3600, 37.3)
+            positions, velocities = table.sample(row, table.offsets_from_start(start, offsets))
+            expected_r, expected_v, _ = propagate(sat, *time_grid(start, offsets))
+            np.testing.assert_allclose(positions, expected_r, atol=5e-3)
+            np.testing.assert_allclose(velocities, expected_v, atol=1e-4)
+
+            self.assertEqual(refresh_ephemeris(catalog, directory + "/ephemeris"), (0, False))
+
+    def test_refresh_leaves_open_tables_untouched(self):
+        newer_a = (with_checksum(PIESAT_A[0][:20] + "6" + PIESAT_A[0][21:64] + " 100"), PIESAT_A[1])
+        start = datetime.datetime(2025, 7, 6, tzinfo=datetime.timezone.utc)
+        with tempfile.TemporaryDirectory() as directory:
+            catalog_dir, ephemeris_dir = directory + "/catalog", directory + "/ephemeris"
+            save_catalog(parse_tle_records(["A", "B"], [PIESAT_A[0], PIESAT_B[0]], [PIESAT_A[1], PIESAT_B[1]])[0],
+                         catalog_dir)
+            build_ephemeris(Catalog.open(catalog_dir), ephemeris_dir, start, 3600)
+            reader = get_ephemeris(ephemeris_dir)
+            before = np.array(reader.positions[0])
+
+            save_catalog(parse_tle_records(["A", "B"], [newer_a[0], PIESAT_B[0]], [newer_a[1], PIESAT_B[1]])[0],
+                         catalog_dir)
+            self.assertEqual(refresh_ephemeris(Catalog.open(catalog_dir), ephemeris_dir), (1, False))
+            np.testing.assert_array_equal(reader.positions[0], before)
+
+            refreshed = get_ephemeris(ephemeris_dir)
+            self.assertIsNot(refreshed, reader)
+            expected, _, _ = propagate(Satrec.twoline2rv(*newer_a), *time_grid(start, [0.0]))
+            np.testing.assert_allclose(refreshed.positions[0, :1], expected, atol=1e-3)
+            np.testing.assert_array_equal(refreshed.positions[1], reader.positions[1])
+
+
+class SatelliteStoreTests(TestCase):
+    def test_add_remove_and_current_positions(self):
+        orbit_a = np.arange(30, dtype=np.float64).reshape(10, 3) + 0.25
+        orbit_b = -np.arange(12, dtype=np.float64).reshape(4, 3)
+        self.assertIsNotNone(add_satellite("A", *PIESAT_A, orbit_a))
+        self.assertIsNotNone(add_satellite("B", *PIESAT_B, orbit_b))
+        self.assertIsNone(add_satellite("A", *PIESAT_B, orbit_b))
+        self.assertEqual([row["positions_count"] for row in list_satellites()], [10, 4])
+
+        # the slice taken in the database matches indexing the unpacked orbit
+        self.assertEqual(current_positions(17), [("A", orbit_a[7].tolist()), ("B", orbit_b[1].tolist())])
+
+        self.assertTrue(remove_satellite("A"))
+        self.assertFalse(remove_satellite("A"))
+        self.assertEqual([name for name, _ in current_positions(0)], ["B"])
+
+
+class JobTests(TestCase):
+    def test_submit_run_and_fetch_trail_job(self):
+        params = {"tles": ["\n".join(PIESAT_A), "\n".join(PIESAT_B)], "minutes": 10, "step_seconds": 60,
+                  "start": "2025-07-05T00:00:00+00:00"}
+        response = self.client.post("/api/orbit/jobs/", {"kind": "trail", "params": params},
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 202)
+        status_url = response["Location"]
+        self.assertEqual(self.client.get(status_url).json()["status"], "queued")
+        bad = self.client.post("/api/orbit/jobs/", {"kind": "trail", "params": {"tles": ["one line"]}},
+                               content_type="application/json")
+        self.assertEqual(bad.status_code, 400)
+
+        self.assertEqual(run_worker(once=True), 1)
+        status = self.client.get(status_url).json()
+        self.assertEqual((status["status"], status["progress"]), ("done", 1.0))
+
+        arrays = unpack_arrays(self.client.get(status["result_url"] + "?format=bin").content)
+        self.assertEqual(arrays["counts"].tolist(), [10, 10])
+        self.assertEqual(arrays["norad_ids"].tolist(), [56153, 56154])
+        expected = trail_positions(Satrec.twoline2rv(*PIESAT_B), 10, 60, datetime.datetime(2025, 7, 5))
+        np.testing.assert_allclose(arrays["positions"][10:], expected, rtol=1e-6)
+        self.assertEqual(len(self.client.get(status["result_url"]).json()["positions"]), 20)
+
+        Job.objects.update(expires_at=datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc))
+        self.assertEqual(self.client.get(status["result_url"]).status_code, 410)
+        self.assertEqual(purge_expired(), 1)
+        self.assertEqual(self.client.get(status_url).status_code, 404)
+
+    def test_failed_job_reports_its_error(self):
+        job_id = self.client.post("/api/orbit/jobs/", {"kind": "predict", "params": {"pairs": [{"norad1": 1}]}},
+                                  content_type="application/json").json()["id"]
+        with mock.patch("orbit.jobs.get_predictor", side_effect=FileNotFoundError("no model")):
+            run_worker(once=True)
+        status = self.client.get(f"/api/orbit/jobs/{job_id}/").json()
+        self.assertEqual((status["status"], status["error"]), ("failed", "FileNotFoundError: no model"))
+        self.assertEqual(self.client.get(f"/api/orbit/jobs/{job_id}/result/").status_code, 409)
+
+
+class LiveSnapshotTests(SimpleTestCase):
+    def test_filters_match_scalar_propagation(self):
+        sats = [Satrec.twoline2rv(*PIESAT_A), Satrec.twoline2rv(*PIESAT_B), Satrec.twoline2rv(*PIESAT_A)]
+        tracked = TrackedSet(["A", "B", "A copy"], [56153, 56154, 56153], ["catalog", "catalog", "custom"], sats)
+        when = datetime.datetime(2025, 7, 5, 3, tzinfo=datetime.timezone.utc)
+
+        rows, positions, _, altitudes = snapshot(tracked, when)
+        self.assertEqual(rows.tolist(), [0, 1, 2])
+        _, expected, _ = sats[1].sgp4(*jday(2025, 7, 5, 3, 0, 0))
+        np.testing.assert_allclose(positions[1], expected, atol=1e-9)
+
+        rows, _, _, _ = snapshot(tracked, when, norad_ids=[56153], limit=1)
+        self.assertEqual(rows.tolist(), [0])
+        rows, _, _, _ = snapshot(tracked, when, min_altitude_km=altitudes.max() + 1)
+        self.assertEqual(len(rows), 0)
+
+
+class FramesTests(SimpleTestCase):
+    def test_gmst_matches_reference(self):
+        # Vallado, Fundamentals of Astrodynamics, example 3-5
+        self.assertAlmostEqual(np.degrees(gmst(*jday(1992, 8, 20, 12, 14, 0))), 152.578787886, places=6)
+
+    def test_ecef_velocity_matches_rotated_positions(self):
+        sat = Satrec.twoline2rv(*PIESAT_A)
+        jd, fr = time_grid(datetime.datetime(2025, 7, 5), np.array([-0.5, 0.0, 0.5]))
+        positions, velocities, _ = propagate(sat, jd, fr)
+        ecef, ecef_velocities = teme_to_ecef(positions, jd, fr, velocities)
+        np.testing.assert_allclose(np.linalg.norm(ecef, axis=1), np.linalg.norm(positions, axis=1))
+        np.testing.assert_allclose(ecef_velocities[1], ecef[2] - ecef[0], atol=1e-5)
+
+    def test_geodetic_inverts_ellipsoid_points(self):
+        latitude, longitude, height = np.meshgrid([-89.9, -45.0, 0.0, 30.0, 89.9], [-170.0, 0.0, 120.0],
+                                                  [0.0, 420.0, 35786.0], indexing="ij")
+        lat, lon = np.radians(latitude), np.radians(longitude)
+        normal = WGS84_A_KM / np.sqrt(1.0 - WGS84_E2 * np.sin(lat) ** 2)
+        ecef = np.stack([
+            (normal + height) * np.cos(lat) * np.cos(lon),
+            (normal + height) * np.cos(lat) * np.sin(lon),
+            (normal * (1.0 - WGS84_E2) + height) * np.sin(lat),
+        ], axis=-1)
+        geodetic = ecef_to_geodetic(ecef)
+        np.testing.assert_allclose(geodetic[..., :2], np.stack([latitude, longitude], axis=-1), atol=1e-9)
+        np.testing.assert_allclose(geodetic[..., 2], height, atol=1e-6)
+
+    def test_frame_parameter_on_positions(self):
+        payload = {"line1": PIESAT_A[0], "line2": PIESAT_A[1], "duration_seconds": 60, "step_seconds": 10}
+        teme = self.client.post("/api/orbit/positions/", payload, content_type="application/json").json()
+        ecef = self.client.post("/api/orbit/positions/", {**payload, "frame": "ecef"},
+                                content_type="application/json").json()
+        geodetic = self.client.post("/api/orbit/positions/?format=bin", {**payload, "frame": "geodetic"},
+                                    content_type="application/json")
+        self.assertEqual(ecef["frame"], "ecef")
+        np.testing.assert_allclose(
+            [np.linalg.norm(point["position"]) for point in ecef["positions"]],
+            [np.linalg.norm(point["position"]) for point in teme["positions"]]
+        )
+        positions = unpack_arrays(geodetic.content)["positions"]
+        self.assertTrue((np.abs(positions[:, 0]) <= 82.5).all())  # 97.5 degree inclination
+        self.assertTrue(((positions[:, 2] > 450) & (positions[:, 2] < 600)).all())
+        bad = self.client.post("/api/orbit/positions/", {**payload, "frame": "gcrs"}, content_type="application/json")
+        self.assertEqual(bad.status_code, 400)
+
+
+class PositionTickerTests(SimpleTestCase):
+    def frames(self, resolution_km, sats=None, keyframe_ticks=1000, count=2):
+        sats = sats or [Satrec.twoline2rv(*PIESAT_A), Satrec.twoline2rv(*PIESAT_B)]
+        tracked = TrackedSet([str(k) for k in range(len(sats))], [sat.satnum for sat in sats],
+                             ["catalog"] * len(sats), sats)
+        ticker = PositionTicker(interval=1.0, resolution_km=resolution_km, keyframe_ticks=keyframe_ticks)
+        tick = int(datetime.datetime(2025, 7, 5, tzinfo=datetime.timezone.utc).timestamp())
+        with mock.patch("orbit.broadcast.get_tracked_set", return_value=tracked):
+            frames = [ticker.step(tick + k)[0] for k in range(count)]
+        return [(frame.split(b"\n")[0], json.loads(frame.split(b"data: ")[1]), len(frame)) for frame in frames]
+
+    def test_snapshot_then_delta(self):
+        (event, snapshot, _), (delta_event, delta, _) = self.frames(resolution_km=0.1)
+        self.assertEqual((event, delta_event), (b"event: snapshot", b"event: delta"))
+        self.assertEqual(snapshot["norad_ids"], [56153, 56154])
+        self.assertEqual(delta["since"], snapshot["tick"])
+        # both rows moved, so the delta is dense: no row list, one move per snapshot row
+        self.assertNotIn("rows", delta)
+        self.assertEqual(len(delta["moves"]), 6)
+
+        # nothing moves by a million km in one second, so the delta is empty
+        _, (_, delta, _) = self.frames(resolution_km=1e6)
+        self.assertEqual((delta["rows"], delta["moves"]), ([], []))
+
+    def test_deltas_rebuild_the_next_snapshot(self):
+        sats = get_catalog("active")[2][:500]
+        (_, snapshot, snapshot_size), (_, delta, delta_size) = self.frames(resolution_km=0.1, sats=sats)
+        # the same tick as the delta, sent as a keyframe instead
+        _, (_, keyframe, _) = self.frames(resolution_km=0.1, sats=sats, keyframe_ticks=1)
+
+        resolution = snapshot["resolution_km"]
+        grid = np.round(np.array(snapshot["positions"]) / resolution).astype(np.int64)
+        grid += np.array(delta["moves"]).reshape(-1, 3)
+        self.assertEqual(keyframe["rows"], snapshot["rows"])
+        np.testing.assert_array_equal(grid, np.round(np.array(keyframe["positions"]) / resolution))
+        self.assertLess(delta_size, snapshot_size / 3)
+
+
+class BatchPredictionTests(SimpleTestCase):
+    def test_tle_and_norad_sides_give_the_same_features(self):
+        tle_a, tle_b = "\n".join(PIESAT_A), "\n".join(PIESAT_B)
+        features, errors = batch_features([
+            {"tle1": tle_a, "tle2": tle_b},
+            {"norad1": 56153, "norad2": 56154},
+            {"tle1": tle_a, "norad2": 0},
+            {"tle1": "not a tle"},
+        ])
+        expected = np.concatenate([tle_features(tle_a), tle_features(tle_b)])
+        np.testing.assert_allclose(features[0], expected)
+        np.testing.assert_allclose(features[1], expected, rtol=1e-12)
+        self.assertEqual(sorted(errors), [2, 3])
+
+
+class ModelRegistryTests(SimpleTestCase):
+    def test_lazy_load_and_hot_reload(self):
+        import joblib
+        import os
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "model.pkl")
+            joblib.dump({"weights": np.arange(4.0)}, path)
+            registry = ModelRegistry(path, mmap_mode="r")
+            self.assertFalse(registry.info()["loaded"])
+
+            first = registry.get()
+            self.assertIs(registry.get(), first)
+            version = registry.info()["version"]
+
+            joblib.dump({"weights": np.arange(8.0)}, path)
+            os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+            self.assertEqual(len(registry.get()["weights"]), 8)
+            self.assertNotEqual(registry.info()["version"], version)
+            predictor, predictor_version = registry.versioned_predictor()
+            self.assertIs(predictor, registry.get())
+            self.assertEqual(predictor_version, registry.info()["version"])
+
+
+class CompiledForestTests(SimpleTestCase):
+    def test_matches_sklearn_on_collision_dataset(self):
+        import os
+        import pandas as pd
+        from django.conf import settings
+        from sklearn.ensemble import RandomForestClassifier # type: ignore
+
+        from .prediction import FEATURE_NAMES
+
+        # same model as ML/train_model.py, fitted on the whole dataset
+        df = pd.read_csv(os.path.join(settings.BASE_DIR, "ML", "collision_dataset.csv"))
+        features = df[FEATURE_NAMES]
+        labels = df["label"].map({"collision": 1, "no_collision": 0})
+        model = RandomForestClassifier(n_estimators=100, random_state=42).fit(features, labels)
+
+        forest = export_forest(model)
+        X = features.to_numpy()
+        np.testing.assert_array_equal(forest.predict_proba(X), model.predict_proba(features))
+        np.testing.assert_array_equal(forest.predict(X), model.predict(features))
+
+        with tempfile.TemporaryDirectory() as directory:
+            forest.save(os.path.join(directory, "forest.npz"))
+            loaded = CompiledForest.load(os.path.join(directory, "forest.npz"))
+        np.testing.assert_array_equal(loaded.predict_proba(X[:5]), forest.predict_proba(X[:5]))
+
+
+class ResultCacheTests(SimpleTestCase):
+    def test_keys_packing_and_eviction(self):
+        tle = "\n".join(PIESAT_A)
+        self.assertEqual(request_key([tle], step=60), request_key(["  " + tle.replace("\n", "\r\n ") + "\n"], step=60))
+        self.assertNotEqual(request_key([tle], step=60), request_key([tle], step=30))
+
+        trail = np.arange(12, dtype=np.float64).reshape(4, 3) * 1000.5
+        label, start, step, trails = unpack_result(pack_result("collision", 1.5e9, 60.0, [trail, trail[:1]]))
+        self.assertEqual((label, start, step), ("collision", 1.5e9, 60.0))
+        np.testing.assert_array_equal(trails[0], trail.astype(np.float32))
+        self.assertEqual(trails[1].shape, (1, 3))
+
+        cache = ResultCache(max_bytes=100, max_entries=10)
+        cache.set("a", b"x" * 40, 60)
+        cache.set("b", b"x" * 40, 60)
+        self.assertIsNotNone(cache.get("a"))  # "b" is now least recently used
+        cache.set("c", b"x" * 40, 60)
+        self.assertIsNone(cache.get("b"))
+        cache.set("d", b"x", -1)  # already expired
+        self.assertIsNone(cache.get("d"))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["evictions"], stats["expired"]), (1, 2, 1, 1))
+
+
+class IngestTests(SimpleTestCase):
+    def write_tles(self, path, *tles):
+        with open(path, "w") as f:
+            for name, (line1, line2) in tles:
+                f.write(f"{name}\n{line1}\n{line2}\n")
+
+    def test_only_changed_objects_are_processed(self):
+        # a newer element set for PIESAT A: epoch one day later, element set number bumped
+        newer_a = (with_checksum(PIESAT_A[0][:20] + "6" + PIESAT_A[0][21:64] + " 100"), PIESAT_A[1])
+        start = datetime.datetime(2025, 7, 6, tzinfo=datetime.timezone.utc)
+        with tempfile.TemporaryDirectory() as directory:
+            catalog_dir, source = directory + "/catalog", directory + "/tle.txt"
+            self.write_tles(source, ("PIESAT A", PIESAT_A), ("PIESAT B", PIESAT_B))
+            diff, summary = ingest_catalog(source, catalog_dir)
+            self.assertEqual(diff.added.tolist(), [56153, 56154])
+            build_ephemeris(Catalog.open(catalog_dir), directory + "/ephemeris", start, 3600)
+            follower = ChangeFollower(changes_path(catalog_dir))
+
+            # re-ingesting the same file changes nothing and writes nothing
+            _, summary = ingest_catalog(source, catalog_dir)
+            self.assertEqual((summary["added"], summary["changed"], summary["removed"]), (0, 0, 0))
+            self.assertEqual(follower.poll(), set())
+
+            # a partial update never removes objects
+            self.write_tles(source, ("PIESAT A", newer_a))
+            diff, summary = ingest_catalog(source, catalog_dir, partial=True, dry_run=True)
+            self.assertEqual((diff.changed.tolist(), diff.removed.tolist(), summary["count"]), ([56153], [], 2))
+
+            diff, summary = ingest_catalog(source, catalog_dir)
+            self.assertEqual((diff.added.tolist(), diff.changed.tolist(), diff.removed.tolist()), ([], [56153], [56154]))
+            self.assertNotEqual(summary["version"], summary["previous_version"])
+            self.assertEqual(follower.poll(), {56153, 56154})
+            self.assertEqual(follower.poll(), set())
+
+            catalog = Catalog.open(catalog_dir)
+            self.assertEqual(refresh_ephemeris(catalog, directory + "/ephemeris"), (1, True))
+            table = EphemerisTable.open(directory + "/ephemeris")
+            sat = Satrec.twoline2rv(*newer_a)
+            row = table.row_for(56153, sat.jdsatepoch, sat.jdsatepochF)
+            positions, _ = table.sample(row, [0.0, 1800.0])
+            expected, _, _ = propagate(sat, *time_grid(start, [0.0, 1800.0]))
+            np.testing.assert_allclose(positions, expected, atol=1e-3)
+
+        cache = ResultCache()
+        cache.set("pair", b"x", 60, tags=(56153, 56154))
+        cache.set("other", b"y", 60, tags=(25544,))
+        self.assertEqual(cache.invalidate({56154}), 1)
+        self.assertEqual((cache.get("pair"), cache.get("other")), (None, b"y"))
+
+
+class BenchmarkTests(SimpleTestCase):
+    def test_synthetic_catalog_and_baseline_comparison(self):
+        base, _ = parse_tle_records(["PIESAT A", "PIESAT B"], [PIESAT_A[0], PIESAT_B[0]], [PIESAT_A[1], PIESAT_B[1]])
+        records = synthetic_records(base, 5)
+        self.assertEqual(len(np.unique(records["satnum"])), 5)
+        np.testing.assert_array_equal(records["inclination"], base["inclination"][[0, 1, 0, 1, 0]])
+        self.assertNotEqual(records["mean_anomaly"][2], records["mean_anomaly"][0])
+
+        baseline = {"a": {"median": 1.0}, "b": {"median": 1.0}, "c": {"median": 1.0}, "gone": {"median": 1.0}}
+        current = {"a": {"median": 1.1}, "b": {"median": 1.5}, "c": {"median": 0.5}, "new": {"median": 1.0}}
+        statuses = {row["name"]: row["status"] for row in compare_results(current, baseline, tolerance=0.2)}
+        self.assertEqual(statuses, {"a": "ok", "b": "regression", "c": "improved", "gone": "missing", "new": "new"})
+
+
+class MetricsTests(SimpleTestCase):
+    def setUp(self):
+        registry.clear()
+
+    @override_settings(ORBIT_METRICS_ENABLED=True, ORBIT_PROFILE_ENABLED=True)
+    def test_stage_breakdown_and_prometheus_text(self):
+        payload = {"line1": PIESAT_A[0], "line2": PIESAT_A[1], "duration_seconds": 60, "step_seconds": 1}
+        response = self.client.post("/api/orbit/positions/", payload, content_type="application/json",
+                                    headers={"X-Orbit-Profile": "1"})
+        self.assertEqual(response.status_code, 200)
+        stages = [entry.split(";")[0] for entry in response["Server-Timing"].split(", ")]
+        self.assertEqual(stages, ["parse", "propagate", "serialize", "total"])
+
+        response = self.client.post("/api/orbit/positions/", payload, content_type="application/json")
+        self.assertNotIn("Server-Timing", response)
+
+        text = self.client.get("/metrics").content.decode()
+        self.assertIn('orbit_requests_total{method="POST",route="api/orbit/positions/",status="200"} 2', text)
+        self.assertIn('orbit_stage_duration_seconds_count{stage="propagate"} 2', text)
+        self.assertIn('orbit_stage_duration_seconds_bucket{stage="parse",le="+Inf"} 2', text)
+        self.assertIn("orbit_result_cache_entries", text)
+
+    @override_settings(ORBIT_METRICS_ENABLED=False)
+    def test_disabled_spans_record_nothing(self):
+        with span("parse"):
+            pass
+        self.assertEqual(registry.render(), "\n")
+
+
+class ArrayRendererTests(SimpleTestCase):
+    def test_packed_and_columnar_layouts(self):
+        positions = np.array([[6778.1234567, -1.5, 0.25], [np.nan, np.nan, np.nan]], dtype=np.float32)
+        data = {"epoch": "2025-07-05T00:00:00+00:00", "positions": positions, "errors": np.array([0, 1], dtype=np.int32)}
+
+        blob = pack_arrays(data)
+        header_length = int.from_bytes(blob[4:8], "little")
+        self.assertEqual((blob[:4], (8 + header_length) % 8), (b"ORBA", 0))
+        unpacked = unpack_arrays(blob)
+        self.assertEqual(unpacked["epoch"], data["epoch"])
+        np.testing.assert_array_equal(unpacked["positions"], positions)
+        np.testing.assert_array_equal(unpacked["errors"], [0, 1])
+
+        columnar = columnar_json_data(data)
+        self.assertEqual(columnar["shapes"], {"positions": [2, 3], "errors": [2]})
+        self.assertEqual(columnar["positions"], [6778.124, -1.5, 0.25, None, None, None])
+
+    def test_content_negotiation_on_positions(self):
+        payload = {"line1": PIESAT_A[0], "line2": PIESAT_A[1], "duration_seconds": 60, "step_seconds": 1}
+        default = self.client.post("/api/orbit/positions/", payload, content_type="application/json").json()
+        packed = self.client.post("/api/orbit/positions/?format=bin", payload, content_type="application/json")
+        self.assertEqual(packed["Content-Type"], "application/vnd.orbit.arrays")
+        arrays = unpack_arrays(packed.content)
+        self.assertEqual((arrays["count"], arrays["positions"].shape), (60, (60, 3)))
+        np.testing.assert_allclose(arrays["positions"][5], default["positions"][5]["position"], rtol=1e-6)
+
+        columnar = self.client.post("/api/orbit/positions/", payload, content_type="application/json",
+                                    headers={"Accept": "application/vnd.orbit.columnar+json"}).json()
+        self.assertEqual(len(columnar["positions"]), 180)
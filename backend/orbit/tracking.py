@@ -0,0 +1,115 @@
+"""
+Live positions of the whole tracked set.
+
+The tracked set is the catalog (the binary store if built, else active.txt)
+plus every custom satellite. It is turned into one SatrecArray per process
+and rebuilt only when the catalog or the custom satellites change, so a
+poll is a single vectorized sgp4 call at the requested instant.
+"""
+import os
+from functools import lru_cache
+
+import numpy as np
+from django.db.models import Count, Max
+from sgp4.api import Satrec, SatrecArray # type: ignore
+
+from .catalog import open_default_catalog
+from .frames import convert_frame
+from .models import CustomSatellite
+from .propagation import julian_date
+from .screening import CATALOG_SOURCES, get_catalog
+from .satellite_store import get_satellites
+
+EARTH_RADIUS_KM = 6378.137
+
+
+class TrackedSet:
+    """Names, NORAD ids and object types aligned with the rows of one SatrecArray"""
+
+    def __init__(self, names, satnums, types, satrecs):
+        self.names = np.asarray(names, dtype=object)
+        self.satnums = np.asarray(satnums, dtype=np.int64)
+        self.types = np.asarray(types, dtype=object)
+        self.satrec_array = SatrecArray(satrecs)
+
+    def __len__(self):
+        return len(self.names)
+
+
+def _catalog_source():
+    """("store", version) for the binary store if built, else ("active", file mtime)"""
+    store = open_default_catalog()
+    if store is not None:
+        return "store", store.version
+    return "active", os.path.getmtime(CATALOG_SOURCES["active"])
+
+
+@lru_cache(maxsize=1)
+def _build_tracked_set(source, catalog_key, custom_key):
+    names, satnums, satrecs = get_catalog(source)
+    names, satnums, satrecs = list(names), list(satnums), list(satrecs)
+    types = ["catalog"] * len(names)
+    for satellite in get_satellites():
+        sat = Satrec.twoline2rv(satellite.tle_line1, satellite.tle_line2)
+        if sat.error != 0:
+            continue
+        names.append(satellite.name)
+        satnums.append(sat.satnum)
+        satrecs.append(sat)
+        types.append("custom")
+    return TrackedSet(names, satnums, types, satrecs)
+
+
+def get_tracked_set():
+    """The process-wide tracked set, rebuilt when the catalog or custom satellites change"""
+    source, catalog_key = _catalog_source()
+    custom = CustomSatellite.objects.aggregate(count=Count("id"), last=Max("id"))
+    return _build_tracked_set(source, catalog_key, (custom["count"], custom["last"]))
+
+
+def snapshot(tracked, when, norad_ids=None, min_altitude_km=None, max_altitude_km=None, limit=None):
+    """
+    Propagate every tracked object to when in one call, then filter.
+    Objects that fail to propagate are dropped. Returns (rows, positions,
+    velocities, altitudes) for the selected rows.
+    """
+    jd, fr = julian_date(when)
+    errors, r, v = tracked.satrec_array.sgp4(np.array([jd]), np.array([fr]))
+    positions = r[:, 0]
+    velocities = v[:, 0]
+    altitudes = np.linalg.norm(positions, axis=1) - EARTH_RADIUS_KM
+
+    keep = errors[:, 0] == 0
+    if norad_ids:
+        keep &= np.isin(tracked.satnums, np.asarray(norad_ids, dtype=np.int64))
+    if min_altitude_km is not None:
+        keep &= altitudes >= min_altitude_km
+    if max_altitude_km is not None:
+        keep &= altitudes <= max_altitude_km
+    rows = np.flatnonzero(keep)
+    if limit is not None:
+        rows = rows[:limit]
+    return rows, positions[rows], velocities[rows], altitudes[rows]
+
+
+def columnar_snapshot(tracked, when, frame="teme", **filters):
+    """
+    One live snapshot laid out as parallel arrays, with positions and
+    velocities in frame (see orbit.frames). altitudes_km stays the height
+    above the mean radius that the altitude filters use.
+    """
+    rows, positions, velocities, altitudes = snapshot(tracked, when, **filters)
+    positions, velocities = convert_frame(frame, positions, *julian_date(when), velocities)
+    return {
+        "time": when.isoformat(),
+        "frame": frame,
+        "count": len(rows),
+        "tracked": len(tracked),
+        "names": tracked.names[rows].tolist(),
+        "norad_ids": tracked.satnums[rows].tolist(),
+        "types": tracked.types[rows].tolist(),
+        # metre / millimetre-per-second precision; shorter floats halve the JSON encoding time
+        "positions": positions.round(3).tolist(),
+        "velocities": velocities.round(6).tolist(),
+        "altitudes_km": altitudes.round(3).tolist(),
+    }
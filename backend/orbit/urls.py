@@ -3,7 +3,16 @@ from .views import *
 
 urlpatterns = [
     path('positions/', SatellitePositionView.as_view()),
+    path('positions/stream/', position_stream),
     path('predict/', CollisionPredictionView.as_view()),
+    path('predict/batch/', BatchPredictionView.as_view()),
+    path('model/', ModelInfoView.as_view()),
+    path('cache/', ResultCacheView.as_view()),
     path('satellites/', CustomSatelliteView.as_view()),
+    path('screen/', ConjunctionScreeningView.as_view()),
+    path('proximity/', ProximityQueryView.as_view()),
+    path('jobs/', JobSubmitView.as_view()),
+    path('jobs/<uuid:job_id>/', JobStatusView.as_view(), name="job-status"),
+    path('jobs/<uuid:job_id>/result/', JobResultView.as_view(), name="job-result"),
 ]
   
\ No newline at end of file
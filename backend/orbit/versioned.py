@@ -0,0 +1,73 @@
+"""
+Directories whose contents are replaced as a whole.
+
+A writer puts every file of a new version into a fresh directory under
+versions/ and then swaps the CURRENT pointer file to it with one
+os.replace. A reader resolves the pointer once and opens all of its files
+from that version, so it never mixes files from two saves. Published
+versions are never modified; the previous one is kept for readers that
+resolved the pointer just before a swap.
+
+Versions still being written are hidden (their names start with "."), so
+a writer publishing at the same time never prunes another writer's work.
+"""
+import os
+import shutil
+import tempfile
+
+POINTER_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+# versions left on disk after a publish: the new one and the one before it
+KEEP_VERSIONS = 2
+
+
+def current_version_dir(directory):
+    """Directory holding the published version in directory, or None if nothing was published"""
+    try:
+        with open(os.path.join(directory, POINTER_FILE)) as f:
+            return os.path.join(directory, VERSIONS_DIR, f.read().strip())
+    except FileNotFoundError:
+        return None
+
+
+def version_stamp(directory):
+    """A value that changes with every publish (one stat), for caches that reopen on change; None if nothing published"""
+    try:
+        stat = os.stat(os.path.join(directory, POINTER_FILE))
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def new_version_dir(directory, prefix=""):
+    """An empty directory for the next version; nothing reads it until publish_version"""
+    versions = os.path.join(directory, VERSIONS_DIR)
+    os.makedirs(versions, exist_ok=True)
+    target = tempfile.mkdtemp(prefix="." + prefix, dir=versions)
+    os.chmod(target, 0o755)
+    return target
+
+
+def publish_version(directory, version_dir):
+    """
+    Make version_dir (from new_version_dir) the current version in one swap
+    of CURRENT, then drop published versions older than KEEP_VERSIONS.
+    Returns the published directory.
+    """
+    versions = os.path.join(directory, VERSIONS_DIR)
+    published = os.path.join(versions, os.path.basename(version_dir).lstrip("."))
+    os.rename(version_dir, published)
+
+    fd, pointer = tempfile.mkstemp(prefix=POINTER_FILE + ".", dir=directory)
+    with os.fdopen(fd, "w") as f:
+        f.write(os.path.basename(published))
+    os.chmod(pointer, 0o644)
+    os.replace(pointer, os.path.join(directory, POINTER_FILE))
+
+    older = sorted(
+        (name for name in os.listdir(versions) if not name.startswith(".") and name != os.path.basename(published)),
+        key=lambda name: os.path.getmtime(os.path.join(versions, name)), reverse=True
+    )
+    for name in older[KEEP_VERSIONS - 1:]:
+        shutil.rmtree(os.path.join(versions, name), ignore_errors=True)
+    return published
@@ -1,34 +1,43 @@
 
 from django.conf import settings
 from django.shortcuts import render
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError # type: ignore
 from rest_framework.views import APIView # type: ignore
 from rest_framework.response import Response # type: ignore
-from .serializers import TLERequestSerializer, CustomSatelliteSerializer
-from sgp4.api import Satrec, jday # type: ignore
+from .serializers import (
+    TLERequestSerializer, CustomSatelliteSerializer, ScreeningRequestSerializer, LivePositionsSerializer,
+    BatchPredictionSerializer, JobRequestSerializer, ProximityRequestSerializer
+)
+from .screening import describe_conjunction, get_catalog, prefiltered_screen, screen_catalog
+from .proximity import describe_approach, proximity_query
+from .ephemeris import lookup_positions
+from .satellite_store import add_satellite, current_positions, list_satellites, remove_satellite
+from .tracking import columnar_snapshot, get_tracked_set, snapshot
+from .broadcast import event_stream, get_ticker
+from .prediction import predict_features, predict_pairs
+from .model_registry import get_predictor, get_registry, get_versioned_predictor
+from .result_cache import epoch_ttl, get_result_cache, pack_result, request_key, unpack_result
+from .metrics import gauges, registry, span
+from .sampling import orbital_period_seconds
+from .frames import convert_frame
+from .renderers import ARRAY_RENDERERS, PackedArrayRenderer, nested_json_data, unpack_arrays, wants_columnar
+from .jobs import job_status, submit_job
+from .models import Job
+from sgp4.api import Satrec # type: ignore
+from .propagation import (
+    iter_propagation_windows, julian_date, propagate, propagate_tle, time_grid, uniform_offsets
+)
 import datetime
-import pandas as pd
-import os
-import joblib  # For loading your ML model
+import numpy as np
 import json
-from django.core.cache import cache
-
-model_path = os.path.join(settings.BASE_DIR, "ml", "rf_model.pkl")
-model = joblib.load(model_path)
 
 # initialize simulated time
 simulated_time = datetime.datetime.now(datetime.timezone.utc)
 
-# Global storage for custom satellites (in production, use database)
-CUSTOM_SATELLITES_KEY = "custom_satellites"
-
-def get_custom_satellites():
-    """Get custom satellites from cache"""
-    satellites = cache.get(CUSTOM_SATELLITES_KEY)
-    return satellites if satellites else {}
-
-def save_custom_satellites(satellites):
-    """Save custom satellites to cache"""
-    cache.set(CUSTOM_SATELLITES_KEY, satellites, timeout=86400)  # 24 hours
 
 def generate_orbital_positions(tle_line1, tle_line2, num_positions=1000):
     """
@@ -36,38 +45,57 @@ def generate_orbital_positions(tle_line1, tle_line2, num_positions=1000):
     Returns positions that can be looped infinitely
     """
     try:
-        sat = Satrec.twoline2rv(tle_line1, tle_line2)
-        positions = []
-        
-        # Generate positions for one complete orbit (approximately 90 minutes for LEO)
-        # Using smaller time steps for smoother animation
-        for step in range(num_positions):
-            # Calculate time: 90 minutes = 5400 seconds, divided into num_positions steps
-            time_seconds = (step * 5400) / num_positions
-            
-            # Use current date as base
-            now = datetime.datetime.now(datetime.timezone.utc)
-            jd, fr = jday(
-                now.year, now.month, now.day,
-                now.hour, now.minute, now.second + time_seconds
-            )
-            
-            error, pos, vel = sat.sgp4(jd, fr)
-            
-            if error == 0:  # Success
-                positions.append(pos)
-            else:
-                # If error, use previous position or default
-                if positions:
-                    positions.append(positions[-1])
-                else:
-                    positions.append([0, 0, 0])
-        
-        return positions
+        with span("parse"):
+            sat = Satrec.twoline2rv(tle_line1, tle_line2)
+        # Generate positions for one complete orbit (its own period, not a fixed 90 minutes),
+        # divided into num_positions steps so the loop closes and plays at the same pace for any orbit
+        offsets = uniform_offsets(orbital_period_seconds(sat), num_positions)
+        start = datetime.datetime.now(datetime.timezone.utc)
+        # catalogued objects are served from the precomputed ephemeris table when it covers the orbit
+        with span("propagate"):
+            positions = lookup_positions(sat, start, offsets)
+            if positions is None:
+                positions, _, _ = propagate_tle(tle_line1, tle_line2, offsets, start=start)
+        return positions.tolist()
     except Exception as e:
         print(f"Error generating positions: {e}")
         return []
 
+def columnar_positions(offsets, positions, velocities, errors):
+    """
+    Lay out one propagation window as parallel arrays.
+    Samples that failed to propagate are null in positions/velocities.
+    """
+    positions = positions.tolist()
+    velocities = velocities.tolist()
+    for index in np.flatnonzero(errors):
+        positions[index] = None
+        velocities[index] = None
+    return {
+        "times": offsets.tolist(),
+        "positions": positions,
+        "velocities": velocities,
+        "errors": errors.tolist(),
+    }
+
+def frame_windows(windows, epoch, frame):
+    """Propagation windows with positions and velocities converted from TEME to frame"""
+    for offsets, positions, velocities, errors in windows:
+        jd, fr = time_grid(epoch, offsets)
+        positions, velocities = convert_frame(frame, positions, jd, fr, velocities)
+        yield offsets, positions, velocities, errors
+
+def stream_position_windows(epoch, step_seconds, num_steps, windows, frame="teme"):
+    """Yield an NDJSON header line followed by one columnar line per window"""
+    yield json.dumps({
+        "epoch": epoch.isoformat(),
+        "step_seconds": step_seconds,
+        "count": num_steps,
+        "frame": frame
+    }) + "\n"
+    for offsets, positions, velocities, errors in frame_windows(windows, epoch, frame):
+        yield json.dumps(columnar_positions(offsets, positions, velocities, errors)) + "\n"
+
 class CustomSatelliteView(APIView):
     """Handle adding, removing, and managing custom satellites"""
     
@@ -106,27 +134,14 @@ class CustomSatelliteView(APIView):
                     "error": "Failed to generate orbital positions from TLE data"
                 }, status=400)
             
-            # Get existing satellites
-            custom_satellites = get_custom_satellites()
-            
-            # Check if satellite name already exists
-            if satellite_name in custom_satellites:
+            # Add new satellite; the unique name makes the existence check and insert one atomic step
+            with span("db"):
+                added = add_satellite(satellite_name, line1, line2, positions)
+            if added is None:
                 return Response({
                     "error": f"Satellite '{satellite_name}' already exists"
                 }, status=400)
             
-            # Add new satellite
-            custom_satellites[satellite_name] = {
-                'name': satellite_name,
-                'tle_line1': line1,
-                'tle_line2': line2,
-                'positions': positions,
-                'created_at': datetime.datetime.now().isoformat()
-            }
-            
-            # Save to cache
-            save_custom_satellites(custom_satellites)
-            
             return Response({
                 "message": f"Satellite '{satellite_name}' added successfully",
                 "satellite": {
@@ -150,17 +165,12 @@ class CustomSatelliteView(APIView):
                     "error": "Satellite name is required"
                 }, status=400)
             
-            custom_satellites = get_custom_satellites()
-            
-            if satellite_name not in custom_satellites:
+            # Remove satellite
+            if not remove_satellite(satellite_name):
                 return Response({
                     "error": f"Satellite '{satellite_name}' not found"
                 }, status=404)
             
-            # Remove satellite
-            del custom_satellites[satellite_name]
-            save_custom_satellites(custom_satellites)
-            
             return Response({
                 "message": f"Satellite '{satellite_name}' removed successfully"
             })
@@ -173,14 +183,12 @@ class CustomSatelliteView(APIView):
     def get(self, request):
         """Get all custom satellites"""
         try:
-            custom_satellites = get_custom_satellites()
-            
             satellites_list = []
-            for name, data in custom_satellites.items():
+            for data in list_satellites():
                 satellites_list.append({
                     "name": data['name'],
-                    "positions_count": len(data['positions']),
-                    "created_at": data['created_at']
+                    "positions_count": data['positions_count'],
+                    "created_at": data['created_at'].isoformat()
                 })
             
             return Response({
@@ -194,60 +202,141 @@ class CustomSatelliteView(APIView):
             }, status=500)
 
 class SatellitePositionView(APIView):
+    renderer_classes = ARRAY_RENDERERS
+
     def post(self, request):
         serializer = TLERequestSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
         line1 = serializer.validated_data['line1']
         line2 = serializer.validated_data['line2']
-        duration_seconds = serializer.validated_data['duration_seconds']
-        
-        sat = Satrec.twoline2rv(line1, line2)
+        epoch = serializer.validated_data['epoch']
+        step_seconds = serializer.validated_data['step_seconds']
+        num_steps = serializer.validated_data['num_steps']
+        output = serializer.validated_data['output']
+        frame = serializer.validated_data['frame']
         
-        positions = []
-        for step in range(0, duration_seconds * 10):
-            second = step * 0.1
-            jd, fr = jday(2024, 6, 26, 0, 0, second)
-            error, pos, vel = sat.sgp4(jd, fr)
-            positions.append({
-                "time": second,
-                "position": pos,
-                "velocity": vel
+        with span("parse"):
+            sat = Satrec.twoline2rv(line1, line2)
+
+        if output == "stream":
+            window_steps = serializer.validated_data['window_steps']
+            windows = iter_propagation_windows(sat, epoch, num_steps, step_seconds, window_steps)
+            return StreamingHttpResponse(
+                stream_position_windows(epoch, step_seconds, num_steps, windows, frame),
+                content_type="application/x-ndjson"
+            )
+
+        offsets = np.arange(num_steps, dtype=np.float64) * step_seconds
+        with span("propagate"):
+            jd, fr = time_grid(epoch, offsets)
+            positions, velocities, errors = propagate(sat, jd, fr)
+        if frame != "teme":
+            with span("frame"):
+                positions, velocities = convert_frame(frame, positions, jd, fr, velocities)
+
+        if wants_columnar(request):
+            failed = errors != 0
+            positions = positions.astype(np.float32)
+            velocities = velocities.astype(np.float32)
+            positions[failed] = np.nan
+            velocities[failed] = np.nan
+            return Response({
+                "epoch": epoch.isoformat(),
+                "step_seconds": step_seconds,
+                "count": num_steps,
+                "frame": frame,
+                "positions": positions,
+                "velocities": velocities,
+                "errors": errors.astype(np.int32),
             })
-        
-        return Response({"positions": positions})
+
+        if output == "columnar":
+            return Response({
+                "epoch": epoch.isoformat(),
+                "step_seconds": step_seconds,
+                "frame": frame,
+                **columnar_positions(offsets, positions, velocities, errors)
+            })
+
+        return Response({"frame": frame, "positions": [
+            {"time": second, "position": tuple(pos), "velocity": tuple(vel)}
+            for second, pos, vel in zip(offsets.tolist(), positions.tolist(), velocities.tolist())
+        ]})
 
     def get(self, request):
         """Get positions for all satellites (custom + default)"""
+        serializer = LivePositionsSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        if params['mode'] == "live":
+            return self.live(params)
+
         global simulated_time
         # advance simulated time by 10 seconds for every poll
         simulated_time += datetime.timedelta(seconds=10)
         now = simulated_time
 
-        # Get custom satellites
-        custom_satellites = get_custom_satellites()
-        
         results = []
         
         # Add custom satellites
-        for name, sat_data in custom_satellites.items():
-            positions = sat_data['positions']
-            if positions:
-                # Calculate current position index based on time
-                # This creates infinite loop through positions
-                current_index = int((now.timestamp() * 10) % len(positions))
-                current_position = positions[current_index]
-                
-                results.append({
-                    "name": name,
-                    "position": current_position,
-                    "type": "custom"
-                })
+        # Calculate current position index based on time
+        # This creates infinite loop through positions
+        with span("db"):
+            positions = current_positions(int(now.timestamp() * 10))
+        if positions and params['frame'] != "teme":
+            # the stored loop is placed at the simulated instant, so it turns with the Earth
+            names, points = zip(*positions)
+            with span("frame"):
+                points, _ = convert_frame(params['frame'], np.array(points), *julian_date(now))
+            positions = zip(names, points.tolist())
+        for name, current_position in positions:
+            results.append({
+                "name": name,
+                "position": current_position,
+                "type": "custom"
+            })
 
         # If no custom satellites, return empty list
         # (removed default satellites as requested)
         
-        return Response({"satellites": results})
+        return Response({"frame": params['frame'], "satellites": results})
+
+    def live(self, params):
+        """Every tracked object (catalog + custom) propagated to one instant, as columns"""
+        when = params.get('time') or datetime.datetime.now(datetime.timezone.utc)
+        try:
+            with span("catalog"):
+                tracked = get_tracked_set()
+        except Exception as e:
+            return Response({"error": f"Failed to load tracked objects: {str(e)}"}, status=500)
+        filters = dict(
+            norad_ids=params.get('norad_ids'),
+            min_altitude_km=params.get('min_altitude_km'),
+            max_altitude_km=params.get('max_altitude_km'),
+            limit=params.get('limit')
+        )
+        if wants_columnar(self.request):
+            with span("propagate"):
+                rows, positions, velocities, altitudes = snapshot(tracked, when, **filters)
+            if params['frame'] != "teme":
+                with span("frame"):
+                    positions, velocities = convert_frame(params['frame'], positions, *julian_date(when), velocities)
+            return Response({
+                "time": when.isoformat(),
+                "frame": params['frame'],
+                "count": len(rows),
+                "tracked": len(tracked),
+                "names": tracked.names[rows].tolist(),
+                "types": tracked.types[rows].tolist(),
+                "norad_ids": tracked.satnums[rows].astype(np.int32),
+                "positions": positions.astype(np.float32),
+                "velocities": velocities.astype(np.float32),
+                "altitudes_km": altitudes.astype(np.float32),
+            })
+        with span("propagate"):
+            payload = columnar_snapshot(tracked, when, frame=params['frame'], **filters)
+        return Response(payload)
 
 class CollisionPredictionView(APIView):
     def post(self, request):
@@ -258,26 +347,232 @@ class CollisionPredictionView(APIView):
             return Response({"error": "Both TLEs are required"}, status=400)
 
         try:
-            line1a, line1b = tle1.strip().split("\n")
-            line2a, line2b = tle2.strip().split("\n")
+            predictor, version = get_versioned_predictor()
+            key = request_key([tle1, tle2], view="predict", model=version)
+            cache = get_result_cache()
+            with span("cache"):
+                blob = cache.get(key)
+            if blob is None:
+                with span("parse"):
+                    line1a, line1b = tle1.strip().split("\n")
+                    line2a, line2b = tle2.strip().split("\n")
 
-            sat1 = Satrec.twoline2rv(line1a, line1b)
-            sat2 = Satrec.twoline2rv(line2a, line2b)
+                    sat1 = Satrec.twoline2rv(line1a, line1b)
+                    sat2 = Satrec.twoline2rv(line2a, line2b)
 
-            features = [
-                sat1.inclo, sat1.ecco, sat1.no_kozai,
-                sat2.inclo, sat2.ecco, sat2.no_kozai,
-            ]
+                features = [
+                    sat1.inclo, sat1.ecco, sat1.no_kozai,
+                    sat2.inclo, sat2.ecco, sat2.no_kozai,
+                ]
 
-            feature_names = [
-                "sat1_inclination", "sat1_eccentricity", "sat1_mean_motion",
-                "sat2_inclination", "sat2_eccentricity", "sat2_mean_motion"
-            ]
-            features_df = pd.DataFrame([features], columns=feature_names)
+                with span("inference"):
+                    labels, _ = predict_features(predictor, np.array([features]))
+                blob = pack_result(labels[0], 0.0, 0.0, [])
+                with span("cache"):
+                    cache.set(key, blob, epoch_ttl([sat1, sat2], datetime.datetime.now(datetime.timezone.utc)),
+                              tags=(sat1.satnum, sat2.satnum))
+            label, _, _, _ = unpack_result(blob)
+            return Response({"prediction": label})
+
+        except Exception as e:
+            return Response({"error": str(e)}, status=500)
+
+class ModelInfoView(APIView):
+    """Version, path and load time of the collision model (it is loaded if it was not yet)"""
+
+    def get(self, request):
+        registry = get_registry()
+        try:
+            registry.get()
+        except Exception as e:
+            return Response({**registry.info(), "error": f"Failed to load model: {str(e)}"}, status=500)
+        return Response(registry.info())
+
+class ResultCacheView(APIView):
+    """Hit/miss counters and size of the prediction/trail result cache"""
+
+    def get(self, request):
+        return Response(get_result_cache().stats())
+
+    def delete(self, request):
+        get_result_cache().clear()
+        return Response({"message": "Result cache cleared"})
+
+class BatchPredictionView(APIView):
+    """Score many satellite pairs with one model call; results come back in request order"""
+
+    def post(self, request):
+        serializer = BatchPredictionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            pairs = serializer.validated_data['pairs']
+            results = predict_pairs(get_predictor(len(pairs)), pairs)
+        except Exception as e:
+            return Response({"error": f"Batch prediction failed: {str(e)}"}, status=500)
+        return Response({
+            "total_count": len(results),
+            "error_count": sum(1 for result in results if "error" in result),
+            "results": results
+        })
+
+class ConjunctionScreeningView(APIView):
+    """Screen a whole catalog for close approaches over a time window"""
+
+    def post(self, request):
+        serializer = ScreeningRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        start = params.get('start') or datetime.datetime.now(datetime.timezone.utc)
+        step_seconds = params['step_seconds']
+
+        try:
+            with span("catalog"):
+                names, satnums, satrecs = get_catalog(params['source'])
+            screen = prefiltered_screen if params['prefilter'] else screen_catalog
+            with span("screen"):
+                result = screen(
+                    satrecs, start, params['window_hours'] * 3600,
+                    step_seconds=step_seconds, threshold_km=params['threshold_km'],
+                    search_radius_km=params.get('search_radius_km'), workers=settings.ORBIT_SCREEN_WORKERS
+                )
+            events, prefilter_stats = result if params['prefilter'] else (result, None)
+        except Exception as e:
+            return Response({"error": f"Screening failed: {str(e)}"}, status=500)
+
+        conjunctions = [
+            describe_conjunction(event, names, satnums, start, step_seconds)
+            for event in events[:params['max_results']]
+        ]
+        return Response({
+            "start": start.isoformat(),
+            "objects_screened": len(satrecs),
+            "total_count": len(events),
+            "prefilter": prefilter_stats,
+            "conjunctions": conjunctions
+        })
+
+class ProximityQueryView(APIView):
+    """Closest approaches of one object, given as a TLE or a catalog NORAD id, to the rest of a catalog"""
+
+    def post(self, request):
+        serializer = ProximityRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
 
-            prediction = model.predict(features_df)[0]
-            result = "collision" if prediction == 1 else "no_collision"
-            return Response({"prediction": result})
+        start = params.get('start') or datetime.datetime.now(datetime.timezone.utc)
+        step_seconds = params['step_seconds']
+        try:
+            with span("catalog"):
+                names, satnums, satrecs = get_catalog(params['source'])
+        except Exception as e:
+            return Response({"error": f"Failed to load catalog: {str(e)}"}, status=500)
 
+        if 'norad_id' in params:
+            rows = np.flatnonzero(satnums == params['norad_id'])
+            if not len(rows):
+                return Response({"error": f"NORAD id {params['norad_id']} is not in the catalog"}, status=404)
+            target, name = satrecs[rows[0]], names[rows[0]]
+        else:
+            try:
+                with span("parse"):
+                    line1, line2 = params['tle'].strip().split("\n")
+                    target = Satrec.twoline2rv(line1.strip(), line2.strip())
+            except Exception as e:
+                return Response({"error": f"Invalid TLE: {str(e)}"}, status=400)
+            name = None
+
+        try:
+            with span("screen"):
+                events, candidates = proximity_query(
+                    target, start, params['window_hours'] * 3600, source=params['source'],
+                    step_seconds=step_seconds, threshold_km=params['threshold_km'], exclude_satnum=target.satnum
+                )
         except Exception as e:
-            return Response({"error": str(e)}, status=500)
\ No newline at end of file
+            return Response({"error": f"Proximity query failed: {str(e)}"}, status=500)
+
+        return Response({
+            "target": {"name": name, "norad_id": int(target.satnum)},
+            "start": start.isoformat(),
+            "candidates": candidates,
+            "total_count": len(events),
+            "approaches": [
+                describe_approach(event, names, satnums, start, step_seconds)
+                for event in events[:params['max_results']]
+            ]
+        })
+
+def job_payload(job):
+    payload = job_status(job)
+    payload["status_url"] = reverse("job-status", args=[job.pk])
+    if job.status == Job.DONE:
+        payload["result_url"] = reverse("job-result", args=[job.pk])
+    return payload
+
+class JobSubmitView(APIView):
+    """Queue a trail, batch prediction or screening job for the run_jobs workers"""
+
+    def post(self, request):
+        serializer = JobRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            with span("db"):
+                job = submit_job(serializer.validated_data['kind'], serializer.validated_data['params'])
+        except ValidationError as e:
+            raise ValidationError({"params": e.detail})
+        payload = job_payload(job)
+        return Response(payload, status=202, headers={"Location": payload["status_url"]})
+
+class JobStatusView(APIView):
+    """Status and progress of a job"""
+
+    def get(self, request, job_id):
+        with span("db"):
+            job = Job.objects.defer("result").filter(pk=job_id).first()
+        if job is None:
+            return Response({"error": "Job not found"}, status=404)
+        return Response(job_payload(job))
+
+class JobResultView(APIView):
+    """
+    Result of a finished job. ?format=bin returns the stored packed arrays
+    as they are; json and columnar decode them.
+    """
+    renderer_classes = ARRAY_RENDERERS
+
+    def get(self, request, job_id):
+        with span("db"):
+            job = Job.objects.filter(pk=job_id).first()
+        if job is None:
+            return Response({"error": "Job not found"}, status=404)
+        if job.status == Job.FAILED:
+            return Response({"error": f"Job failed: {job.error}", "status": job.status}, status=409)
+        if job.status != Job.DONE:
+            return Response({"error": f"Job is {job.status}", "status": job.status, "progress": job.progress},
+                            status=409)
+        if job.result is None or job.expires_at <= timezone.now():
+            return Response({"error": "Job result has expired"}, status=410)
+
+        blob = bytes(job.result)
+        if request.accepted_renderer.format == PackedArrayRenderer.format:
+            return HttpResponse(blob, content_type=PackedArrayRenderer.media_type)
+        data = unpack_arrays(blob)
+        return Response(data if wants_columnar(request) else nested_json_data(data))
+
+async def position_stream(request):
+    """
+    Server-Sent Events stream of the tracked set from the shared per-process
+    ticker. Needs an ASGI server (see backend/asgi.py); under WSGI each open
+    stream would hold a worker thread forever.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"error": "The position stream is only served under ASGI"}, status=501)
+    response = StreamingHttpResponse(event_stream(get_ticker()), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+def metrics(request):
+    """Request and stage latency histograms plus result cache counters, in the Prometheus text format"""
+    body = registry.render() + gauges("orbit_result_cache", get_result_cache().stats())
+    return HttpResponse(body, content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,16 +1,18 @@
 from django.conf import settings
-from sgp4.api import Satrec, jday  # type: ignore # For satellite propagation
+from sgp4.api import Satrec  # type: ignore # For satellite propagation
 from rest_framework.views import APIView  # type: ignore # DRF class-based views
 from rest_framework.decorators import api_view  # type: ignore # For function-based views like hello
 from rest_framework.response import Response  # type: ignore # For sending responses
-import pandas as pd  # For handling feature DataFrame
-from datetime import datetime, timedelta  # For time calculations
+from datetime import datetime, timezone  # For time calculations
 import numpy as np  # Optional but often used with satellite data
-import joblib  # For loading your ML model
-import os
-
-model_path = os.path.join(settings.BASE_DIR, "ml", "rf_model.pkl")
-model = joblib.load(model_path)
+from orbit.frames import FRAMES, ecef_to_geodetic, teme_to_ecef
+from orbit.model_registry import get_versioned_predictor
+from orbit.prediction import predict_features
+from orbit.propagation import time_grid
+from orbit.metrics import span
+from orbit.renderers import ARRAY_RENDERERS, wants_columnar
+from orbit.result_cache import get_result_cache, pack_result, request_key, unpack_result
+from orbit.sampling import TRAIL_MINUTES, decimate, trail_points, trail_positions, trail_step
 
 
 @api_view(['GET'])
@@ -20,65 +22,110 @@ def hello(request):
 
 
 class TLEVisualizationView(APIView):
+    """
+    Collision prediction plus both trails on one adaptive time grid. With
+    "decimate": true, each trail keeps only the samples needed to stay within
+    ORBIT_TRAIL_TOLERANCE_KM, and points keep their own timestamps. Clients
+    that animate both trails by array index should not decimate. "frame"
+    picks TEME (default), ECEF or geodetic positions (see orbit.frames).
+    """
+    renderer_classes = ARRAY_RENDERERS
 
     def post(self, request):
         tle1 = request.data.get("tle1")
         tle2 = request.data.get("tle2")
+        decimated = str(request.data.get("decimate", "")).lower() in ("1", "true")
+        frame = request.data.get("frame") or "teme"
 
         if not tle1 or not tle2:
             return Response({"error": "Both TLEs are required"}, status=400)
+        if frame not in FRAMES:
+            return Response({"error": f"frame must be one of {', '.join(FRAMES)}"}, status=400)
 
         try:
-            # Parse TLEs
+            # Trails start at the current bucket boundary, so repeated scenarios share one cache entry;
+            # the key changes with the next bucket, so entries only live until it starts
+            now = datetime.now(timezone.utc).timestamp()
+            bucket = settings.ORBIT_RESULT_CACHE_BUCKET_SECONDS
+            start = datetime.fromtimestamp(now // bucket * bucket, timezone.utc).replace(tzinfo=None)
+            predictor, version = get_versioned_predictor()
+            key = request_key(
+                [tle1, tle2], view="visualize", minutes=TRAIL_MINUTES, tolerance=settings.ORBIT_TRAIL_TOLERANCE_KM,
+                start=start.isoformat(), model=version
+            )
+            cache = get_result_cache()
+            with span("cache"):
+                blob = cache.get(key)
+            if blob is None:
+                blob, satnums = self.compute(tle1, tle2, predictor, start)
+                with span("cache"):
+                    cache.set(key, blob, bucket - now % bucket, tags=satnums)
+            result, start_timestamp, step_sec, trails = unpack_result(blob)
+            if frame != "teme":
+                # the cache holds TEME; rotate before decimating so chords are measured in the output frame
+                with span("frame"):
+                    trails = [
+                        teme_to_ecef(trail, *time_grid(start, np.arange(len(trail)) * float(step_sec)))[0]
+                        for trail in trails
+                    ]
+            indices = [None] * len(trails)
+            if decimated:
+                with span("decimate"):
+                    indices = [decimate(trail, settings.ORBIT_TRAIL_TOLERANCE_KM) for trail in trails]
+                trails = [trail[kept] for trail, kept in zip(trails, indices)]
+            if frame == "geodetic":
+                with span("frame"):
+                    trails = [ecef_to_geodetic(trail) for trail in trails]
+
+            if wants_columnar(request):
+                # both trails in one float32 array; counts splits it per satellite
+                payload = {
+                    "prediction": result,
+                    "epoch": datetime.fromtimestamp(start_timestamp, timezone.utc).isoformat(),
+                    "step_seconds": step_sec,
+                    "frame": frame,
+                    "names": ["Satellite 1", "Satellite 2"],
+                    "counts": [len(trail) for trail in trails],
+                    "positions": np.concatenate(trails).astype(np.float32),
+                }
+                if decimated:
+                    # sample number of each point; its time is epoch + index * step_seconds
+                    payload["indices"] = np.concatenate(indices).astype(np.int32)
+                return Response(payload)
+
+            with span("serialize"):
+                trails = [
+                    {"name": name, "positions": trail_points(start, step_sec, trail, kept)}
+                    for name, trail, kept in zip(("Satellite 1", "Satellite 2"), trails, indices)
+                ]
+            return Response({"prediction": result, "frame": frame, "trails": trails})
+
+        except Exception as e:
+            return Response({"error": str(e)}, status=500)
+
+    def compute(self, tle1, tle2, predictor, start):
+        """Prediction and both trails packed for the result cache, and their NORAD ids"""
+        # Parse TLEs
+        with span("parse"):
             line1a, line1b = tle1.strip().split("\n")
             line2a, line2b = tle2.strip().split("\n")
 
             sat1 = Satrec.twoline2rv(line1a, line1b)
             sat2 = Satrec.twoline2rv(line2a, line2b)
 
-            # Extract features for ML model
-            features = [
-                sat1.inclo, sat1.ecco, sat1.no_kozai,
-                sat2.inclo, sat2.ecco, sat2.no_kozai
-            ]
-            features_df = pd.DataFrame([features], columns=[
-                "sat1_inclination", "sat1_eccentricity", "sat1_mean_motion",
-                "sat2_inclination", "sat2_eccentricity", "sat2_mean_motion"
-            ])
-
-            # Predict collision using ML model only
-            prediction = model.predict(features_df)[0]
-            result = "collision" if prediction == 1 else "no_collision"
-
-            # Generate trails for visualization (no collision detection)
-            def generate_trail(sat, minutes=1440, step_sec=60):
-                now = datetime.utcnow()
-                trail = []
-                for t in range(0, minutes * 60, step_sec):
-                    current_time = now + timedelta(seconds=t)
-                    jd, fr = jday(current_time.year, current_time.month, current_time.day,
-                                  current_time.hour, current_time.minute,
-                                  current_time.second + current_time.microsecond / 1e6)
-                    e, r, _ = sat.sgp4(jd, fr)
-                    if e != 0:  # Error in propagation
-                        break
-                    trail.append({
-                        "timestamp": current_time.isoformat(),
-                        "position": r  # in kilometers
-                    }) 
-                return trail
-
-            trail1 = generate_trail(sat1)
-            trail2 = generate_trail(sat2)
-
-            return Response({
-                "prediction": result,
-                "trails": [
-                    {"name": "Satellite 1", "positions": trail1},
-                    {"name": "Satellite 2", "positions": trail2}
-                ]
-            })
-
-        except Exception as e:
-            return Response({"error": str(e)}, status=500)
-
+        # Extract features for ML model
+        features = [
+            sat1.inclo, sat1.ecco, sat1.no_kozai,
+            sat2.inclo, sat2.ecco, sat2.no_kozai
+        ]
+        # Predict collision using ML model only (shared, loaded on first use)
+        with span("inference"):
+            labels, _ = predict_features(predictor, np.array([features]))
+
+        step_sec = trail_step([sat1, sat2])
+        with span("propagate"):
+            trails = [trail_positions(sat, step_sec=step_sec, start=start) for sat in (sat1, sat2)]
+        blob = pack_result(
+            labels[0], start.replace(tzinfo=timezone.utc).timestamp(), step_sec, trails
+        )
+        return blob, (sat1.satnum, sat2.satnum)